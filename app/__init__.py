@@ -8,19 +8,34 @@ This package provides a modular, testable structure for:
 - prompt composition
 - quality checks
 - Gradio UI composition and app entrypoint
+- headless batch generation
 
 All modules follow PEP8 and include type hints and concise docstrings.
 """
 
 __all__ = [
+    "batch",
+    "budget",
+    "cache",
     "config",
+    "exports",
     "finance",
+    "http_client",
+    "jobs",
+    "metrics",
+    "peers",
     "perplexity",
     "anthropic_client",
     "prompts",
     "quality",
+    "ratelimit",
+    "router",
     "service",
+    "sessions",
+    "themes",
+    "tickers",
     "ui",
+    "worker",
 ]
 
 
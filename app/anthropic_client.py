@@ -1,43 +1,122 @@
-"""Anthropic Claude API client wrapper."""
+"""Anthropic Claude API client wrapper.
+
+``CasePrompt`` inputs are sent as a system block plus multi-block user
+content with ``cache_control`` breakpoints after the shared case context
+(and after a reference shared by several calls, such as the outline), so
+consecutive calls for one case read the common prefix from Anthropic's
+prompt cache. The endpoint is configurable
+(``ANTHROPIC_URL``) so benchmarks can point it at a local stand-in.
+"""
 
 from __future__ import annotations
 
-from typing import Optional
+import json
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
 
-import requests
+from . import http_client
+from .config import get_config
+from .prompts import CasePrompt
 
 
-ANTHROPIC_URL = "https://api.anthropic.com/v1/messages"
+USAGE_FIELDS = (
+    "input_tokens",
+    "output_tokens",
+    "cache_creation_input_tokens",
+    "cache_read_input_tokens",
+)
 
 
-def call_claude(
-    api_key: Optional[str],
-    prompt: str,
-    *,
-    model: str = "claude-3-opus-20240229",
-    max_tokens: int = 4096,
-    temperature: float = 0.5,
-) -> str:
-    """Call Anthropic Claude messages endpoint and return consolidated text."""
+def text_block(text: str, *, cache: bool = False) -> Dict[str, Any]:
+    """Return a text content block, optionally marked as a cache breakpoint."""
+
+    block: Dict[str, Any] = {"type": "text", "text": text}
+    if cache:
+        block["cache_control"] = {"type": "ephemeral"}
+    return block
 
-    if not api_key:
-        return "API Error: Missing CLAUDE_API_KEY"
+
+def _prompt_payload(prompt: Union[str, CasePrompt]) -> Tuple[Optional[List[Dict[str, Any]]], Any]:
+    """Return (system blocks, user content) for a plain or structured prompt."""
+
+    if isinstance(prompt, str):
+        return None, prompt
+    content = [text_block(prompt.context, cache=True)]
+    if prompt.reference:
+        # A reference read by one call only (part 1 in part 2, rewrite excerpts) would pay the cache write premium
+        # for nothing.
+        content.append(text_block(prompt.reference, cache=prompt.cache_reference))
+    content.append(text_block(prompt.instructions))
+    return [text_block(prompt.system)], content
+
+
+def _record_usage(usage: Optional[Dict[str, int]], reported: Optional[Dict[str, Any]]) -> None:
+    """Accumulate token counts reported by the API into ``usage``."""
+
+    if usage is None or not reported:
+        return
+    for field in USAGE_FIELDS:
+        value = reported.get(field)
+        if isinstance(value, int):
+            usage[field] = usage.get(field, 0) + value
+
+
+def _build_request(
+    api_key: str,
+    prompt: Union[str, CasePrompt],
+    model: str,
+    max_tokens: int,
+    temperature: float,
+    stream: bool = False,
+) -> Tuple[Dict[str, str], Dict[str, Any]]:
+    """Return (headers, body) for a Messages API request."""
 
     headers = {
         "x-api-key": api_key,
         "anthropic-version": "2023-06-01",
         "content-type": "application/json",
     }
-    body = {
+    system, content = _prompt_payload(prompt)
+    body: Dict[str, Any] = {
         "model": model,
         "max_tokens": max_tokens,
         "temperature": temperature,
-        "messages": [{"role": "user", "content": prompt}],
+        "messages": [{"role": "user", "content": content}],
     }
-    response = requests.post(ANTHROPIC_URL, headers=headers, json=body)
+    if system:
+        body["system"] = system
+    if stream:
+        body["stream"] = True
+    return headers, body
+
+
+def call_claude(
+    api_key: Optional[str],
+    prompt: Union[str, CasePrompt],
+    *,
+    model: str = "claude-3-opus-20240229",
+    max_tokens: int = 4096,
+    temperature: float = 0.5,
+    usage: Optional[Dict[str, int]] = None,
+    client_id: Optional[str] = None,
+) -> str:
+    """Call Anthropic Claude messages endpoint and return consolidated text.
+
+    When ``usage`` is given, input/output and cache read/write token counts
+    are added to it. ``client_id`` is the caller's share of the provider's
+    rate-limit queue (see ``app.ratelimit``).
+    """
+
+    if not api_key:
+        return "API Error: Missing CLAUDE_API_KEY"
+
+    headers, body = _build_request(api_key, prompt, model, max_tokens, temperature)
+    response = http_client.post(
+        get_config().anthropic_url, headers=headers, json=body, provider="anthropic", client_id=client_id
+    )
     if response.status_code != 200:
         return f"API Error: {response.status_code}. Response: {response.text[:500]}"
     data = response.json()
+    _record_usage(usage, data.get("usage"))
     contents = data.get("content")
     if isinstance(contents, list):
         result = ""
@@ -50,3 +129,59 @@ def call_claude(
     return "No data returned from Claude."
 
 
+def stream_claude(
+    api_key: Optional[str],
+    prompt: Union[str, CasePrompt],
+    *,
+    model: str = "claude-3-opus-20240229",
+    max_tokens: int = 4096,
+    temperature: float = 0.5,
+    usage: Optional[Dict[str, int]] = None,
+    client_id: Optional[str] = None,
+    cancel: Optional[http_client.Cancellation] = None,
+) -> Iterator[str]:
+    """Stream a Claude response as text deltas using server-sent events.
+
+    Concatenating the yielded chunks gives the same text ``call_claude``
+    returns. HTTP errors are yielded as a single ``API Error`` chunk, while an
+    ``error`` event received mid-stream raises ``RuntimeError``. Token usage
+    is added to ``usage`` as the stream reports it. ``cancel`` lets another
+    thread abort the stream (see ``app.router``); the generator then ends.
+    """
+
+    if not api_key:
+        yield "API Error: Missing CLAUDE_API_KEY"
+        return
+
+    headers, body = _build_request(api_key, prompt, model, max_tokens, temperature, stream=True)
+    with http_client.post(
+        get_config().anthropic_url, headers=headers, json=body, stream=True, provider="anthropic",
+        client_id=client_id, cancel=cancel,
+    ) as response:
+        if response.status_code != 200:
+            yield f"API Error: {response.status_code}. Response: {response.text[:500]}"
+            return
+        # SSE is always UTF-8; requests would guess ISO-8859-1 for a content type without a charset.
+        for raw_line in response.iter_lines():
+            if cancel is not None and cancel.cancelled:
+                return
+            line = raw_line.decode("utf-8")
+            if not line or not line.startswith("data:"):
+                continue
+            event = json.loads(line[len("data:"):].strip())
+            event_type = event.get("type")
+            if event_type == "content_block_delta":
+                delta = event.get("delta", {})
+                if delta.get("type") == "text_delta":
+                    yield delta.get("text", "")
+            elif event_type == "message_start":
+                reported = dict(event.get("message", {}).get("usage") or {})
+                reported.pop("output_tokens", None)  # message_delta reports the final count
+                _record_usage(usage, reported)
+            elif event_type == "message_delta":
+                _record_usage(usage, {"output_tokens": event.get("usage", {}).get("output_tokens")})
+            elif event_type == "error":
+                error = event.get("error", {})
+                raise RuntimeError(f"{error.get('type', 'error')}: {error.get('message', '')}")
+            elif event_type == "message_stop":
+                return
@@ -0,0 +1,151 @@
+"""Headless batch generation entrypoint (python -m app.batch).
+
+Reads case inputs from a CSV or JSONL file, generates them with bounded
+concurrency, and writes each case to the output directory as it completes.
+Progress is appended to ``manifest.jsonl`` so an interrupted run can be
+resumed without regenerating finished cases. A case with any failed stage
+is recorded as failed, with its stage errors, and is retried on resume.
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import json
+import os
+import re
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Set
+
+from .cache import content_key
+from .config import AppConfig, get_config
+from .service import GENERATION_MODES, generate_harvard_case_2api
+
+
+FIELDS = ("subject", "learning_outcomes", "case_focus", "industry_company", "case_type")
+MANIFEST_NAME = "manifest.jsonl"
+# A batch run shares one rate-limit queue, so it cannot crowd out interactive users.
+BATCH_CLIENT = "batch"
+
+
+def load_rows(path: str) -> List[Dict[str, str]]:
+    """Load case input rows from a ``.csv`` or ``.jsonl`` file."""
+
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        if path.lower().endswith(".jsonl"):
+            rows = [json.loads(line) for line in file if line.strip()]
+        else:
+            rows = list(csv.DictReader(file))
+    for number, row in enumerate(rows, start=1):
+        missing = [field for field in FIELDS if not str(row.get(field) or "").strip()]
+        if missing:
+            raise ValueError(f"Row {number} is missing: {', '.join(missing)}")
+    return [{field: str(row[field]).strip() for field in FIELDS} for row in rows]
+
+
+def row_key(row: Dict[str, str]) -> str:
+    """Return a stable identifier for a row's inputs."""
+
+    return content_key(*(row[field] for field in FIELDS))[:16]
+
+
+def _slug(text: str, limit: int = 40) -> str:
+    return re.sub(r"[^a-z0-9]+", "-", text.lower()).strip("-")[:limit] or "case"
+
+
+def load_completed(manifest_path: str) -> Set[str]:
+    """Return keys of rows recorded as done in the manifest."""
+
+    completed: Set[str] = set()
+    if not os.path.exists(manifest_path):
+        return completed
+    with open(manifest_path, "r", encoding="utf-8") as file:
+        for line in file:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # torn final line from a crash
+            if record.get("status") == "done":
+                completed.add(record["key"])
+    return completed
+
+
+def _write_atomic(path: str, text: str) -> None:
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as file:
+        file.write(text)
+    os.replace(tmp_path, path)
+
+
+def run_batch(
+    config: AppConfig,
+    rows: List[Dict[str, str]],
+    output_dir: str,
+    concurrency: int = 4,
+    mode: Optional[str] = None,
+    force_fresh: bool = False,
+) -> int:
+    """Generate all rows not yet done; return the number of failed cases."""
+
+    os.makedirs(output_dir, exist_ok=True)
+    manifest_path = os.path.join(output_dir, MANIFEST_NAME)
+    completed = load_completed(manifest_path)
+    manifest_lock = threading.Lock()
+
+    pending = [(index, row) for index, row in enumerate(rows, start=1) if row_key(row) not in completed]
+    print(f"{len(rows) - len(pending)} of {len(rows)} cases already done; generating {len(pending)}.")
+
+    def _generate(index: int, row: Dict[str, str]) -> Dict[str, object]:
+        key = row_key(row)
+        filename = f"{index:03d}_{_slug(row['industry_company'])}_{key}.txt"
+        errors: Dict[str, str] = {}
+        try:
+            text = generate_harvard_case_2api(
+                config,
+                *(row[field] for field in FIELDS),
+                mode=mode,
+                force_fresh=force_fresh,
+                client_id=BATCH_CLIENT,
+                errors=errors,
+            )
+            _write_atomic(os.path.join(output_dir, filename), text)
+            record = {"key": key, "row": index, "file": filename, "status": "failed" if errors else "done"}
+            if errors:
+                record["errors"] = errors
+        except Exception as exc:  # pragma: no cover - defensive
+            record = {"key": key, "row": index, "file": None, "status": "failed", "error": str(exc)}
+        with manifest_lock, open(manifest_path, "a", encoding="utf-8") as manifest:
+            manifest.write(json.dumps(record) + "\n")
+            manifest.flush()
+            os.fsync(manifest.fileno())
+        return record
+
+    failures = 0
+    with ThreadPoolExecutor(max_workers=max(1, concurrency), thread_name_prefix="casegen-batch") as pool:
+        futures = [pool.submit(_generate, index, row) for index, row in pending]
+        for future in as_completed(futures):
+            record = future.result()
+            if record["status"] != "done":
+                failures += 1
+            print(f"[{record['status']}] row {record['row']}: {record['file'] or record.get('error')}")
+    return failures
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Generate Harvard cases from a CSV or JSONL file.")
+    parser.add_argument("input", help="CSV or JSONL with columns: " + ", ".join(FIELDS))
+    parser.add_argument("output_dir", help="Directory for case files and manifest.jsonl")
+    parser.add_argument("-c", "--concurrency", type=int, default=4, help="Cases generated at once (default: 4)")
+    parser.add_argument("--mode", choices=GENERATION_MODES, help="Generation mode (default: GENERATION_MODE)")
+    parser.add_argument("--force-fresh", action="store_true", help="Ignore cached cases for identical inputs")
+    args = parser.parse_args(argv)
+
+    rows = load_rows(args.input)
+    failures = run_batch(get_config(), rows, args.output_dir, args.concurrency, args.mode, args.force_fresh)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,156 @@
+"""Token budgeting for prompts sent to Claude.
+
+Estimates token counts locally, removes duplicate research facts and URLs,
+and shrinks lower-priority prompt blocks when a prompt exceeds its budget.
+The case context is the prefix every call for a case shares (and caches), so
+it is trimmed by a rule that depends only on the context itself; earlier case
+text, which differs per call, is then condensed to its headings and key facts.
+"""
+
+from __future__ import annotations
+
+import logging
+import math
+import re
+from dataclasses import replace
+from typing import Dict, List, Set
+
+from .prompts import CasePrompt
+
+
+logger = logging.getLogger(__name__)
+
+CHARS_PER_TOKEN = 4.0
+MIN_REFERENCE_TOKENS = 300
+# Room kept beside the case context for the persona, instructions and a condensed reference.
+CONTEXT_RESERVE_TOKENS = 2000
+
+_URL_RE = re.compile(r"https?://[^\s)\]>\"']+")
+_BULLET_RE = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_SENTENCE_RE = re.compile(r"(?<=[.!?])\s+")
+_KEY_FACT_RE = re.compile(r"\d|\$|%|[\"“”]|\([^()]*\d{4}[^()]*\)")
+_HEADING_RE = re.compile(r"^\s*(?:#{1,6}\s+\S|\*\*[^*]+\*\*\s*$|\d+\.\s+\*\*|[A-Z][A-Z &/,'’-]{3,}:?\s*$)")
+
+
+def estimate_tokens(text: str) -> int:
+    """Roughly estimate the token count of ``text`` (about 4 characters per token)."""
+
+    return math.ceil(len(text) / CHARS_PER_TOKEN) if text else 0
+
+
+def dedupe_facts(facts: str) -> str:
+    """Drop repeated fact lines and lines that only repeat already-cited URLs."""
+
+    seen_lines: Set[str] = set()
+    seen_urls: Set[str] = set()
+    kept: List[str] = []
+    for line in facts.splitlines():
+        if not line.strip():
+            if kept and kept[-1].strip():
+                kept.append("")
+            continue
+        key = " ".join(_BULLET_RE.sub("", line).lower().split())
+        if key in seen_lines:
+            continue
+        urls = [url.rstrip(".,;") for url in _URL_RE.findall(line)]
+        remainder = _URL_RE.sub("", _BULLET_RE.sub("", line)).strip(" -–—:;,.()[]")
+        if urls and not remainder and all(url in seen_urls for url in urls):
+            continue
+        seen_lines.add(key)
+        seen_urls.update(urls)
+        kept.append(line)
+    return "\n".join(kept).strip()
+
+
+def truncate_to_tokens(text: str, max_tokens: int, note: str = "[... truncated to fit the token budget]") -> str:
+    """Keep whole lines from the start of ``text`` up to ``max_tokens``."""
+
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    budget = max_tokens - estimate_tokens(note)
+    kept: List[str] = []
+    used = 0
+    for line in text.splitlines():
+        cost = estimate_tokens(line + "\n")
+        if used + cost > budget:
+            break
+        kept.append(line)
+        used += cost
+    return "\n".join(kept + [note])
+
+
+def condense_case_text(text: str, max_tokens: int) -> str:
+    """Condense case prose to its section headings and key-fact sentences.
+
+    Headings are always kept; sentences carrying numbers, dates, money,
+    quotes or citations are kept in order until the budget runs out.
+    """
+
+    note = "[Condensed for length: section headings and key facts only.]"
+    lines: List[str] = [note]
+    used = estimate_tokens(note + "\n")
+    headings = [line.strip() for line in text.splitlines() if _HEADING_RE.match(line)]
+    used += sum(estimate_tokens(line + "\n") for line in headings)
+
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        if _HEADING_RE.match(line):
+            lines.append(line.strip())
+            continue
+        facts = [sentence for sentence in _SENTENCE_RE.split(line.strip()) if _KEY_FACT_RE.search(sentence)]
+        for sentence in facts:
+            cost = estimate_tokens(f"- {sentence}\n")
+            if used + cost > max_tokens:
+                break
+            lines.append(f"- {sentence}")
+            used += cost
+    return "\n".join(lines)
+
+
+def block_tokens(prompt: CasePrompt) -> Dict[str, int]:
+    """Return the estimated token count of each prompt block and the total."""
+
+    sizes = {
+        "system": estimate_tokens(prompt.system),
+        "context": estimate_tokens(prompt.context),
+        "reference": estimate_tokens(prompt.reference or ""),
+        "instructions": estimate_tokens(prompt.instructions),
+    }
+    sizes["total"] = sum(sizes.values())
+    return sizes
+
+
+def fit_prompt(prompt: CasePrompt, max_tokens: int, label: str = "prompt") -> CasePrompt:
+    """Shrink lower-priority blocks of ``prompt`` until it fits ``max_tokens``.
+
+    A context longer than ``max_tokens - CONTEXT_RESERVE_TOKENS`` is trimmed
+    to that size whether or not this prompt needs it, so every call for a
+    case sends the same context and keeps its prompt-cache prefix. The
+    reference is condensed next. The system persona and instructions are
+    never shrunk. The per-block token breakdown is logged before and, if
+    anything changed, after fitting.
+    """
+
+    sizes = block_tokens(prompt)
+    logger.info("%s tokens: %s", label, sizes)
+    context_limit = max(0, max_tokens - CONTEXT_RESERVE_TOKENS)
+    if sizes["total"] <= max_tokens and sizes["context"] <= context_limit:
+        return prompt
+
+    if sizes["context"] > context_limit:
+        prompt = replace(prompt, context=truncate_to_tokens(prompt.context, context_limit))
+    over = block_tokens(prompt)["total"] - max_tokens
+
+    if over > 0 and prompt.reference:
+        target = max(MIN_REFERENCE_TOKENS, estimate_tokens(prompt.reference) - over)
+        prompt = replace(prompt, reference=condense_case_text(prompt.reference, target))
+        over = block_tokens(prompt)["total"] - max_tokens
+
+    if over > 0:
+        logger.warning("%s is over budget beyond the context reserve; trimming its context (no cache reuse)", label)
+        target = max(0, estimate_tokens(prompt.context) - over)
+        prompt = replace(prompt, context=truncate_to_tokens(prompt.context, target))
+
+    logger.info("%s tokens after budgeting: %s", label, block_tokens(prompt))
+    return prompt
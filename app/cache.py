@@ -0,0 +1,256 @@
+"""On-disk key/value cache backed by SQLite.
+
+The cache stores JSON-serializable values with their write time so callers
+can apply their own freshness rules (TTL, stale-while-revalidate). SQLite in
+WAL mode lets several worker processes share one cache file safely. A small
+in-process LRU tier can sit in front of it via ``TieredCache``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+
+@dataclass(frozen=True)
+class CacheEntry:
+    """A cached value with its age in seconds."""
+
+    value: Any
+    stored_at: float
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.stored_at
+
+
+class DiskCache:
+    """Size-bounded SQLite cache with least-recently-used eviction."""
+
+    def __init__(self, path: str, max_entries: int = 1000) -> None:
+        self.path = path
+        self.max_entries = max_entries
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS entries ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " stored_at REAL NOT NULL,"
+                " accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed_at)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        """Return the entry for ``key`` (refreshing its LRU position) or None."""
+
+        with self._connect() as conn:
+            row = conn.execute("SELECT value, stored_at FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                return None
+            conn.execute("UPDATE entries SET accessed_at = ? WHERE key = ?", (time.time(), key))
+        return CacheEntry(value=json.loads(row[0]), stored_at=row[1])
+
+    def set(self, key: str, value: Any) -> None:
+        """Store ``value`` under ``key`` and evict the least recently used overflow."""
+
+        now = time.time()
+        payload = json.dumps(value, default=float)
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, stored_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, payload, now, now),
+            )
+            conn.execute(
+                "DELETE FROM entries WHERE key IN ("
+                " SELECT key FROM entries ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,),
+            )
+
+    def delete(self, key: str) -> None:
+        """Remove ``key`` if present."""
+
+        with self._connect() as conn:
+            conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+
+    def purge_older_than(self, max_age: float) -> int:
+        """Delete entries written more than ``max_age`` seconds ago; return count."""
+
+        with self._connect() as conn:
+            cursor = conn.execute("DELETE FROM entries WHERE stored_at < ?", (time.time() - max_age,))
+            return cursor.rowcount
+
+
+class MemoryCache:
+    """Thread-safe in-process LRU cache of ``CacheEntry`` objects."""
+
+    def __init__(self, max_entries: int = 128) -> None:
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> Optional[CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: str, entry: CacheEntry) -> None:
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._entries.pop(key, None)
+
+
+class TieredCache:
+    """Memory LRU in front of a ``DiskCache`` with a shared TTL and hit/miss counters."""
+
+    def __init__(self, disk: DiskCache, ttl: float, memory_entries: int = 128) -> None:
+        self.disk = disk
+        self.ttl = ttl
+        self.memory = MemoryCache(memory_entries)
+        self._lock = threading.Lock()
+        self._stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0}
+
+    def _count(self, name: str) -> None:
+        with self._lock:
+            self._stats[name] += 1
+
+    def get(self, key: str) -> Optional[Any]:
+        """Return a fresh value for ``key`` from the fastest tier holding it."""
+
+        entry = self.memory.get(key)
+        if entry is not None and entry.age < self.ttl:
+            self._count("memory_hits")
+            return entry.value
+        entry = self.disk.get(key)
+        if entry is not None and entry.age < self.ttl:
+            self.memory.put(key, entry)
+            self._count("disk_hits")
+            return entry.value
+        self.memory.delete(key)
+        self._count("misses")
+        return None
+
+    def set(self, key: str, value: Any) -> None:
+        self.disk.set(key, value)
+        self.memory.put(key, CacheEntry(value=value, stored_at=time.time()))
+
+    def stats(self) -> Dict[str, int]:
+        """Return a snapshot of hit/miss counters."""
+
+        with self._lock:
+            return dict(self._stats)
+
+
+class LeaseTable:
+    """Named, expiring locks in SQLite, shared by every process using the file.
+
+    Used to let one process at a time fetch a given key while the others wait
+    and then read its result from the caches. A lease whose holder process
+    has exited on this host is broken at once; otherwise it expires after
+    ``ttl`` seconds.
+    """
+
+    def __init__(self, path: str, ttl: float = 120.0, poll_interval: float = 0.2) -> None:
+        self.path = path
+        self.ttl = ttl
+        self.poll_interval = poll_interval
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS leases (key TEXT PRIMARY KEY, owner TEXT NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    @staticmethod
+    def _holder_alive(owner: str) -> bool:
+        host, _, rest = owner.partition(":")
+        pid = rest.partition(":")[0]
+        if host != socket.gethostname() or not pid.isdigit():
+            return True
+        try:
+            os.kill(int(pid), 0)
+        except ProcessLookupError:
+            return False
+        except OSError:
+            pass
+        return True
+
+    def try_acquire(self, key: str, owner: str) -> bool:
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND expires_at < ?", (key, now))
+            row = conn.execute("SELECT owner FROM leases WHERE key = ?", (key,)).fetchone()
+            if row is not None and not self._holder_alive(row[0]):
+                conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, row[0]))
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO leases (key, owner, expires_at) VALUES (?, ?, ?)", (key, owner, now + self.ttl)
+            )
+            return cursor.rowcount > 0
+
+    def release(self, key: str, owner: str) -> None:
+        with self._connect() as conn:
+            conn.execute("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    @contextmanager
+    def hold(self, key: str) -> Iterator[bool]:
+        """Hold the lease for ``key``, first waiting while another process holds it.
+
+        Yields whether this process had to wait, i.e. another one just did the work.
+        """
+
+        owner = f"{socket.gethostname()}:{os.getpid()}:{threading.get_ident()}"
+        waited = False
+        while not self.try_acquire(key, owner):
+            waited = True
+            time.sleep(self.poll_interval)
+        try:
+            yield waited
+        finally:
+            self.release(key, owner)
+
+
+def content_key(*parts: str) -> str:
+    """Return a stable SHA-256 key for whitespace/case-normalized text parts."""
+
+    normalized = "\x1f".join(" ".join(part.split()).lower() for part in parts)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
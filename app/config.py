@@ -1,21 +1,21 @@
 """Configuration and environment handling for the application.
 
 Loads environment variables and exposes typed accessors for API keys,
-application password, and server configuration.
+application password, and server configuration. ``.env`` is read and the
+configuration resolved once, on the first ``get_config()`` call.
 """
 
 from __future__ import annotations
 
 import os
+import tempfile
 from dataclasses import dataclass
+from functools import lru_cache
 from typing import Optional
 
 from dotenv import load_dotenv
 
 
-load_dotenv()
-
-
 @dataclass(frozen=True)
 class AppConfig:
     """Immutable app configuration container."""
@@ -25,20 +25,124 @@ class AppConfig:
     access_password: str
     host: str
     port: int
-
-
+    cache_dir: str = ".casegen_cache"
+    financials_cache_ttl: int = 7 * 24 * 3600
+    financials_cache_stale: int = 30 * 24 * 3600
+    financials_cache_max_entries: int = 500
+    research_cache_ttl: int = 7 * 24 * 3600
+    research_cache_max_entries: int = 2000
+    research_cache_memory_entries: int = 128
+    http_connect_timeout: float = 10.0
+    http_read_timeout: float = 300.0
+    http_max_retries: int = 3
+    http_backoff_base: float = 1.0
+    http_backoff_max: float = 30.0
+    http_pool_size: int = 10
+    rate_limit_concurrency: int = 4
+    rate_limit_max_concurrency: int = 32
+    rate_limit_max_wait: float = 600.0
+    anthropic_rpm: int = 0
+    perplexity_rpm: int = 0
+    data_dir: str = ".casegen_data"
+    job_workers: int = 4
+    job_lease: float = 60.0
+    workers: int = 1
+    gradio_concurrency: int = 64
+    gradio_max_queue: int = 256
+    session_ttl: int = 12 * 3600
+    export_dir: str = os.path.join(tempfile.gettempdir(), "casegen-exports")
+    export_max_bytes: int = 512 * 1024 * 1024
+    export_max_age: int = 24 * 3600
+    ticker_listing_path: Optional[str] = None
+    ticker_min_score: float = 0.8
+    peers_path: Optional[str] = None
+    themes_path: Optional[str] = None
+    peers_limit: int = 5
+    peer_max_workers: int = 5
+    facts_max_tokens: int = 6000
+    prompt_max_input_tokens: int = 16000
+    generation_mode: str = "two_part"
+    section_concurrency: int = 5
+    section_retries: int = 1
+    claude_model: str = "claude-3-opus-20240229"
+    claude_temperature: float = 0.5
+    fallback_model: str = "claude-3-5-haiku-20241022"
+    hedge_after: float = 20.0
+    hedge_percentile: float = 95.0
+    hedge_min_samples: int = 20
+    result_cache_ttl: int = 30 * 24 * 3600
+    result_cache_max_entries: int = 200
+    log_level: str = "INFO"
+    anthropic_url: str = "https://api.anthropic.com/v1/messages"
+    perplexity_url: str = "https://api.perplexity.ai/chat/completions"
+
+
+@lru_cache(maxsize=1)
 def get_config() -> AppConfig:
-    """Create configuration from environment variables.
+    """Create configuration from environment variables (cached per process).
+
+    Call ``get_config.cache_clear()`` after changing the environment.
 
     Returns:
         AppConfig: Populated configuration object.
     """
 
+    load_dotenv()
     perplexity_api_key = os.getenv("PERPLEXITY_API_KEY")
     claude_api_key = os.getenv("CLAUDE_API_KEY")
     access_password = os.getenv("CASEGEN_PASSWORD", "ksegbs123")
     host = os.getenv("HOST", "0.0.0.0")
     port = int(os.getenv("PORT", "7860"))
+    cache_dir = os.getenv("CASEGEN_CACHE_DIR", ".casegen_cache")
+    financials_cache_ttl = int(os.getenv("FINANCIALS_CACHE_TTL", str(7 * 24 * 3600)))
+    financials_cache_stale = int(os.getenv("FINANCIALS_CACHE_STALE", str(30 * 24 * 3600)))
+    financials_cache_max_entries = int(os.getenv("FINANCIALS_CACHE_MAX_ENTRIES", "500"))
+    research_cache_ttl = int(os.getenv("RESEARCH_CACHE_TTL", str(7 * 24 * 3600)))
+    research_cache_max_entries = int(os.getenv("RESEARCH_CACHE_MAX_ENTRIES", "2000"))
+    research_cache_memory_entries = int(os.getenv("RESEARCH_CACHE_MEMORY_ENTRIES", "128"))
+    http_connect_timeout = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))
+    http_read_timeout = float(os.getenv("HTTP_READ_TIMEOUT", "300"))
+    http_max_retries = int(os.getenv("HTTP_MAX_RETRIES", "3"))
+    http_backoff_base = float(os.getenv("HTTP_BACKOFF_BASE", "1"))
+    http_backoff_max = float(os.getenv("HTTP_BACKOFF_MAX", "30"))
+    http_pool_size = int(os.getenv("HTTP_POOL_SIZE", "10"))
+    rate_limit_concurrency = int(os.getenv("RATE_LIMIT_CONCURRENCY", "4"))
+    rate_limit_max_concurrency = int(os.getenv("RATE_LIMIT_MAX_CONCURRENCY", "32"))
+    rate_limit_max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", "600"))
+    anthropic_rpm = int(os.getenv("ANTHROPIC_RPM", "0"))
+    perplexity_rpm = int(os.getenv("PERPLEXITY_RPM", "0"))
+    data_dir = os.getenv("CASEGEN_DATA_DIR", ".casegen_data")
+    job_workers = int(os.getenv("JOB_WORKERS", "4"))
+    job_lease = float(os.getenv("JOB_LEASE", "60"))
+    workers = int(os.getenv("WORKERS", "1"))
+    gradio_concurrency = int(os.getenv("GRADIO_CONCURRENCY", "64"))
+    gradio_max_queue = int(os.getenv("GRADIO_MAX_QUEUE", "256"))
+    session_ttl = int(os.getenv("SESSION_TTL", str(12 * 3600)))
+    export_dir = os.getenv("EXPORT_DIR") or os.path.join(tempfile.gettempdir(), "casegen-exports")
+    export_max_bytes = int(os.getenv("EXPORT_MAX_BYTES", str(512 * 1024 * 1024)))
+    export_max_age = int(os.getenv("EXPORT_MAX_AGE", str(24 * 3600)))
+    ticker_listing_path = os.getenv("TICKER_LISTING_PATH") or None
+    ticker_min_score = float(os.getenv("TICKER_MIN_SCORE", "0.8"))
+    peers_path = os.getenv("PEERS_PATH") or None
+    themes_path = os.getenv("THEMES_PATH") or None
+    peers_limit = int(os.getenv("PEERS_LIMIT", "5"))
+    peer_max_workers = int(os.getenv("PEER_MAX_WORKERS", "5"))
+    facts_max_tokens = int(os.getenv("FACTS_MAX_TOKENS", "6000"))
+    prompt_max_input_tokens = int(os.getenv("PROMPT_MAX_INPUT_TOKENS", "16000"))
+    generation_mode = os.getenv("GENERATION_MODE", "two_part")
+    section_concurrency = int(os.getenv("SECTION_CONCURRENCY", "5"))
+    section_retries = int(os.getenv("SECTION_RETRIES", "1"))
+    claude_model = os.getenv("CLAUDE_MODEL", "claude-3-opus-20240229")
+    claude_temperature = float(os.getenv("CLAUDE_TEMPERATURE", "0.5"))
+    fallback_model = os.getenv("FALLBACK_MODEL", "claude-3-5-haiku-20241022")
+    hedge_after = float(os.getenv("HEDGE_AFTER", "20"))
+    hedge_percentile = float(os.getenv("HEDGE_PERCENTILE", "95"))
+    hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+    result_cache_ttl = int(os.getenv("RESULT_CACHE_TTL", str(30 * 24 * 3600)))
+    result_cache_max_entries = int(os.getenv("RESULT_CACHE_MAX_ENTRIES", "200"))
+    log_level = os.getenv("LOG_LEVEL", "INFO").upper()
+    anthropic_url = os.getenv("ANTHROPIC_URL", "https://api.anthropic.com/v1/messages")
+    perplexity_url = os.getenv("PERPLEXITY_URL", "https://api.perplexity.ai/chat/completions")
 
     return AppConfig(
         perplexity_api_key=perplexity_api_key,
@@ -46,6 +150,56 @@ def get_config() -> AppConfig:
         access_password=access_password,
         host=host,
         port=port,
+        cache_dir=cache_dir,
+        financials_cache_ttl=financials_cache_ttl,
+        financials_cache_stale=financials_cache_stale,
+        financials_cache_max_entries=financials_cache_max_entries,
+        research_cache_ttl=research_cache_ttl,
+        research_cache_max_entries=research_cache_max_entries,
+        research_cache_memory_entries=research_cache_memory_entries,
+        http_connect_timeout=http_connect_timeout,
+        http_read_timeout=http_read_timeout,
+        http_max_retries=http_max_retries,
+        http_backoff_base=http_backoff_base,
+        http_backoff_max=http_backoff_max,
+        http_pool_size=http_pool_size,
+        rate_limit_concurrency=rate_limit_concurrency,
+        rate_limit_max_concurrency=rate_limit_max_concurrency,
+        rate_limit_max_wait=rate_limit_max_wait,
+        anthropic_rpm=anthropic_rpm,
+        perplexity_rpm=perplexity_rpm,
+        data_dir=data_dir,
+        job_workers=job_workers,
+        job_lease=job_lease,
+        workers=workers,
+        gradio_concurrency=gradio_concurrency,
+        gradio_max_queue=gradio_max_queue,
+        session_ttl=session_ttl,
+        export_dir=export_dir,
+        export_max_bytes=export_max_bytes,
+        export_max_age=export_max_age,
+        ticker_listing_path=ticker_listing_path,
+        ticker_min_score=ticker_min_score,
+        peers_path=peers_path,
+        themes_path=themes_path,
+        peers_limit=peers_limit,
+        peer_max_workers=peer_max_workers,
+        facts_max_tokens=facts_max_tokens,
+        prompt_max_input_tokens=prompt_max_input_tokens,
+        generation_mode=generation_mode,
+        section_concurrency=section_concurrency,
+        section_retries=section_retries,
+        claude_model=claude_model,
+        claude_temperature=claude_temperature,
+        fallback_model=fallback_model,
+        hedge_after=hedge_after,
+        hedge_percentile=hedge_percentile,
+        hedge_min_samples=hedge_min_samples,
+        result_cache_ttl=result_cache_ttl,
+        result_cache_max_entries=result_cache_max_entries,
+        log_level=log_level,
+        anthropic_url=anthropic_url,
+        perplexity_url=perplexity_url,
     )
 
 
@@ -0,0 +1,285 @@
+"""Export of generated cases to downloadable files.
+
+Each job gets its own directory under ``EXPORT_DIR``. While a job runs, its
+Markdown file is written incrementally (only the new text is appended) to a
+``.partial`` file that is renamed when the job finishes. DOCX and gzip
+variants are derived from that file on request. File names carry a
+timestamp, the job ID and a random suffix, and are created exclusively, so
+a download never reuses the file of a writer still running for the same
+job. Old job directories are evicted on an age and total-size budget.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import re
+import shutil
+import threading
+import time
+import uuid
+from typing import IO, List, Optional, Tuple
+
+from .config import get_config
+
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("md", "docx")
+PARTIAL_SUFFIX = ".partial"
+EVICTION_INTERVAL = 60.0
+
+_JOB_ID_RE = re.compile(r"[0-9a-f]{32}")
+_HEADING_RE = re.compile(r"^\s*(?:(#{1,6})\s+(.+?)|\*\*(\d+\.\s+[^*]+)\*\*|(\d+\.\s+[A-Z][A-Z &/’'-]{3,}))\s*$")
+_BULLET_RE = re.compile(r"^\s*[-*•]\s+(.*)$")
+_BOLD_RE = re.compile(r"\*\*([^*]+)\*\*")
+
+_last_eviction = 0.0
+_eviction_lock = threading.Lock()
+
+
+def _export_root() -> str:
+    return get_config().export_dir
+
+
+def job_dir(job_id: str) -> str:
+    """Return (and create) the export directory for a job ID."""
+
+    if not _JOB_ID_RE.fullmatch(job_id):
+        raise ValueError(f"Invalid job ID: {job_id!r}")
+    path = os.path.join(_export_root(), job_id)
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _markdown_path(job_id: str) -> Optional[str]:
+    """Return the finished Markdown export of a job, if there is one."""
+
+    directory = os.path.join(_export_root(), job_id)
+    if not os.path.isdir(directory):
+        return None
+    paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".md")]
+    return max(paths, key=os.path.getmtime) if paths else None
+
+
+class ExportWriter:
+    """Incrementally mirror a job's accumulated text into its Markdown export.
+
+    ``update`` receives the full text so far and appends only what is new;
+    if earlier text changed (e.g. a status line was replaced) the file is
+    rewritten. Disk errors are logged and disable the writer rather than
+    failing the job, since the export can be rebuilt from the job store.
+    """
+
+    def __init__(self, job_id: str) -> None:
+        stamp = time.strftime("%Y%m%d_%H%M%S")
+        name = f"harvard_case_{stamp}_{job_id[:8]}_{uuid.uuid4().hex[:6]}.md"
+        self.path = os.path.join(_export_root(), job_id, name)
+        self._partial = self.path + PARTIAL_SUFFIX
+        self._file: Optional[IO[str]] = None
+        self._written = ""
+        try:
+            job_dir(job_id)
+            self._file = open(self._partial, "x", encoding="utf-8")
+        except OSError as exc:
+            self._fail(exc)
+
+    def update(self, text: str) -> None:
+        if self._file is None or text is self._written:
+            return
+        try:
+            if text.startswith(self._written):
+                self._file.write(text[len(self._written):])
+            else:
+                self._file.seek(0)
+                self._file.truncate()
+                self._file.write(text)
+        except OSError as exc:
+            self._fail(exc)
+            return
+        self._written = text
+
+    def flush(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.flush()
+            except OSError as exc:
+                self._fail(exc)
+
+    def close(self, finalize: bool = True) -> Optional[str]:
+        """Finish the export and return its path (``None`` if writing failed).
+
+        With ``finalize=False`` (e.g. the job was taken over by another
+        worker) the partial file is discarded instead of published.
+        """
+
+        if self._file is None:
+            return None
+        if not finalize:
+            self._discard()
+            return None
+        try:
+            self._file.close()
+            os.replace(self._partial, self.path)
+        except OSError as exc:
+            self._fail(exc)
+            return None
+        self._file = None
+        maybe_evict()
+        return self.path
+
+    def _fail(self, exc: OSError) -> None:
+        logger.warning("export to %s disabled: %s", self._partial, exc)
+        self._discard()
+
+    def _discard(self) -> None:
+        if self._file is not None:
+            try:
+                self._file.close()
+                os.remove(self._partial)
+            except OSError:
+                pass
+        self._file = None
+
+
+def _write_docx(markdown_path: str, docx_path: str) -> None:
+    """Convert the case Markdown (headings, bullets, pipe tables, bold) to DOCX."""
+
+    from docx import Document
+
+    document = Document()
+    table_rows: List[List[str]] = []
+
+    def _flush_table() -> None:
+        if not table_rows:
+            return
+        columns = max(len(row) for row in table_rows)
+        table = document.add_table(rows=len(table_rows), cols=columns)
+        table.style = "Table Grid"
+        for row_cells, values in zip(table.rows, table_rows):
+            for cell, value in zip(row_cells.cells, values):
+                cell.text = value
+        table_rows.clear()
+
+    with open(markdown_path, "r", encoding="utf-8") as file:
+        for line in file:
+            line = line.rstrip("\n")
+            if line.count("|") >= 2:
+                cells = [cell.strip() for cell in line.strip().strip("|").split("|")]
+                if not all(set(cell) <= set("-: ") for cell in cells):
+                    table_rows.append(cells)
+                continue
+            _flush_table()
+            if not line.strip():
+                continue
+            heading = _HEADING_RE.match(line)
+            if heading:
+                level = len(heading.group(1)) if heading.group(1) else 1
+                title = heading.group(2) or heading.group(3) or heading.group(4)
+                document.add_heading(title.strip(), level=min(level, 4))
+                continue
+            bullet = _BULLET_RE.match(line)
+            paragraph = document.add_paragraph(style="List Bullet" if bullet else None)
+            text = bullet.group(1) if bullet else line
+            for index, part in enumerate(_BOLD_RE.split(text)):
+                if part:
+                    paragraph.add_run(part).bold = index % 2 == 1
+    _flush_table()
+    document.save(docx_path)
+
+
+def _gzip(path: str) -> str:
+    target = path + ".gz"
+    with open(path, "rb") as source, gzip.open(target + PARTIAL_SUFFIX, "wb") as compressed:
+        shutil.copyfileobj(source, compressed)
+    os.replace(target + PARTIAL_SUFFIX, target)
+    return target
+
+
+def export_case(job_id: Optional[str], text: str, fmt: str = "md", compress: bool = False) -> str:
+    """Return the path of a downloadable export, creating it if needed.
+
+    Uses the job's incrementally written Markdown when it exists; otherwise
+    (job still running, export evicted, no job ID) ``text`` is written first,
+    under a fresh ID if ``job_id`` is not a valid one.
+    """
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unsupported export format: {fmt!r}")
+    job_id = (job_id or "").strip()
+    markdown = _markdown_path(job_id) if _JOB_ID_RE.fullmatch(job_id) else None
+    if markdown is None:
+        job_id = job_id if _JOB_ID_RE.fullmatch(job_id) else uuid.uuid4().hex
+        writer = ExportWriter(job_id)
+        writer.update(text)
+        markdown = writer.close()
+        if markdown is None:
+            raise RuntimeError("Could not write the export file.")
+
+    path = markdown
+    if fmt == "docx":
+        path = os.path.splitext(markdown)[0] + ".docx"
+        if not os.path.exists(path):
+            _write_docx(markdown, path + PARTIAL_SUFFIX)
+            os.replace(path + PARTIAL_SUFFIX, path)
+    if compress:
+        path = path + ".gz" if os.path.exists(path + ".gz") else _gzip(path)
+    maybe_evict()
+    return path
+
+
+def _dir_stats(path: str) -> Tuple[float, int]:
+    """Return (newest mtime, total bytes) of the files in a directory."""
+
+    newest, size = 0.0, 0
+    for entry in os.scandir(path):
+        if entry.is_file():
+            stat = entry.stat()
+            newest = max(newest, stat.st_mtime)
+            size += stat.st_size
+    return newest, size
+
+
+def evict(max_bytes: int, max_age: float) -> int:
+    """Delete job export directories older than ``max_age``, then the oldest
+    ones until the total size fits ``max_bytes``. Return how many were removed.
+    """
+
+    root = _export_root()
+    if not os.path.isdir(root):
+        return 0
+    now = time.time()
+    directories = []
+    for entry in os.scandir(root):
+        if entry.is_dir():
+            try:
+                newest, size = _dir_stats(entry.path)
+            except OSError:
+                continue
+            directories.append((newest or entry.stat().st_mtime, size, entry.path))
+    directories.sort()
+    total = sum(size for _, size, _ in directories)
+    removed = 0
+    for newest, size, path in directories:
+        if now - newest <= max_age and total <= max_bytes:
+            break
+        shutil.rmtree(path, ignore_errors=True)
+        total -= size
+        removed += 1
+    return removed
+
+
+def maybe_evict() -> None:
+    """Run ``evict`` with the configured budget, at most once per ``EVICTION_INTERVAL``."""
+
+    global _last_eviction
+    with _eviction_lock:
+        now = time.monotonic()
+        if now - _last_eviction < EVICTION_INTERVAL:
+            return
+        _last_eviction = now
+    config = get_config()
+    removed = evict(config.export_max_bytes, config.export_max_age)
+    if removed:
+        logger.info("evicted %d export directories", removed)
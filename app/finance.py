@@ -1,107 +1,233 @@
 """Financial data retrieval from Yahoo Finance via yfinance.
 
-Provides helpers to extract tickers from company names and to
-format financial statement data for prompt inclusion.
+Provides helpers to extract tickers from company names (see ``app.tickers``)
+and to format financial statement data for prompt inclusion. Statement data is
+cached on disk (see ``app.cache``) because annual statements rarely change.
+pandas and yfinance are imported on first use to keep startup fast.
 """
 
 from __future__ import annotations
 
-from typing import Dict, Optional
+import os
+import threading
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Set, Tuple
 
-import pandas as pd
-import yfinance as yf
+from .cache import DiskCache
+from .config import get_config
+from .metrics import annotate
+from .tickers import resolve_ticker
 
-
-COMPANY_TICKER_MAP: Dict[str, str] = {
-    "Netflix": "NFLX",
-    "Apple": "AAPL",
-    "Microsoft": "MSFT",
-    "Tesla": "TSLA",
-    "Amazon": "AMZN",
-    "Meta": "META",
-    "Google": "GOOGL",
-    "Alphabet": "GOOGL",
-}
+if TYPE_CHECKING:
+    import pandas as pd
 
 
 def extract_ticker(company_name: str) -> Optional[str]:
-    """Extract a ticker from a company name using a simple lookup.
+    """Extract a ticker from a company name or an explicit symbol.
 
     Args:
         company_name: Free-form company string from user input.
 
     Returns:
-        Optional ticker symbol if recognized.
+        Optional ticker symbol if recognized with enough confidence.
+    """
+
+    match = resolve_ticker(company_name)
+    return match.symbol if match else None
+
+
+# Metric -> (statement, row labels in preference order). yfinance has renamed
+# several rows over time, e.g. "Total Liab" became
+# "Total Liabilities Net Minority Interest".
+METRIC_SOURCES: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "Revenue": ("financials", ("Total Revenue", "Operating Revenue")),
+    "Net Income": ("financials", ("Net Income", "Net Income Common Stockholders")),
+    "Operating Income": ("financials", ("Operating Income", "Total Operating Income As Reported")),
+    "Gross Profit": ("financials", ("Gross Profit",)),
+    "Cash Flow": (
+        "cashflow",
+        (
+            "Operating Cash Flow",
+            "Total Cash From Operating Activities",
+            "Cash Flow From Continuing Operating Activities",
+        ),
+    ),
+    "Total Assets": ("balance", ("Total Assets",)),
+    "Total Liabilities": ("balance", ("Total Liabilities Net Minority Interest", "Total Liab")),
+    "Shareholder Equity": (
+        "balance",
+        ("Stockholders Equity", "Total Stockholder Equity", "Common Stock Equity"),
+    ),
+}
+METRICS: List[str] = list(METRIC_SOURCES)
+
+_SOURCE_ROWS: List[Tuple[str, str]] = [
+    (statement, label) for statement, labels in METRIC_SOURCES.values() for label in labels
+]
+_SOURCE_METRICS: List[str] = [
+    metric for metric, (_, labels) in METRIC_SOURCES.items() for _ in labels
+]
+
+_cache: Optional[DiskCache] = None
+_cache_lock = threading.Lock()
+_refreshing: Set[str] = set()
+
+
+def _get_cache() -> DiskCache:
+    """Return the process-wide financials cache, creating it on first use."""
+
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = get_config()
+            _cache = DiskCache(
+                os.path.join(config.cache_dir, "financials.sqlite3"),
+                max_entries=config.financials_cache_max_entries,
+            )
+        return _cache
+
+
+def _frame_to_json(frame: pd.DataFrame) -> Dict[str, Any]:
+    return frame.to_dict(orient="split")
+
+
+def _frame_from_json(value: Dict[str, Any]) -> pd.DataFrame:
+    import pandas as pd
+
+    frame = pd.DataFrame(value["data"], index=value["index"], columns=value["columns"], dtype=float)
+    frame.index.name = "Year"
+    return frame
+
+
+def _refresh_in_background(ticker: str, years: int, key: str) -> None:
+    """Re-download a stale entry on a daemon thread, at most once per key."""
+
+    with _cache_lock:
+        if key in _refreshing:
+            return
+        _refreshing.add(key)
+
+    def _worker() -> None:
+        try:
+            _get_cache().set(key, _frame_to_json(_download_financial_data(ticker, years)))
+        except Exception:  # pragma: no cover - keep serving the stale entry
+            pass
+        finally:
+            with _cache_lock:
+                _refreshing.discard(key)
+
+    threading.Thread(target=_worker, name=f"financials-refresh-{key}", daemon=True).start()
+
+
+def get_financial_data_yf(ticker: str, years: int = 5) -> pd.DataFrame:
+    """Fetch financial statement data for a ticker, served from cache when possible.
+
+    Entries younger than ``financials_cache_ttl`` are returned as-is. Older
+    entries within ``financials_cache_stale`` are returned immediately while a
+    background refresh runs (stale-while-revalidate). Download errors propagate
+    and are never cached.
+
+    Returns a year x metric frame (see ``METRICS``), latest year first, with
+    NaN for metrics the statements do not report.
+    """
+
+    config = get_config()
+    key = f"{ticker.upper()}:{years}"
+    cache = _get_cache()
+    entry = cache.get(key)
+    if entry is not None:
+        if entry.age < config.financials_cache_ttl:
+            annotate(cache="hit")
+            return _frame_from_json(entry.value)
+        if entry.age < config.financials_cache_ttl + config.financials_cache_stale:
+            annotate(cache="stale")
+            _refresh_in_background(ticker, years, key)
+            return _frame_from_json(entry.value)
+
+    annotate(cache="miss")
+    frame = _download_financial_data(ticker, years)
+    cache.set(key, _frame_to_json(frame))
+    return frame
+
+
+def extract_metrics(statements: Dict[str, pd.DataFrame], years: int) -> pd.DataFrame:
+    """Extract ``METRICS`` from raw statements with one aligned reindex.
+
+    Args:
+        statements: yfinance statements keyed by ``financials``, ``cashflow``
+            and ``balance`` (row labels x period-end columns).
+        years: Number of most recent fiscal years to keep.
+
+    Returns:
+        Year x metric frame ordered like the income statement's columns.
     """
 
-    for key, value in COMPANY_TICKER_MAP.items():
-        if key.lower() in company_name.lower():
-            return value
-    return None
+    import pandas as pd
+
+    by_year = {}
+    for name, statement in statements.items():
+        statement = statement.iloc[:, :years]
+        statement = statement.set_axis([str(col.year) for col in statement.columns], axis=1)
+        by_year[name] = statement.loc[:, ~statement.columns.duplicated()]
+    stacked = pd.concat(by_year, axis=0)
+
+    picked = stacked.reindex(pd.MultiIndex.from_tuples(_SOURCE_ROWS))
+    picked.index = _SOURCE_METRICS
+    # groupby().first() takes the first non-null synonym per metric and year.
+    frame = picked.groupby(level=0, sort=False).first().T
+    years_order = list(by_year["financials"].columns) if "financials" in by_year else list(frame.index)
+    frame = frame.reindex(index=years_order, columns=METRICS).astype(float)
+    frame.index.name = "Year"
+    return frame
+
+
+StatementLoader = Callable[[str], Dict[str, "pd.DataFrame"]]
+
 
+def _yfinance_statements(ticker: str) -> Dict[str, pd.DataFrame]:
+    """Download raw annual statements for a ticker using yfinance."""
 
-def get_financial_data_yf(ticker: str, years: int = 5) -> Dict[str, Dict[str, Optional[float]]]:
-    """Fetch financial statement data for a ticker using yfinance.
+    import yfinance as yf
 
-    Returns a mapping of year -> metrics (Revenue, Net Income, ...).
+    ticker_obj = yf.Ticker(ticker)
+    return {
+        "financials": ticker_obj.financials,
+        "cashflow": ticker_obj.cashflow,
+        "balance": ticker_obj.balance_sheet,
+    }
+
+
+_statement_loader: StatementLoader = _yfinance_statements
+
+
+def set_statement_loader(loader: Optional[StatementLoader]) -> None:
+    """Replace the raw statement source, e.g. with offline data for benchmarks.
+
+    ``loader`` takes a ticker and returns statements shaped like yfinance's
+    (see ``extract_metrics``); ``None`` restores yfinance.
     """
 
-    try:
-        ticker_obj = yf.Ticker(ticker)
-        financials = ticker_obj.financials
-        cashflow = ticker_obj.cashflow
-        balance = ticker_obj.balance_sheet
-
-        financials = financials.iloc[:, :years]
-        cashflow = cashflow.iloc[:, :years]
-        balance = balance.iloc[:, :years]
-
-        result: Dict[str, Dict[str, Optional[float]]] = {}
-        for col in financials.columns:
-            year = str(col.year)
-            result[year] = {
-                "Revenue": financials.get("Total Revenue", pd.Series()).get(col, None),
-                "Net Income": financials.get("Net Income", pd.Series()).get(col, None),
-                "Operating Income": financials.get("Operating Income", pd.Series()).get(col, None),
-                "Gross Profit": financials.get("Gross Profit", pd.Series()).get(col, None),
-                "Cash Flow": cashflow.get("Total Cash From Operating Activities", pd.Series()).get(col, None),
-                "Total Assets": balance.get("Total Assets", pd.Series()).get(col, None),
-                "Total Liabilities": balance.get("Total Liab", pd.Series()).get(col, None),
-                "Shareholder Equity": balance.get("Total Stockholder Equity", pd.Series()).get(col, None),
-            }
-        return result
-    except Exception as exc:  # pragma: no cover - defensive
-        return {"error": str(exc)}  # type: ignore[return-value]
-
-
-def format_financials_table(financial_data: Dict[str, Dict[str, Optional[float]]]) -> str:
+    global _statement_loader
+    _statement_loader = loader or _yfinance_statements
+
+
+def _download_financial_data(ticker: str, years: int) -> pd.DataFrame:
+    """Download financial statement data for a ticker (yfinance by default)."""
+
+    return extract_metrics(_statement_loader(ticker), years)
+
+
+def format_financials_table(financial_data: Optional[pd.DataFrame]) -> str:
     """Format financial data into a simple pipe-separated table.
 
     Values are rounded to millions USD where available.
     """
 
-    if not financial_data or "error" in financial_data:
+    if financial_data is None or financial_data.empty:
         return "No financial data available."
 
-    years = list(financial_data.keys())
-    header = [
-        "Year",
-        "Revenue",
-        "Net Income",
-        "Operating Income",
-        "Gross Profit",
-        "Cash Flow",
-        "Total Assets",
-        "Total Liabilities",
-        "Shareholder Equity",
-    ]
-    table = [header]
-    for year in years:
-        row = [year]
-        for metric in header[1:]:
-            value = financial_data[year].get(metric)
-            row.append(str(round(value / 1e6, 2)) if value else "-")
-        table.append(row)
-    return "\n".join([" | ".join(row) for row in table])
-
-
+    millions = (financial_data / 1e6).round(2).astype(object)
+    millions = millions.where(financial_data.notna() & (financial_data != 0), "-").astype(str)
+    header = ["Year"] + list(financial_data.columns)
+    rows = [" | ".join(header)]
+    rows.extend(" | ".join([str(year)] + values) for year, values in zip(millions.index, millions.values.tolist()))
+    return "\n".join(rows)
@@ -0,0 +1,201 @@
+"""Shared HTTP client layer for upstream API calls.
+
+Keeps one pooled keep-alive ``requests.Session`` per host, applies
+connect/read timeouts, and retries transient failures (connection errors,
+429 and 5xx) with jittered exponential backoff that honors ``retry-after``.
+Provider calls additionally go through ``app.ratelimit``.
+``requests`` is imported on first use.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from urllib.parse import urlsplit
+
+from .config import get_config
+from .ratelimit import THROTTLE_STATUSES, Slot, get_limiter
+
+if TYPE_CHECKING:
+    import requests
+
+
+RETRY_STATUSES = frozenset({429, 500, 502, 503, 504, 529})
+
+_sessions: Dict[str, requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(url: str) -> requests.Session:
+    """Return the pooled session for the URL's scheme and host."""
+
+    parts = urlsplit(url)
+    origin = f"{parts.scheme}://{parts.netloc}"
+    with _sessions_lock:
+        session = _sessions.get(origin)
+        if session is None:
+            import requests
+            from requests.adapters import HTTPAdapter
+
+            config = get_config()
+            session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=config.http_pool_size)
+            session.mount(origin, adapter)
+            _sessions[origin] = session
+        return session
+
+
+class Cancelled(Exception):
+    """Raised when a request is abandoned through its ``Cancellation``."""
+
+
+class Cancellation:
+    """Lets another thread abandon a request, closing its response if one is open.
+
+    ``sent_at`` records when the request first left the rate-limit queue, so
+    callers can time the upstream separately from local queueing.
+    """
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._responses: List[requests.Response] = []
+        self.cancelled = False
+        self.sent_at: Optional[float] = None
+
+    def attach(self, response: requests.Response) -> None:
+        """Track a response so ``cancel`` can close it (closes it at once if already cancelled)."""
+
+        with self._lock:
+            if not self.cancelled:
+                self._responses.append(response)
+                return
+        response.close()
+
+    def cancel(self) -> None:
+        with self._lock:
+            self.cancelled = True
+            responses, self._responses = self._responses, []
+        for response in responses:
+            response.close()
+
+
+def _retry_after_seconds(response: requests.Response) -> Optional[float]:
+    """Parse a numeric ``retry-after`` header, if present."""
+
+    value = response.headers.get("retry-after")
+    if value is None:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        return None
+
+
+def _backoff_delay(attempt: int, base: float, cap: float) -> float:
+    """Full-jitter exponential backoff for the given zero-based attempt."""
+
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def _release_on_close(response: requests.Response, slot: Slot) -> None:
+    """Hold a rate-limit slot for a streamed response until the response is closed."""
+
+    close = response.close
+
+    def _close() -> None:
+        try:
+            close()
+        finally:
+            slot.release()
+
+    response.close = _close  # type: ignore[method-assign]
+
+
+def post(
+    url: str,
+    *,
+    headers: Dict[str, str],
+    json: Any,
+    stream: bool = False,
+    provider: Optional[str] = None,
+    client_id: Optional[str] = None,
+    cancel: Optional[Cancellation] = None,
+) -> requests.Response:
+    """POST through the pooled session with timeouts and transient-error retries.
+
+    With ``provider``, every attempt first waits for a slot from that
+    provider's ``RateLimiter`` (queued fairly by ``client_id``), and each
+    response adapts the limiter. Throttled attempts (429/529) then wait in
+    the limiter's queue instead of consuming retries, for up to
+    ``RATE_LIMIT_MAX_WAIT`` seconds. A streamed response holds its slot until
+    it is closed. A ``cancel``led request stops retrying (raising
+    ``Cancelled``) and its response is closed.
+
+    Returns the final response, which may still be a 429/5xx once retries are
+    exhausted or ``retry-after`` exceeds the backoff cap. Re-raises the last
+    connection error if every attempt failed to connect, and ``TimeoutError``
+    if no rate-limit slot was granted in time.
+    """
+
+    import requests
+
+    config = get_config()
+    session = get_session(url)
+    timeout = (config.http_connect_timeout, config.http_read_timeout)
+    attempts = config.http_max_retries + 1
+    limiter = get_limiter(provider) if provider else None
+    deadline = time.monotonic() + config.rate_limit_max_wait
+
+    attempt = 0
+    while True:
+        if cancel is not None and cancel.cancelled:
+            raise Cancelled(url)
+        last_attempt = attempt >= attempts - 1
+        slot = limiter.acquire(client_id, timeout=max(0.0, deadline - time.monotonic())) if limiter else None
+        if cancel is not None and cancel.cancelled:
+            # Cancelled while queued (e.g. a losing hedge): give the slot back instead of spending quota.
+            if slot is not None:
+                slot.release()
+            raise Cancelled(url)
+        if cancel is not None and cancel.sent_at is None:
+            cancel.sent_at = time.perf_counter()
+        try:
+            response = session.post(url, headers=headers, json=json, stream=stream, timeout=timeout)
+        except (requests.ConnectionError, requests.Timeout):
+            if slot is not None:
+                slot.release()
+            if last_attempt:
+                raise
+            time.sleep(_backoff_delay(attempt, config.http_backoff_base, config.http_backoff_max))
+            attempt += 1
+            continue
+
+        if limiter is not None:
+            limiter.observe(response)
+            if response.status_code in THROTTLE_STATUSES and time.monotonic() < deadline:
+                # The limiter has paused and backed off; queue for the next slot.
+                response.close()
+                slot.release()
+                continue
+
+        if response.status_code not in RETRY_STATUSES or last_attempt:
+            if slot is not None:
+                if stream:
+                    _release_on_close(response, slot)
+                else:
+                    slot.release()
+            if cancel is not None:
+                cancel.attach(response)
+            return response
+        if slot is not None:
+            slot.release()
+        delay = _retry_after_seconds(response)
+        if delay is None:
+            delay = _backoff_delay(attempt, config.http_backoff_base, config.http_backoff_max)
+        elif delay > config.http_backoff_max:
+            return response
+        response.close()
+        time.sleep(delay)
+        attempt += 1
@@ -0,0 +1,276 @@
+"""Durable background jobs for case generation.
+
+Submitting a case returns a job ID immediately; a worker pool runs the
+generation and checkpoints partial text into a SQLite store so results
+survive page refreshes and server restarts. The store is shared by every
+process: each job is claimed by one manager, which heartbeats it while it
+runs, and a job whose owner stopped heartbeating (crash, restart) is claimed
+again. The case text is also mirrored into the job's export file as it
+streams (see ``app.exports``). A job whose inputs name a ``section``
+rewrites that section of a finished case instead of generating a new one.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional, Set, Tuple
+
+from .config import get_config
+from .exports import ExportWriter
+from .service import stream_harvard_case, stream_section_regeneration
+
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+CHECKPOINT_INTERVAL = 1.0
+# How often an idle manager looks for queued jobs submitted by other processes.
+CLAIM_INTERVAL = 0.5
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Job:
+    """Snapshot of a job's state."""
+
+    job_id: str
+    status: str
+    inputs: Dict[str, Any]
+    text: str
+    error: Optional[str]
+    created_at: float
+    updated_at: float
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (DONE, FAILED)
+
+
+class JobStore:
+    """SQLite-backed job table shared across threads and processes."""
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                " job_id TEXT PRIMARY KEY,"
+                " status TEXT NOT NULL,"
+                " inputs TEXT NOT NULL,"
+                " text TEXT NOT NULL DEFAULT '',"
+                " error TEXT,"
+                " created_at REAL NOT NULL,"
+                " updated_at REAL NOT NULL,"
+                " owner TEXT,"
+                " heartbeat REAL)"
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(jobs)")}
+            for column, kind in (("owner", "TEXT"), ("heartbeat", "REAL")):
+                if column not in columns:
+                    conn.execute(f"ALTER TABLE jobs ADD COLUMN {column} {kind}")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status)")
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def create(self, inputs: Dict[str, Any]) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (job_id, status, inputs, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(inputs), now, now),
+            )
+        return job_id
+
+    def update(self, job_id: str, *, status: Optional[str] = None, text: Optional[str] = None,
+               error: Optional[str] = None, owner: Optional[str] = None) -> bool:
+        """Update a job; with ``owner``, only while that manager still owns it. Return whether it did."""
+
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = COALESCE(?, status), text = COALESCE(?, text),"
+                " error = COALESCE(?, error), updated_at = ? WHERE job_id = ? AND (? IS NULL OR owner = ?)",
+                (status, text, error, time.time(), job_id, owner, owner),
+            )
+            return cursor.rowcount > 0
+
+    def claim(self, owner: str, stale_after: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Atomically take the oldest queued job, or a running one whose owner went silent.
+
+        Returns (job ID, inputs), or None when there is nothing to run.
+        """
+
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT job_id, inputs FROM jobs WHERE status = ? OR (status = ? AND COALESCE(heartbeat, 0) < ?)"
+                " ORDER BY created_at LIMIT 1",
+                (QUEUED, RUNNING, now - stale_after),
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, owner = ?, heartbeat = ?, updated_at = ? WHERE job_id = ?",
+                (RUNNING, owner, now, now, row[0]),
+            )
+        return row[0], json.loads(row[1])
+
+    def heartbeat(self, owner: str) -> None:
+        """Mark every job running under ``owner`` as alive."""
+
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat = ? WHERE owner = ? AND status = ?", (time.time(), owner, RUNNING))
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT job_id, status, inputs, text, error, created_at, updated_at FROM jobs WHERE job_id = ?",
+                (job_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Job(row[0], row[1], json.loads(row[2]), row[3], row[4], row[5], row[6])
+
+
+class JobManager:
+    """Claims jobs from the shared store and runs them on a bounded thread pool.
+
+    Any number of managers (typically one per process) can share a store. A
+    manager with ``workers=0`` only submits and follows jobs, leaving them
+    to the worker processes (see ``app.worker``). Running jobs are
+    heartbeated every third of ``lease`` seconds; after a full ``lease``
+    without one, another manager takes the job over.
+    """
+
+    def __init__(self, store: JobStore, workers: int = 4, lease: float = 60.0) -> None:
+        self.store = store
+        self.workers = max(0, workers)
+        self.lease = lease
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running: Set[str] = set()
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        if self.workers:
+            self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="casegen-job")
+            threading.Thread(target=self._dispatch, name="casegen-job-dispatch", daemon=True).start()
+
+    def submit(self, inputs: Dict[str, Any]) -> str:
+        """Persist a new job for the next free manager; return its ID."""
+
+        job_id = self.store.create(inputs)
+        self._wake.set()
+        return job_id
+
+    def _dispatch(self) -> None:
+        """Heartbeat running jobs and claim new ones while threads are free."""
+
+        last_heartbeat = 0.0
+        while True:
+            try:
+                now = time.monotonic()
+                if now - last_heartbeat >= self.lease / 3:
+                    self.store.heartbeat(self.owner)
+                    last_heartbeat = now
+                with self._lock:
+                    free = len(self._running) < self.workers
+                claimed = self.store.claim(self.owner, self.lease) if free else None
+            except sqlite3.Error:  # pragma: no cover - retried on the next pass
+                logger.exception("job dispatch failed")
+                claimed = None
+            if claimed is not None:
+                job_id, inputs = claimed
+                with self._lock:
+                    self._running.add(job_id)
+                self._pool.submit(self._run, job_id, inputs)
+                continue
+            self._wake.wait(CLAIM_INTERVAL)
+            self._wake.clear()
+
+    def _run(self, job_id: str, inputs: Dict[str, Any]) -> None:
+        export = ExportWriter(job_id)
+        text = ""
+        last_checkpoint = 0.0
+        # Only the manager still owning the job publishes its export; a taken-over run discards it.
+        owned = True
+        generate = stream_section_regeneration if "section" in inputs else stream_harvard_case
+        try:
+            for text in generate(get_config(), **inputs):
+                export.update(text)
+                now = time.monotonic()
+                if now - last_checkpoint >= CHECKPOINT_INTERVAL:
+                    if not self.store.update(job_id, text=text, owner=self.owner):
+                        logger.warning("job %s was taken over by another worker; stopping", job_id)
+                        owned = False
+                        return
+                    export.flush()
+                    last_checkpoint = now
+            owned = self.store.update(job_id, status=DONE, text=text, owner=self.owner)
+        except Exception as exc:  # pragma: no cover - defensive
+            owned = self.store.update(job_id, status=FAILED, text=text, error=str(exc), owner=self.owner)
+        finally:
+            export.close(finalize=owned)
+            with self._lock:
+                self._running.discard(job_id)
+            self._wake.set()
+
+    def follow(self, job_id: str, poll_interval: float = 1.0) -> Iterator[Job]:
+        """Yield job snapshots whenever they change until the job finishes."""
+
+        last_update = None
+        while True:
+            job = self.store.get(job_id)
+            if job is None:
+                return
+            if job.updated_at != last_update:
+                last_update = job.updated_at
+                yield job
+            if job.finished:
+                return
+            time.sleep(poll_interval)
+
+
+_manager: Optional[JobManager] = None
+_manager_lock = threading.Lock()
+
+
+def get_job_manager(run_jobs: Optional[bool] = None) -> JobManager:
+    """Return the process-wide job manager, starting it on first use.
+
+    ``run_jobs`` (decided by the first call) defaults to running jobs in
+    this process unless ``WORKERS`` > 1, where the worker processes do.
+    """
+
+    global _manager
+    with _manager_lock:
+        if _manager is None:
+            config = get_config()
+            if run_jobs is None:
+                run_jobs = config.workers <= 1
+            store = JobStore(os.path.join(config.data_dir, "jobs.sqlite3"))
+            _manager = JobManager(store, workers=config.job_workers if run_jobs else 0, lease=config.job_lease)
+        return _manager
@@ -1,18 +1,112 @@
-"""Application entrypoint for running the Gradio server."""
+"""Application entrypoint for running the Gradio server.
+
+The Gradio app is mounted on a FastAPI app that also serves Prometheus
+metrics at ``/metrics`` (see ``app.metrics``).
+
+With ``WORKERS`` > 1 this process only serves the UI (Gradio's queue and
+event streams live in one process, so a browser session must always reach
+the same one) and supervises that many ``app.worker`` processes, which run
+the generation jobs; a worker that exits is restarted.
+"""
 
 from __future__ import annotations
 
+import logging
+import subprocess
+import sys
+import threading
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, List, Optional
+
+import gradio as gr
+import uvicorn
+from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
+
 from .config import get_config
+from .metrics import merge_expositions, read_snapshots, render_prometheus
 from .ui import build_app
+from .worker import METRICS_INTERVAL, metrics_dir
+
+
+RESTART_DELAY = 2.0
+logger = logging.getLogger(__name__)
+
+
+class WorkerPool:
+    """Starts ``count`` worker processes and restarts any that exit."""
+
+    def __init__(self, count: int) -> None:
+        self.count = count
+        self._processes: List[Optional[subprocess.Popen]] = [None] * count
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        for index in range(self.count):
+            self._spawn(index)
+        self._thread = threading.Thread(target=self._supervise, name="casegen-worker-pool", daemon=True)
+        self._thread.start()
+
+    def _spawn(self, index: int) -> None:
+        self._processes[index] = subprocess.Popen([sys.executable, "-m", "app.worker"])
+        logger.info("started worker %d (pid %d)", index, self._processes[index].pid)
+
+    def _supervise(self) -> None:
+        while not self._stopping.wait(RESTART_DELAY):
+            for index, process in enumerate(self._processes):
+                if process is not None and process.poll() is not None and not self._stopping.is_set():
+                    logger.warning("worker %d (pid %d) exited with %s; restarting", index, process.pid,
+                                   process.returncode)
+                    self._spawn(index)
+
+    def stop(self, timeout: float = 10.0) -> None:
+        self._stopping.set()
+        processes = [process for process in self._processes if process is not None]
+        for process in processes:
+            process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in processes:
+            try:
+                process.wait(max(0.0, deadline - time.monotonic()))
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def create_server() -> FastAPI:
+    config = get_config()
+    pool = WorkerPool(config.workers) if config.workers > 1 else None
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+        if pool is not None:
+            pool.start()
+        try:
+            yield
+        finally:
+            if pool is not None:
+                pool.stop()
+
+    server = FastAPI(lifespan=lifespan)
+
+    @server.get("/metrics", response_class=PlainTextResponse)
+    def metrics() -> str:
+        if pool is None:
+            return render_prometheus()
+        snapshots = read_snapshots(metrics_dir(), max_age=3 * METRICS_INTERVAL)
+        return merge_expositions({"web": render_prometheus(), **snapshots})
+
+    demo = build_app()
+    demo.queue(default_concurrency_limit=config.gradio_concurrency, max_size=config.gradio_max_queue)
+    return gr.mount_gradio_app(server, demo, path="/", theme=gr.themes.Soft())
 
 
 def run() -> None:
     config = get_config()
-    app = build_app()
-    app.launch(server_name=config.host, server_port=config.port)
+    logging.basicConfig(level=config.log_level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    uvicorn.run(create_server(), host=config.host, port=config.port)
 
 
 if __name__ == "__main__":
     run()
-
-
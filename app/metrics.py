@@ -0,0 +1,301 @@
+"""Per-stage timing and usage instrumentation.
+
+Every pipeline stage (ticker lookup, Yahoo Finance, Perplexity, Claude calls,
+quality checks, ...) is wrapped in a ``Stage``. Finished stages are emitted as
+one structured JSON log line each and aggregated into in-process Prometheus
+metrics, exposed as text by ``render_prometheus`` for the ``/metrics`` route.
+Worker processes write their metrics to snapshot files, which the web
+process merges into its own output with a ``worker`` label.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from bisect import bisect_left
+from concurrent.futures import Executor, Future
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
+
+
+T = TypeVar("T")
+
+logger = logging.getLogger("app.metrics")
+
+DURATION_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+TOKEN_FIELDS: Dict[str, str] = {
+    "input_tokens": "input",
+    "output_tokens": "output",
+    "cache_read_input_tokens": "cache_read",
+    "cache_creation_input_tokens": "cache_write",
+}
+
+_current_stage: contextvars.ContextVar[Optional["Stage"]] = contextvars.ContextVar("casegen_stage", default=None)
+
+
+class _Registry:
+    """Thread-safe in-process metric store."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self.durations: Dict[str, List[int]] = {}
+        self.duration_sums: Dict[str, float] = {}
+        self.duration_counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.bytes: Dict[str, int] = {}
+        self.tokens: Dict[Tuple[str, str], int] = {}
+        self.cache_events: Dict[Tuple[str, str], int] = {}
+        self.coalesced: Dict[str, int] = {}
+
+    def observe(self, stage: "Stage") -> None:
+        name = stage.name
+        with self._lock:
+            buckets = self.durations.setdefault(name, [0] * (len(DURATION_BUCKETS) + 1))
+            buckets[bisect_left(DURATION_BUCKETS, stage.duration)] += 1
+            self.duration_sums[name] = self.duration_sums.get(name, 0.0) + stage.duration
+            self.duration_counts[name] = self.duration_counts.get(name, 0) + 1
+            if stage.error:
+                self.errors[name] = self.errors.get(name, 0) + 1
+            if "bytes" in stage.fields:
+                self.bytes[name] = self.bytes.get(name, 0) + int(stage.fields["bytes"])
+            for field, kind in TOKEN_FIELDS.items():
+                if field in stage.fields:
+                    key = (name, kind)
+                    self.tokens[key] = self.tokens.get(key, 0) + int(stage.fields[field])
+            if "cache" in stage.fields:
+                key = (name, str(stage.fields["cache"]))
+                self.cache_events[key] = self.cache_events.get(key, 0) + 1
+            if stage.fields.get("coalesced"):
+                self.coalesced[name] = self.coalesced.get(name, 0) + 1
+
+    def render(self) -> str:
+        lines: List[str] = []
+        with self._lock:
+            lines += [
+                "# HELP casegen_stage_duration_seconds Wall-clock duration of pipeline stages.",
+                "# TYPE casegen_stage_duration_seconds histogram",
+            ]
+            for name, buckets in sorted(self.durations.items()):
+                cumulative = 0
+                for bound, count in zip(DURATION_BUCKETS, buckets):
+                    cumulative += count
+                    lines.append(f'casegen_stage_duration_seconds_bucket{{stage="{name}",le="{bound}"}} {cumulative}')
+                lines.append(
+                    f'casegen_stage_duration_seconds_bucket{{stage="{name}",le="+Inf"}} {self.duration_counts[name]}'
+                )
+                lines.append(f'casegen_stage_duration_seconds_sum{{stage="{name}"}} {self.duration_sums[name]:.6f}')
+                lines.append(f'casegen_stage_duration_seconds_count{{stage="{name}"}} {self.duration_counts[name]}')
+            lines += [
+                "# HELP casegen_stage_errors_total Stages that ended with an error.",
+                "# TYPE casegen_stage_errors_total counter",
+            ]
+            lines += [
+                f'casegen_stage_errors_total{{stage="{name}"}} {count}' for name, count in sorted(self.errors.items())
+            ]
+            lines += [
+                "# HELP casegen_stage_bytes_total Bytes of text produced or fetched by stages.",
+                "# TYPE casegen_stage_bytes_total counter",
+            ]
+            lines += [
+                f'casegen_stage_bytes_total{{stage="{name}"}} {count}' for name, count in sorted(self.bytes.items())
+            ]
+            lines += [
+                "# HELP casegen_tokens_total LLM tokens by stage and kind.",
+                "# TYPE casegen_tokens_total counter",
+            ]
+            lines += [
+                f'casegen_tokens_total{{stage="{name}",kind="{kind}"}} {count}'
+                for (name, kind), count in sorted(self.tokens.items())
+            ]
+            lines += [
+                "# HELP casegen_cache_events_total Cache lookups by stage and result.",
+                "# TYPE casegen_cache_events_total counter",
+            ]
+            lines += [
+                f'casegen_cache_events_total{{stage="{name}",result="{result}"}} {count}'
+                for (name, result), count in sorted(self.cache_events.items())
+            ]
+            lines += [
+                "# HELP casegen_stage_coalesced_total Stages served by another request's in-flight call.",
+                "# TYPE casegen_stage_coalesced_total counter",
+            ]
+            lines += [
+                f'casegen_stage_coalesced_total{{stage="{name}"}} {count}'
+                for name, count in sorted(self.coalesced.items())
+            ]
+        return "\n".join(lines) + "\n"
+
+
+_registry = _Registry()
+_collectors: List[Callable[[], List[str]]] = []
+
+
+def register_collector(collector: Callable[[], List[str]]) -> None:
+    """Add a callable returning extra exposition lines (e.g. gauges) to ``render_prometheus``."""
+
+    _collectors.append(collector)
+
+
+class Stage:
+    """A timed pipeline stage carrying free-form fields (bytes, tokens, cache)."""
+
+    def __init__(self, name: str, trace_id: Optional[str] = None) -> None:
+        self.name = name
+        self.trace_id = trace_id
+        self.fields: Dict[str, Any] = {}
+        self.error: Optional[str] = None
+        self.duration = 0.0
+        self._start = time.perf_counter()
+        self._finished = False
+
+    def annotate(self, **fields: Any) -> None:
+        self.fields.update(fields)
+
+    def add_usage(self, usage: Dict[str, int]) -> None:
+        """Record Claude token usage as reported by the API."""
+
+        for field in TOKEN_FIELDS:
+            if field in usage:
+                self.fields[field] = self.fields.get(field, 0) + usage[field]
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        """Stop the clock, then log and aggregate the stage (once)."""
+
+        if self._finished:
+            return
+        self._finished = True
+        self.duration = time.perf_counter() - self._start
+        if error is not None:
+            self.error = f"{type(error).__name__}: {error}"
+        _registry.observe(self)
+        record = {"event": "stage", "stage": self.name, "duration_s": round(self.duration, 4), **self.fields}
+        if self.trace_id:
+            record["trace_id"] = self.trace_id
+        if self.error:
+            record["error"] = self.error
+        logger.info(json.dumps(record, default=str))
+
+
+def new_trace_id() -> str:
+    return uuid.uuid4().hex[:16]
+
+
+@contextmanager
+def stage(name: str, trace_id: Optional[str] = None) -> Iterator[Stage]:
+    """Time a block as a stage; lower layers can ``annotate`` it meanwhile.
+
+    Do not hold this across a ``yield`` in a generator: use ``Stage`` and
+    ``finish`` directly there, since generators may resume in another context.
+    """
+
+    current = Stage(name, trace_id)
+    token = _current_stage.set(current)
+    try:
+        yield current
+    except BaseException as exc:
+        current.finish(exc)
+        raise
+    finally:
+        _current_stage.reset(token)
+        current.finish()
+
+
+def annotate(**fields: Any) -> None:
+    """Attach fields (e.g. ``cache="hit"``) to the stage running in this context."""
+
+    current = _current_stage.get()
+    if current is not None:
+        current.annotate(**fields)
+
+
+def submit_stage(pool: Executor, name: str, trace_id: Optional[str], func: Callable[..., T], *args: Any) -> Future:
+    """Submit ``func`` to ``pool`` as a stage running in a copy of the caller's context."""
+
+    context = contextvars.copy_context()
+
+    def _run() -> T:
+        with stage(name, trace_id) as current:
+            result = func(*args)
+            if isinstance(result, str):
+                current.annotate(bytes=len(result.encode("utf-8")))
+            return result
+
+    return pool.submit(context.run, _run)
+
+
+def render_prometheus() -> str:
+    """Return all metrics in the Prometheus text exposition format."""
+
+    text = _registry.render()
+    for collector in _collectors:
+        text += "".join(line + "\n" for line in collector())
+    return text
+
+
+def write_snapshot(path: str) -> None:
+    """Atomically write this process's metrics to ``path`` for another process to merge."""
+
+    partial = f"{path}.{os.getpid()}.tmp"
+    with open(partial, "w", encoding="utf-8") as file:
+        file.write(render_prometheus())
+    os.replace(partial, path)
+
+
+def read_snapshots(directory: str, max_age: float) -> Dict[str, str]:
+    """Return ``*.prom`` snapshots written within ``max_age`` seconds, by file stem."""
+
+    snapshots: Dict[str, str] = {}
+    if not os.path.isdir(directory):
+        return snapshots
+    now = time.time()
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        if not name.endswith(".prom"):
+            continue
+        try:
+            if now - os.path.getmtime(path) > max_age:
+                continue
+            with open(path, "r", encoding="utf-8") as file:
+                snapshots[name[:-len(".prom")]] = file.read()
+        except OSError:
+            continue
+    return snapshots
+
+
+def _with_label(sample: str, name: str, value: str) -> str:
+    series, _, number = sample.rpartition(" ")
+    if series.endswith("}"):
+        return f'{series[:-1]},{name}="{value}"}} {number}'
+    return f'{series}{{{name}="{value}"}} {number}'
+
+
+def merge_expositions(texts: Dict[str, str], label: str = "worker") -> str:
+    """Merge several processes' exposition texts, adding ``label`` to every sample.
+
+    Samples are regrouped per metric family, since each family may be
+    declared only once.
+    """
+
+    families: Dict[str, List[str]] = {}
+    headers: Dict[str, List[str]] = {}
+    for source, text in texts.items():
+        family = ""
+        for line in text.splitlines():
+            if line.startswith("# "):
+                parts = line.split(" ", 3)
+                family = parts[2] if len(parts) > 2 else family
+                family_headers = headers.setdefault(family, [])
+                if line not in family_headers:
+                    family_headers.append(line)
+                families.setdefault(family, [])
+            elif line.strip():
+                families.setdefault(family, []).append(_with_label(line, label, source))
+    lines: List[str] = []
+    for family, samples in families.items():
+        lines += headers.get(family, []) + samples
+    return "\n".join(lines) + "\n"
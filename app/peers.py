@@ -0,0 +1,133 @@
+"""Peer-group financials for comparative exhibits.
+
+Competitor lists come from the bundled ``data/peers.json`` (optionally
+overridden by ``PEERS_PATH``). Peer statements are fetched concurrently
+through ``get_financial_data_yf`` and summarized into ratios (margins,
+leverage, growth) for the latest fiscal year of each company. pandas is
+imported on first use.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, List, Optional
+
+from .config import get_config
+from .finance import get_financial_data_yf
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+BUNDLED_PEERS = os.path.join(os.path.dirname(__file__), "data", "peers.json")
+
+RATIO_COLUMNS: List[str] = [
+    "Year",
+    "Revenue",
+    "Revenue Growth %",
+    "Gross Margin %",
+    "Operating Margin %",
+    "Net Margin %",
+    "Liabilities/Equity",
+]
+
+_peer_map: Optional[Dict[str, List[str]]] = None
+_peer_map_lock = threading.Lock()
+
+
+def _load_peer_map() -> Dict[str, List[str]]:
+    """Return the ticker -> competitors map, loading it on first use."""
+
+    global _peer_map
+    with _peer_map_lock:
+        if _peer_map is None:
+            with open(BUNDLED_PEERS, "r", encoding="utf-8") as file:
+                peer_map = json.load(file)
+            extra = get_config().peers_path
+            if extra:
+                with open(extra, "r", encoding="utf-8") as file:
+                    peer_map.update(json.load(file))
+            _peer_map = {ticker.upper(): [peer.upper() for peer in peers] for ticker, peers in peer_map.items()}
+        return _peer_map
+
+
+def get_peers(ticker: str, limit: Optional[int] = None) -> List[str]:
+    """Return the configured competitors for ``ticker`` (possibly empty)."""
+
+    limit = get_config().peers_limit if limit is None else limit
+    return _load_peer_map().get(ticker.upper(), [])[:limit]
+
+
+def fetch_peer_financials(tickers: List[str], max_workers: Optional[int] = None) -> Dict[str, pd.DataFrame]:
+    """Fetch statements for several tickers concurrently.
+
+    Tickers whose fetch fails or returns no data are left out, so one
+    delisted peer does not sink the comparison.
+    """
+
+    if not tickers:
+        return {}
+    workers = max(1, min(len(tickers), max_workers or get_config().peer_max_workers))
+    results: Dict[str, pd.DataFrame] = {}
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="casegen-peers") as pool:
+        futures = {ticker: pool.submit(get_financial_data_yf, ticker) for ticker in tickers}
+        for ticker, future in futures.items():
+            try:
+                frame = future.result()
+            except Exception:  # pragma: no cover - skip unavailable peers
+                continue
+            if not frame.empty:
+                results[ticker] = frame
+    return results
+
+
+def compute_ratios(frame: pd.DataFrame) -> pd.Series:
+    """Summarize the latest fiscal year of a year x metric frame as ratios."""
+
+    import pandas as pd
+
+    latest = frame.iloc[0]
+    previous = frame.iloc[1] if len(frame) > 1 else None
+    revenue = latest["Revenue"]
+    growth = revenue / previous["Revenue"] - 1 if previous is not None else float("nan")
+    return pd.Series(
+        {
+            "Year": frame.index[0],
+            "Revenue": revenue / 1e6,
+            "Revenue Growth %": growth * 100,
+            "Gross Margin %": latest["Gross Profit"] / revenue * 100,
+            "Operating Margin %": latest["Operating Income"] / revenue * 100,
+            "Net Margin %": latest["Net Income"] / revenue * 100,
+            "Liabilities/Equity": latest["Total Liabilities"] / latest["Shareholder Equity"],
+        }
+    )
+
+
+def build_peer_table(frames: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Return a ticker x ratio frame for all companies, focal company first."""
+
+    import pandas as pd
+
+    return pd.DataFrame({ticker: compute_ratios(frame) for ticker, frame in frames.items()}).T.reindex(
+        columns=RATIO_COLUMNS
+    )
+
+
+def format_peer_table(table: pd.DataFrame) -> str:
+    """Format a peer ratio table as pipe-separated text (revenue in millions)."""
+
+    import pandas as pd
+
+    if table.empty:
+        return ""
+    rows = [" | ".join(["Company"] + RATIO_COLUMNS)]
+    for ticker, values in table.iterrows():
+        cells = [str(ticker), str(values["Year"])]
+        for column in RATIO_COLUMNS[1:]:
+            value = pd.to_numeric(values[column], errors="coerce")
+            cells.append(f"{value:,.2f}" if pd.notna(value) and abs(value) != float("inf") else "-")
+        rows.append(" | ".join(cells))
+    return "\n".join(rows)
@@ -1,12 +1,45 @@
-"""Perplexity API client wrapper."""
+"""Perplexity API client wrapper.
+
+Research answers are cached by a hash of the normalized query and model
+name, so regenerating a case with the same inputs skips Perplexity. The
+endpoint is configurable (``PERPLEXITY_URL``).
+"""
 
 from __future__ import annotations
 
-import requests
-from typing import Optional
+import os
+import threading
+from typing import Dict, Optional
+
+from . import http_client
+from .cache import DiskCache, TieredCache, content_key
+from .config import get_config
+from .metrics import annotate
+
+
+_cache: Optional[TieredCache] = None
+_cache_lock = threading.Lock()
+
 
+def _get_cache() -> TieredCache:
+    """Return the process-wide research cache, creating it on first use."""
 
-PERPLEXITY_URL = "https://api.perplexity.ai/chat/completions"
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            config = get_config()
+            disk = DiskCache(
+                os.path.join(config.cache_dir, "research.sqlite3"),
+                max_entries=config.research_cache_max_entries,
+            )
+            _cache = TieredCache(disk, ttl=config.research_cache_ttl, memory_entries=config.research_cache_memory_entries)
+        return _cache
+
+
+def research_cache_stats() -> Dict[str, int]:
+    """Return hit/miss counters for the research cache."""
+
+    return _get_cache().stats()
 
 
 def build_research_query(
@@ -43,24 +76,46 @@ Format as numbered, source-attributed facts (not narrative).
 def search_perplexity(
     api_key: Optional[str],
     query: str,
+    *,
+    model: str = "sonar",
+    client_id: Optional[str] = None,
 ) -> str:
-    """Execute a Perplexity chat completion request and return text content."""
+    """Execute a Perplexity chat completion request and return text content.
+
+    Successful answers are served from the research cache on repeat queries.
+    Requests are rate-limited per ``client_id`` (see ``app.ratelimit``); an
+    error response raises ``RuntimeError`` rather than being parsed as an answer.
+    """
 
     if not api_key:
         return "No data found. (Missing PERPLEXITY_API_KEY)"
 
+    cache = _get_cache()
+    key = content_key(model, query)
+    cached = cache.get(key)
+    if cached is not None:
+        annotate(cache="hit")
+        return cached
+    annotate(cache="miss")
+
     headers = {
         "Authorization": f"Bearer {api_key}",
         "Content-Type": "application/json",
     }
     body = {
-        "model": "sonar",
+        "model": model,
         "messages": [{"role": "user", "content": query}],
     }
-    response = requests.post(PERPLEXITY_URL, headers=headers, json=body)
+    response = http_client.post(
+        get_config().perplexity_url, headers=headers, json=body, provider="perplexity", client_id=client_id
+    )
+    if response.status_code != 200:
+        raise RuntimeError(f"Perplexity API error {response.status_code}: {response.text[:500]}")
     data = response.json()
     if "choices" in data and data["choices"]:
-        return data["choices"][0]["message"]["content"]
+        content = data["choices"][0]["message"]["content"]
+        cache.set(key, content)
+        return content
     return "No data found."
 
 
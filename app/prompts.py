@@ -1,60 +1,113 @@
-"""Prompt composition helpers for both parts of the case."""
+"""Prompt composition helpers for both parts of the case.
+
+Both parts share a stable, cacheable prefix (the writer persona plus the case
+context: inputs, financials, peers and research facts) followed by a
+part-specific suffix, so the second Claude call can read the prefix from
+Anthropic's prompt cache instead of paying for it again.
+"""
 
 from __future__ import annotations
 
-from typing import List
-
-
-def detect_focus_themes(case_focus: str, subject: str, learning_outcomes: str) -> List[str]:
-    """Detect thematic focus from inputs using keyword heuristics."""
-
-    focus_keywords = {
-        "innovation": ["innovation", "r&d", "startup", "disruption", "technology", "digital"],
-        "financial": ["valuation", "capital", "investment", "financial", "funding", "finance"],
-        "strategy": ["strategy", "competitive", "market", "positioning", "business model"],
-        "leadership": ["leadership", "management", "culture", "team"],
-        "operations": ["operations", "supply chain", "efficiency", "process"],
-        "crisis": ["crisis", "turnaround", "emergency", "challenge", "restructuring"],
-        "ethics": ["ethics", "responsibility", "compliance", "governance"],
-    }
-    detected: List[str] = []
-    combined_text = f"{case_focus} {subject} {learning_outcomes}".lower()
-    for theme, keywords in focus_keywords.items():
-        if any(keyword in combined_text for keyword in keywords):
-            detected.append(theme)
-    return detected
-
-
-def get_special_sections(focus_themes: List[str]) -> str:
-    """Return specialized instruction blocks for detected themes."""
-
-    section_map = {
-        "innovation": (
-            "\n- Analyze the company's innovation management using frameworks such as "
-            "Three Horizons, Build-Buy-Partner decisions, R&D investments, and startup partnerships.\n"
-            "- Show clear examples of innovation portfolio management and resource allocation dilemmas.\n"
-        ),
-        "financial": (
-            "\n- Include a deep dive into financial analysis, capital structure, funding rounds, "
-            "financial ratios, and comparison with competitors.\n"
-        ),
-        "strategy": (
-            "\n- Evaluate strategic alternatives, market positioning, business model evolution, and partnerships.\n"
-        ),
-        "leadership": (
-            "\n- Describe leadership styles, team dynamics, organizational culture, and decision-making frameworks.\n"
-        ),
-        "crisis": (
-            "\n- Analyze crisis events, turnaround management, stakeholder reactions, and risk mitigation strategies.\n"
-        ),
-        "ethics": (
-            "\n- Include analysis of ethical dilemmas, compliance issues, and corporate governance frameworks.\n"
-        ),
-    }
-    return "".join(section_map[t] for t in focus_themes if t in section_map)
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+from .themes import ThemeAnalysis, detect_themes
+
+
+SYSTEM_PROMPT = "You are a top Harvard Business School case writer."
+
+
+@dataclass(frozen=True)
+class CasePrompt:
+    """A prompt split into cacheable and variable blocks.
+
+    ``system`` and ``context`` are identical for every part of one case;
+    ``reference`` (earlier case text) and ``instructions`` vary per call.
+    ``cache_reference`` marks a reference that several calls share (the
+    outline in outline mode), so it is worth writing to the prompt cache.
+    """
+
+    system: str
+    context: str
+    instructions: str
+    reference: Optional[str] = None
+    cache_reference: bool = False
+
+    @property
+    def text(self) -> str:
+        """Flatten the prompt into a single user message."""
+
+        blocks = [self.system, self.context, self.reference or "", self.instructions]
+        return "\n".join(block for block in blocks if block)
+
+
+@dataclass(frozen=True)
+class CaseSection:
+    """One of the nine sections of a Harvard case, in document order."""
+
+    number: int
+    title: str
+    length: str
+    guidance: str
+    max_words: int
+
+
+CASE_SECTIONS: List[CaseSection] = [
+    CaseSection(1, "OPENING", "600-800 words",
+                "Set the scene: specific time/place, drama, tension, protagonist, dilemma. "
+                "Show what’s at stake; use character’s inner thoughts and dialogue.", 800),
+    CaseSection(2, "COMPANY BACKGROUND", "1200-1500 words",
+                "Founding, growth, evolution, culture, org structure, major milestones. "
+                "Leadership profiles, strategic pivots, industry, competitors, positioning. "
+                "Major financial events, funding rounds, investor profiles.", 1500),
+    CaseSection(3, "SITUATION DEVELOPMENT", "1000-1200 words",
+                "Chronology of events leading to the challenge. "
+                "Key decisions, external threats, market shifts, internal changes. "
+                "Reactions of board, management, employees, market.", 1200),
+    CaseSection(4, "CENTRAL CHALLENGE", "800-1000 words",
+                "All alternatives facing protagonist, pros/cons, stakeholders’ interests, "
+                "financial/operational constraints. NO solution.", 1000),
+    CaseSection(5, "SUPPORTING ANALYSIS", "600-800 words",
+                "Quantitative analysis, ratios, benchmarks, SWOT, exhibits reference.", 800),
+    CaseSection(6, "CONCLUSION", "500-600 words",
+                "Critical decision moment (cliffhanger). Recap, 5 student discussion questions. NO answer.", 600),
+    CaseSection(7, "EXHIBITS", "6–8 tables/charts",
+                "Real data only, each with an APA7 source line.", 1500),
+    CaseSection(8, "TEACHING NOTES", "1200–1500 words",
+                "Executive summary, learning objectives, teaching plan, questions, sample responses, frameworks.", 1500),
+    CaseSection(9, "REFERENCES", "20+ APA7 entries",
+                "Real sources only, APA7 formatted, alphabetical.", 1200),
+]
+
+
+# Sections a rewritten section must stay consistent with (sent as reference excerpts).
+# EXHIBITS and REFERENCES additionally get the exhibit mentions and in-text citations of the whole case.
+RELATED_SECTIONS: Dict[int, Tuple[int, ...]] = {
+    1: (2, 3),
+    2: (1, 3),
+    3: (2, 4),
+    4: (3, 5, 6),
+    5: (4, 7),
+    6: (4, 5),
+    7: (5,),
+    8: (1, 4, 6),
+    9: (),
+}
+
+
+def _peer_section(peer_table: str) -> str:
+    """Return the peer comparison block, or nothing when no peers were fetched."""
+
+    if not peer_table:
+        return ""
+    return f"""
+## PEER COMPARISON (latest fiscal year, from Yahoo Finance, revenue in millions):
+{peer_table}
+(Use these figures for all competitor benchmarks; do not invent peer numbers.)
+"""
 
 
-def prompt_part_1(
+def build_case_context(
     subject: str,
     learning_outcomes: str,
     case_focus: str,
@@ -62,25 +115,54 @@ def prompt_part_1(
     case_type: str,
     financials_table: str,
     facts: str,
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
 ) -> str:
-    """Compose the first-half prompt for the case generation."""
+    """Compose the case context shared verbatim by every part of one case.
+
+    ``themes`` is the request's theme analysis; it is detected from the
+    inputs (memoized) when not given.
+    """
 
-    focus_themes = detect_focus_themes(case_focus, subject, learning_outcomes)
-    extra_sections = get_special_sections(focus_themes)
-    if "innovation" in focus_themes:
-        frameworks_text = (
-            "- Use Three Horizons, Build/Buy/Partner, and innovation portfolio frameworks where relevant."
-        )
-    elif "financial" in focus_themes:
-        frameworks_text = "- Include detailed financial ratio and capital structure analysis."
-    elif "strategy" in focus_themes:
-        frameworks_text = "- Use frameworks like SWOT, Five Forces, and business model analysis."
-    else:
-        frameworks_text = ""
+    themes = themes or detect_themes(case_focus, subject, learning_outcomes)
+    extra_sections = themes.special_instructions()
 
     return f"""
-You are a top Harvard Business School case writer.
+## INPUTS FOR THIS CASE:
+Course: {subject}
+Learning Outcomes: {learning_outcomes}
+Case Focus: {case_focus}
+Company: {industry_company}
+Case Type: {case_type}
 
+## THEME-SPECIFIC INSTRUCTIONS (apply throughout the case):
+{extra_sections or "- None."}
+
+## FINANCIAL DATA (from Yahoo Finance, millions USD):
+{financials_table}
+{_peer_section(peer_table)}
+## VERIFIED FACTS AND TIMELINE (from Perplexity):
+{facts}
+"""
+
+
+def prompt_part_1(
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    financials_table: str,
+    facts: str,
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
+) -> CasePrompt:
+    """Compose the first-half prompt for the case generation."""
+
+    themes = themes or detect_themes(case_focus, subject, learning_outcomes)
+    frameworks_text = themes.frameworks("frameworks_part1")
+
+    instructions = f"""
 Your task: Write the FIRST HALF of a full, authentic Harvard MBA case (OPENING, COMPANY BACKGROUND, SITUATION DEVELOPMENT) totaling 2500-3500 words, using ONLY real, source-verified facts and the company’s actual financials.
 
 ## STRUCTURE & WORD COUNT:
@@ -96,30 +178,20 @@ Your task: Write the FIRST HALF of a full, authentic Harvard MBA case (OPENING,
    - Key decisions, external threats, market shifts, internal changes.
    - Reactions of board, management, employees, market.
 
-{extra_sections}
 {frameworks_text}
 
 **REQUIREMENTS:**
-- Use only the real financial data below (see table).
+- Use only the real financial data above (see table).
 - All facts, dates, names, numbers, quotes, claims MUST be APA7-cited in-text.
 - Use a compelling, vivid Harvard narrative.
 - DO NOT go beyond SITUATION DEVELOPMENT — stop after that section.
 
-## INPUTS FOR THIS CASE:
-Course: {subject}
-Learning Outcomes: {learning_outcomes}
-Case Focus: {case_focus}
-Company: {industry_company}
-Case Type: {case_type}
-
-## FINANCIAL DATA (from Yahoo Finance, millions USD):
-{financials_table}
-
-## VERIFIED FACTS AND TIMELINE (from Perplexity):
-{facts}
-
 END OF FIRST HALF. (Do not write further sections yet.)
 """
+    context = build_case_context(
+        subject, learning_outcomes, case_focus, industry_company, case_type, financials_table, facts, peer_table, themes
+    )
+    return CasePrompt(system=SYSTEM_PROMPT, context=context, instructions=instructions)
 
 
 def prompt_part_2(
@@ -131,24 +203,20 @@ def prompt_part_2(
     financials_table: str,
     facts: str,
     part1_text: str,
-) -> str:
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
+) -> CasePrompt:
     """Compose the second-half prompt for the case generation."""
 
-    focus_themes = detect_focus_themes(case_focus, subject, learning_outcomes)
-    extra_sections = get_special_sections(focus_themes)
-    if "innovation" in focus_themes:
-        frameworks_text = "- Continue using Three Horizons and innovation portfolio frameworks."
-    elif "financial" in focus_themes:
-        frameworks_text = "- Continue detailed financial ratio and capital structure analysis."
-    elif "strategy" in focus_themes:
-        frameworks_text = "- Apply SWOT, Five Forces, and business model analysis as relevant."
-    else:
-        frameworks_text = ""
+    themes = themes or detect_themes(case_focus, subject, learning_outcomes)
+    frameworks_text = themes.frameworks("frameworks_part2")
 
-    return f"""
-You are a top Harvard Business School case writer.
-
-Continue the following case with the SECOND HALF. Start with "CENTRAL CHALLENGE" and cover all remaining Harvard MBA case sections, totaling 2500-3500 words.
+    reference = f"""
+## CASE PART 1 (reference for consistency):
+{part1_text}
+"""
+    instructions = f"""
+Continue the case above with the SECOND HALF. Start with "CENTRAL CHALLENGE" and cover all remaining Harvard MBA case sections, totaling 2500-3500 words.
 
 ## STRUCTURE & WORD COUNT:
 4. **CENTRAL CHALLENGE** (800-1000 words)
@@ -162,37 +230,135 @@ Continue the following case with the SECOND HALF. Start with "CENTRAL CHALLENGE"
    - Executive summary, learning objectives, teaching plan, questions, sample responses, frameworks.
 9. **REFERENCES** (20+ APA7, real sources only)
 
-{extra_sections}
 {frameworks_text}
 
 **REQUIREMENTS:**
-- Continue in the same style, timeline, narrative and facts as the first half (see below).
-- Use only the real financial data below (see table).
+- Continue in the same style, timeline, narrative and facts as the first half (see above).
+- Use only the real financial data above (see table).
 - All facts, dates, names, numbers, quotes, claims MUST be APA7-cited in-text.
 - Use compelling, vivid Harvard narrative.
 - DO NOT recap or repeat previous sections; continue as seamless case.
 
-## CASE PART 1 (reference for consistency):  
-{part1_text}
-
-## INPUTS FOR THIS CASE:
-Course: {subject}
-Learning Outcomes: {learning_outcomes}
-Case Focus: {case_focus}
-Company: {industry_company}
-Case Type: {case_type}
-
-## FINANCIAL DATA (from Yahoo Finance, millions USD):
-{financials_table}
-
-## VERIFIED FACTS AND TIMELINE (from Perplexity):
-{facts}
-
 **WARNING:**
 - This is the final section. Absolutely no solution or answer to the challenge.
 - If you lack data for any section, insert “[Not enough data for this section]”.
 
 **BEGIN SECOND HALF.**
 """
+    context = build_case_context(
+        subject, learning_outcomes, case_focus, industry_company, case_type, financials_table, facts, peer_table, themes
+    )
+    return CasePrompt(system=SYSTEM_PROMPT, context=context, instructions=instructions, reference=reference)
 
 
+def prompt_outline(
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    financials_table: str,
+    facts: str,
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
+) -> CasePrompt:
+    """Compose the prompt for a short structured outline of the whole case."""
+
+    section_lines = "\n".join(f"{section.number}. {section.title} ({section.length})" for section in CASE_SECTIONS)
+    instructions = f"""
+Your task: Plan a full, authentic Harvard MBA case. Do NOT write the case itself — write a compact OUTLINE (max 800 words) that several writers will follow in parallel, one section each.
+
+Use exactly these headings:
+PROTAGONIST: name, role, background, and the inner tension they face.
+TIMELINE: dated bullet list of the key events the case relies on (real, cited facts only).
+DILEMMA: the central decision, the alternatives, and what is at stake. No solution.
+EXHIBITS: numbered list of 6–8 exhibits (title, data shown, source).
+SECTION PLAN: for each section below, 2–4 bullets of what it must cover and which timeline events and exhibits it uses.
+
+Sections:
+{section_lines}
+"""
+    context = build_case_context(
+        subject, learning_outcomes, case_focus, industry_company, case_type, financials_table, facts, peer_table, themes
+    )
+    return CasePrompt(system=SYSTEM_PROMPT, context=context, instructions=instructions)
+
+
+def prompt_section(
+    section: CaseSection,
+    outline: str,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    financials_table: str,
+    facts: str,
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
+) -> CasePrompt:
+    """Compose the prompt for writing one case section from the shared outline."""
+
+    reference = f"""
+## CASE OUTLINE (shared by all section writers; follow it exactly):
+{outline}
+"""
+    instructions = f"""
+Your task: Write ONLY section {section.number}, **{section.title}** ({section.length}), of the Harvard MBA case planned in the outline above. Other writers are writing the other sections at the same time.
+
+- Start with the heading "{section.number}. {section.title}" and stop at the end of this section.
+- Cover: {section.guidance}
+- Stay consistent with the outline's protagonist, timeline, dilemma and exhibit numbering.
+- Use only the real financial data above (see table).
+- All facts, dates, names, numbers, quotes, claims MUST be APA7-cited in-text.
+- Use a compelling, vivid Harvard narrative; never give a solution to the dilemma.
+- If you lack data for this section, insert “[Not enough data for this section]”.
+"""
+    context = build_case_context(
+        subject, learning_outcomes, case_focus, industry_company, case_type, financials_table, facts, peer_table, themes
+    )
+    return CasePrompt(system=SYSTEM_PROMPT, context=context, instructions=instructions, reference=reference,
+                      cache_reference=True)
+
+
+def prompt_section_rewrite(
+    section: CaseSection,
+    excerpts: str,
+    note: str,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    financials_table: str,
+    facts: str,
+    peer_table: str = "",
+    themes: Optional[ThemeAnalysis] = None,
+) -> CasePrompt:
+    """Compose the prompt for rewriting one section of a finished case.
+
+    ``excerpts`` holds the parts of the rest of the case the section must
+    agree with (see ``RELATED_SECTIONS``); ``note`` is the instructor's
+    optional request for the new version.
+    """
+
+    reference = f"""
+## EXCERPTS FROM THE REST OF THE CASE (unchanged; stay consistent with them):
+{excerpts or "- None."}
+"""
+    request = f"\n- The instructor asked for this rewrite: {note.strip()}" if note.strip() else ""
+    instructions = f"""
+Your task: Write ONLY section {section.number}, **{section.title}** ({section.length}), as a new version of that section of the Harvard MBA case excerpted above. All other sections stay as they are.
+
+- Start with the heading "{section.number}. {section.title}" and stop at the end of this section.
+- Cover: {section.guidance}
+- Stay consistent with the excerpts' protagonist, timeline, facts, figures and exhibit numbering.{request}
+- Use only the real financial data above (see table).
+- All facts, dates, names, numbers, quotes, claims MUST be APA7-cited in-text.
+- Use a compelling, vivid Harvard narrative; never give a solution to the dilemma.
+- If you lack data for this section, insert “[Not enough data for this section]”.
+"""
+    context = build_case_context(
+        subject, learning_outcomes, case_focus, industry_company, case_type, financials_table, facts, peer_table, themes
+    )
+    return CasePrompt(system=SYSTEM_PROMPT, context=context, instructions=instructions, reference=reference)
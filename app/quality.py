@@ -1,22 +1,308 @@
-"""Lightweight quality checks for generated case text."""
+"""Quality analysis for generated case text.
+
+``QualityAnalyzer`` makes a single pass over the case, line by line, and can
+be fed streamed chunks as they arrive. It tracks per-section word counts
+against the targets in ``CASE_SECTIONS``, APA7 in-text citations, distinct
+exhibits, reference-list entries and focus-theme keyword coverage, and returns a
+structured ``QualityReport``. All patterns are compiled once at import.
+``split_sections`` uses the same heading rules to store a case section by
+section.
+"""
 
 from __future__ import annotations
 
-from typing import List
+import copy
+import re
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from .prompts import CASE_SECTIONS, CaseSection
+from .themes import get_theme_table
+
+
+# Fraction of a section's minimum target below which it is flagged as too short.
+MIN_SECTION_RATIO = 0.5
+
+_NAME = r"(?:[A-Z][A-Za-z.'’\-]+)(?:\s+(?:[A-Z][A-Za-z.'’\-]+|of|for|and|the|&))*"
+_AUTHORS = rf"{_NAME}(?:\s+et\s+al\.)?(?:,\s*(?:&\s*)?{_NAME}(?:\s+et\s+al\.)?)*"
+_YEAR = r"(?:(?:19|20)\d{2}[a-z]?|n\.d\.)"
+_LOCATOR = r"(?:,\s*(?:pp?\.|para\.)\s*[\w–-]+)?"
+
+_PAREN_RE = re.compile(r"\(([^()\n]{4,300})\)")
+_CITATION_ITEM_RE = re.compile(rf"(?:see\s+(?:also\s+)?|e\.g\.,\s*|cf\.\s+)?{_AUTHORS},\s*{_YEAR}{_LOCATOR}")
+_NARRATIVE_RE = re.compile(rf"\b{_AUTHORS}\s+\({_YEAR}{_LOCATOR}\)")
+_EXHIBIT_RE = re.compile(r"\b(?:Exhibit|Таблиця)\s+(\d+)", re.IGNORECASE)
+_REFERENCE_RE = re.compile(rf"^\s*(?:[-*•]\s*|\d+[.)]\s*)?[A-Z][^\n]{{0,300}}?\({_YEAR}(?:,[^)]*)?\)\.")
+_FINANCE_RE = re.compile(r"\$\s?\d|\b(?:million|billion)\b", re.IGNORECASE)
+_WORD_RE = re.compile(r"\S+")
+_WORD_TARGET_RE = re.compile(r"(\d+)\s*[-–]\s*(\d+)\s+words")
+_COUNT_TARGET_RE = re.compile(r"(\d+)(?:\s*[-–]\s*(\d+))?")
+_HEADING_RE = re.compile(
+    r"^\s*(?:#{1,6}\s*)?(?:\*\*)?\s*(?:(?:section\s+)?(\d)[.):]?\s*)?(?:\*\*)?\s*("
+    + "|".join(re.escape(section.title) for section in CASE_SECTIONS)
+    + r")\b[\s*:.\-–—]*(?:\([^)]*\))?[\s*]*$",
+    re.IGNORECASE,
+)
+_SECTIONS_BY_TITLE = {section.title.lower(): section for section in CASE_SECTIONS}
+_EXHIBITS_SECTION = 7
+_REFERENCES_SECTION = 9
+
+
+def apa_citations(line: str) -> List[str]:
+    """Return APA7 in-text citations: ``(Author, 2020; Other et al., 2019a)`` and ``Author (2020)``."""
+
+    citations = [match.group(0) for match in _NARRATIVE_RE.finditer(line)]
+    for group in _PAREN_RE.findall(line):
+        citations += [item.strip() for item in group.split(";") if _CITATION_ITEM_RE.fullmatch(item.strip())]
+    return citations
+
+
+def count_apa_citations(line: str) -> int:
+    """Count APA7 in-text citations in ``line`` (see ``apa_citations``)."""
+
+    return len(apa_citations(line))
+
+
+def section_targets(section: CaseSection) -> Tuple[int, int]:
+    """Return (min, max) target for a section: words, or exhibits/references for 7 and 9."""
+
+    words = _WORD_TARGET_RE.search(section.length)
+    if words:
+        return int(words.group(1)), int(words.group(2))
+    count = _COUNT_TARGET_RE.search(section.length)
+    if not count:
+        return 0, 0
+    return int(count.group(1)), int(count.group(2) or 0)
+
+
+@dataclass
+class SectionReport:
+    """Measurements for one case section against its target."""
+
+    number: int
+    title: str
+    found: bool
+    words: int
+    target_min: int
+    target_max: int
+    unit: str = "words"
+    measured: int = 0
+
+    @property
+    def ok(self) -> bool:
+        return self.found and self.measured >= self.target_min * MIN_SECTION_RATIO
+
+    @property
+    def status(self) -> str:
+        if not self.found:
+            return "missing"
+        if not self.ok:
+            return "too short"
+        if self.target_max and self.measured > self.target_max * 1.5:
+            return "too long"
+        return "ok"
+
+
+@dataclass
+class QualityReport:
+    """Structured quality results for a case (or a case in progress)."""
+
+    sections: List[SectionReport]
+    citations: int
+    exhibits: int
+    references: int
+    finance_present: bool
+    theme_coverage: Dict[str, int]
+    words: int
+
+    @property
+    def issues(self) -> List[str]:
+        issues = [f"{section.number}. {section.title} {section.status}"
+                  for section in self.sections if section.status != "ok"]
+        if not self.citations:
+            issues.append("APA citations")
+        if not self.finance_present:
+            issues.append("Finance data")
+        issues += [f"Theme '{theme}'" for theme, hits in self.theme_coverage.items() if not hits]
+        return issues
+
+    @property
+    def ok(self) -> bool:
+        return not self.issues
+
+    def failing_sections(self) -> List[int]:
+        """Numbers of sections that are missing or well below target."""
+
+        return [section.number for section in self.sections if not section.ok]
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        for section, entry in zip(self.sections, data["sections"]):
+            entry["status"] = section.status
+        data["issues"] = self.issues
+        return data
+
+    def summary(self) -> str:
+        """Render the report as the short text block appended to a case."""
+
+        headline = "✅ Case passes core quality checks!" if self.ok else "⚠️ Issues: " + ", ".join(self.issues)
+        sections = ", ".join(
+            f"{section.number}:{section.measured}/{section.target_min}-{section.target_max or '+'}"
+            + ("" if section.unit == "words" else f" {section.unit}")
+            for section in self.sections
+        )
+        themes = ", ".join(f"{theme} {hits}" for theme, hits in self.theme_coverage.items()) or "none"
+        return (
+            f"{headline}\n"
+            f"[Sections: {sections}]\n"
+            f"[APA citations: {self.citations} | Exhibits: {self.exhibits} | References: {self.references}"
+            f" | Theme mentions: {themes}]"
+        )
+
+
+@dataclass
+class _Tally:
+    section: Optional[CaseSection] = None
+    found: Dict[int, bool] = field(default_factory=dict)
+    words: Dict[int, int] = field(default_factory=dict)
+    exhibits_by_section: Dict[int, Set[str]] = field(default_factory=dict)
+    exhibits: Set[str] = field(default_factory=set)
+    references: int = 0
+    citations: int = 0
+    finance: bool = False
+    themes: Dict[str, int] = field(default_factory=dict)
+    total_words: int = 0
+
+
+class QualityAnalyzer:
+    """Incremental single-pass analyzer; ``feed`` chunks, then call ``report``.
+
+    Lines are analyzed once, as soon as they are complete. ``sections``
+    limits which sections are expected (e.g. only those written so far).
+    """
+
+    def __init__(self, focus_themes: Iterable[str] = (), sections: Optional[List[CaseSection]] = None) -> None:
+        self.sections = sections if sections is not None else CASE_SECTIONS
+        table = get_theme_table()
+        self._themes = {theme: table.pattern(theme) for theme in focus_themes}
+        self._tally = _Tally(themes={theme: 0 for theme in self._themes})
+        self._pending = ""
+
+    def feed(self, chunk: str) -> None:
+        """Analyze the complete lines of ``chunk`` (joined with any pending partial line)."""
+
+        lines = (self._pending + chunk).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._line(self._tally, line)
+
+    def _line(self, tally: _Tally, line: str) -> None:
+        heading = _HEADING_RE.match(line)
+        if heading:
+            tally.section = _SECTIONS_BY_TITLE[heading.group(2).lower()]
+            tally.found[tally.section.number] = True
+            return
+        words = len(_WORD_RE.findall(line))
+        if not words:
+            return
+        tally.total_words += words
+        number = tally.section.number if tally.section else 0
+        tally.words[number] = tally.words.get(number, 0) + words
+        for exhibit in _EXHIBIT_RE.findall(line):
+            tally.exhibits.add(exhibit)
+            tally.exhibits_by_section.setdefault(number, set()).add(exhibit)
+        if number == _REFERENCES_SECTION:
+            if _REFERENCE_RE.match(line):
+                tally.references += 1
+        else:
+            tally.citations += count_apa_citations(line)
+        if not tally.finance and _FINANCE_RE.search(line):
+            tally.finance = True
+        for theme, pattern in self._themes.items():
+            tally.themes[theme] += len(pattern.findall(line))
+
+    def report(self) -> QualityReport:
+        """Return the report for everything fed so far, including a trailing partial line."""
+
+        tally = self._tally
+        if self._pending:
+            tally = copy.deepcopy(tally)
+            self._line(tally, self._pending)
+        sections = []
+        for section in self.sections:
+            target_min, target_max = section_targets(section)
+            words = tally.words.get(section.number, 0)
+            if section.number == _EXHIBITS_SECTION:
+                # Exhibits may be placed inline, so fall back to all exhibits in the case.
+                unit = "exhibits"
+                measured = len(tally.exhibits_by_section.get(section.number, ())) or len(tally.exhibits)
+            elif section.number == _REFERENCES_SECTION:
+                unit, measured = "references", tally.references
+            else:
+                unit, measured = "words", words
+            found = tally.found.get(section.number, False)
+            sections.append(SectionReport(section.number, section.title, found, words, target_min, target_max,
+                                          unit, measured))
+        return QualityReport(
+            sections=sections,
+            citations=tally.citations,
+            exhibits=len(tally.exhibits),
+            references=tally.references,
+            finance_present=tally.finance,
+            theme_coverage=dict(tally.themes),
+            words=tally.total_words,
+        )
+
+
+def analyze_case(case_text: str, focus_themes: Iterable[str] = ()) -> QualityReport:
+    """Analyze a complete case in one pass."""
+
+    analyzer = QualityAnalyzer(focus_themes)
+    analyzer.feed(case_text)
+    return analyzer.report()
+
+
+def check_section(section: CaseSection, text: str) -> SectionReport:
+    """Analyze one separately written section (outline mode) against its target."""
+
+    analyzer = QualityAnalyzer(sections=[section])
+    # Start inside the section, whether or not the writer repeated its heading.
+    analyzer.feed(f"{section.title}\n{text}")
+    return analyzer.report().sections[0]
+
+
+def split_sections(case_text: str) -> Dict[int, str]:
+    """Split a case into section texts keyed by section number, headings included.
+
+    Text before the first heading (e.g. a title) is kept under 0. A repeated
+    heading stays inside the section it appears in.
+    """
+
+    lines: Dict[int, List[str]] = {}
+    number = 0
+    for line in case_text.split("\n"):
+        heading = _HEADING_RE.match(line)
+        if heading:
+            found = _SECTIONS_BY_TITLE[heading.group(2).lower()].number
+            if found not in lines:
+                number = found
+        lines.setdefault(number, []).append(line)
+    sections = {number: "\n".join(section_lines).strip() for number, section_lines in lines.items()}
+    return {number: text for number, text in sections.items() if text}
+
 
+def join_sections(sections: Dict[int, str]) -> str:
+    """Stitch section texts back together in document order."""
 
-def quick_quality_check(case_text: str, focus_themes: List[str]) -> str:
-    """Run a few heuristic checks on the generated case text."""
+    return "\n\n".join(sections[number].strip() for number in sorted(sections) if sections[number].strip())
 
-    checks = {
-        "APA citations": ("(" in case_text and ")" in case_text),
-        "Framework mentioned": any(theme in case_text.lower() for theme in focus_themes),
-        "Exhibits": ("exhibit" in case_text.lower() or "таблиця" in case_text.lower()),
-        "Finance present": ("$" in case_text or "million" in case_text.lower()),
-    }
-    missing = [name for name, ok in checks.items() if not ok]
-    if not missing:
-        return "✅ Case passes core quality checks!"
-    return "⚠️ Missing: " + ", ".join(missing)
 
+def exhibit_mentions(text: str) -> List[str]:
+    """Return the distinct lines of ``text`` that mention an exhibit."""
 
+    mentions: List[str] = []
+    for line in text.splitlines():
+        line = line.strip()
+        if _EXHIBIT_RE.search(line) and line not in mentions:
+            mentions.append(line)
+    return mentions
@@ -0,0 +1,343 @@
+"""Client-side rate control for the upstream LLM providers.
+
+Each provider (``anthropic``, ``perplexity``) gets one ``RateLimiter`` per
+process. It combines:
+
+- a request token bucket sized from the provider's rate-limit headers
+  (``anthropic-ratelimit-*`` or ``x-ratelimit-*``), with a pause until the
+  reported reset when requests or tokens run out;
+- ``retry-after`` on 429/529, which pauses every caller, not just the one
+  that was throttled;
+- an AIMD concurrency limit: +1 per window of successful requests, halved
+  (at most once per pause) on a throttling response;
+- a fair queue: waiting requests are granted round-robin across clients
+  (one per UI session or batch run), so one user's burst cannot starve others.
+"""
+
+from __future__ import annotations
+
+import random
+import threading
+import time
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import TYPE_CHECKING, Deque, Dict, List, Mapping, Optional, Tuple
+
+from .config import get_config
+from .metrics import register_collector
+
+if TYPE_CHECKING:
+    import requests
+
+
+THROTTLE_STATUSES = frozenset({429, 529})
+DECREASE_FACTOR = 0.5
+# Pause before the server-reported reset once less than this share of a token budget is left.
+TOKEN_RESERVE = 0.05
+LIMIT_KINDS = ("requests", "tokens", "input-tokens", "output-tokens")
+DEFAULT_CLIENT = "default"
+
+
+def _parse_reset(value: Optional[str], now: float) -> Optional[float]:
+    """Seconds until a reset given as RFC 3339 time, seconds, or a duration like ``1m30s``."""
+
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, datetime.fromisoformat(value.replace("Z", "+00:00")).timestamp() - now)
+    except ValueError:
+        pass
+    seconds, number = 0.0, ""
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    index = 0
+    while index < len(value):
+        char = value[index]
+        if char.isdigit() or char == ".":
+            number += char
+            index += 1
+            continue
+        unit = "ms" if value.startswith("ms", index) else char
+        if unit not in units or not number:
+            return None
+        seconds += float(number) * units[unit]
+        number = ""
+        index += len(unit)
+    return seconds if not number else None
+
+
+def _int_header(headers: Mapping[str, str], name: str) -> Optional[int]:
+    try:
+        return int(headers[name])
+    except (KeyError, ValueError):
+        return None
+
+
+@dataclass
+class _Budget:
+    """One rate-limit dimension as reported in response headers."""
+
+    kind: str
+    limit: Optional[int]
+    remaining: Optional[int]
+    reset: Optional[float]
+
+
+def read_budgets(headers: Mapping[str, str], now: Optional[float] = None) -> List[_Budget]:
+    """Parse Anthropic-style and OpenAI-style rate-limit headers."""
+
+    now = time.time() if now is None else now
+    budgets = []
+    for kind in LIMIT_KINDS:
+        for limit_name, remaining_name, reset_name in (
+            (f"anthropic-ratelimit-{kind}-limit", f"anthropic-ratelimit-{kind}-remaining",
+             f"anthropic-ratelimit-{kind}-reset"),
+            (f"x-ratelimit-limit-{kind}", f"x-ratelimit-remaining-{kind}", f"x-ratelimit-reset-{kind}"),
+        ):
+            remaining = _int_header(headers, remaining_name)
+            if remaining is None:
+                continue
+            budgets.append(
+                _Budget(kind, _int_header(headers, limit_name), remaining, _parse_reset(headers.get(reset_name), now))
+            )
+            break
+    return budgets
+
+
+class _Ticket:
+    __slots__ = ("granted",)
+
+    def __init__(self) -> None:
+        self.granted = False
+
+
+class Slot:
+    """Permission for one in-flight request; ``release`` it exactly when the request ends."""
+
+    def __init__(self, limiter: "RateLimiter") -> None:
+        self._limiter = limiter
+        self._released = False
+
+    def release(self) -> None:
+        if not self._released:
+            self._released = True
+            self._limiter._release()
+
+
+class RateLimiter:
+    """Token bucket, AIMD concurrency limit and fair queue for one provider."""
+
+    def __init__(
+        self,
+        name: str,
+        *,
+        concurrency: int = 4,
+        max_concurrency: int = 32,
+        requests_per_minute: int = 0,
+        backoff_base: float = 1.0,
+        backoff_max: float = 30.0,
+    ) -> None:
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.concurrency = float(min(max(1, concurrency), self.max_concurrency))
+        self.in_flight = 0
+        self.throttled = 0
+        self._cond = threading.Condition()
+        self._queues: "OrderedDict[str, Deque[_Ticket]]" = OrderedDict()
+        self._paused_until = 0.0
+        self._streak = 0
+        self._backoff = (backoff_base, backoff_max)
+        self._capacity = float(requests_per_minute) if requests_per_minute > 0 else None
+        self._tokens = self._capacity
+        self._refilled = time.monotonic()
+
+    # Queue -----------------------------------------------------------------
+
+    def acquire(self, client_id: Optional[str] = None, timeout: Optional[float] = None) -> Slot:
+        """Wait for a request slot, in turn with other clients.
+
+        Raises ``TimeoutError`` if no slot was granted within ``timeout`` seconds.
+        """
+
+        ticket = _Ticket()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            self._queues.setdefault(client_id or DEFAULT_CLIENT, deque()).append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                now = time.monotonic()
+                wait = self._next_change(now)
+                if deadline is not None:
+                    if now >= deadline:
+                        self._withdraw(client_id or DEFAULT_CLIENT, ticket)
+                        raise TimeoutError(f"{self.name} rate limit: no request slot within {timeout:.0f}s")
+                    wait = deadline - now if wait is None else min(wait, deadline - now)
+                self._cond.wait(wait)
+                self._dispatch()
+        return Slot(self)
+
+    def _withdraw(self, client_id: str, ticket: _Ticket) -> None:
+        queue = self._queues.get(client_id)
+        if queue is not None and ticket in queue:
+            queue.remove(ticket)
+            if not queue:
+                del self._queues[client_id]
+
+    def _refill(self, now: float) -> None:
+        if self._capacity is not None and self._tokens is not None:
+            self._tokens = min(self._capacity, self._tokens + (now - self._refilled) * self._capacity / 60.0)
+        self._refilled = now
+
+    def _next_change(self, now: float) -> Optional[float]:
+        """Seconds until a paused or empty bucket could admit a request (``None``: wait for a release)."""
+
+        if now < self._paused_until:
+            return self._paused_until - now
+        if self._capacity and self._tokens is not None and self._tokens < 1:
+            return (1 - self._tokens) * 60.0 / self._capacity
+        return None
+
+    def _dispatch(self) -> None:
+        """Grant queued tickets round-robin across clients while limits allow (lock held)."""
+
+        now = time.monotonic()
+        self._refill(now)
+        granted = False
+        while self._queues and self.in_flight < int(self.concurrency) and now >= self._paused_until:
+            if self._tokens is not None and self._tokens < 1:
+                break
+            client_id, queue = next(iter(self._queues.items()))
+            queue.popleft().granted = True
+            if queue:
+                self._queues.move_to_end(client_id)
+            else:
+                del self._queues[client_id]
+            self.in_flight += 1
+            if self._tokens is not None:
+                self._tokens -= 1
+            granted = True
+        if granted:
+            self._cond.notify_all()
+
+    def _release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._dispatch()
+
+    # Feedback --------------------------------------------------------------
+
+    def observe(self, response: "requests.Response") -> None:
+        """Adapt limits to a response: its rate-limit headers and whether it was throttled."""
+
+        now = time.monotonic()
+        budgets = read_budgets(response.headers)
+        with self._cond:
+            # Judged before this response's own budget headers can start a pause.
+            new_episode = now >= self._paused_until
+            for budget in budgets:
+                self._apply_budget(budget, now)
+            if response.status_code in THROTTLE_STATUSES:
+                self._throttle(response.headers.get("retry-after"), now, new_episode)
+            elif response.status_code < 400:
+                self._streak = 0
+                self.concurrency = min(self.max_concurrency, self.concurrency + 1.0 / self.concurrency)
+            self._dispatch()
+
+    def _apply_budget(self, budget: _Budget, now: float) -> None:
+        if budget.kind == "requests" and budget.limit:
+            self._capacity = float(budget.limit)
+            self._refill(now)
+            self._tokens = budget.remaining if self._tokens is None else min(self._tokens, budget.remaining)
+        exhausted = budget.remaining is not None and (
+            budget.remaining <= 0
+            or (budget.kind != "requests" and budget.limit and budget.remaining < budget.limit * TOKEN_RESERVE)
+        )
+        if exhausted and budget.reset:
+            self._paused_until = max(self._paused_until, now + budget.reset)
+
+    def _throttle(self, retry_after: Optional[str], now: float, new_episode: bool) -> None:
+        self.throttled += 1
+        # Halve once per throttling episode, not once per response that was already in flight.
+        if new_episode:
+            self.concurrency = max(1.0, self.concurrency * DECREASE_FACTOR)
+        delay = _parse_reset(retry_after, time.time())
+        if delay is None:
+            base, cap = self._backoff
+            delay = random.uniform(base / 2, min(cap, base * (2 ** self._streak)))
+        self._streak += 1
+        self._paused_until = max(self._paused_until, now + delay)
+
+    def saturated(self) -> bool:
+        """Whether requests are waiting or the provider is paused (no spare capacity)."""
+
+        with self._cond:
+            return bool(self._queues) or time.monotonic() < self._paused_until
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._cond:
+            return {
+                "concurrency": self.concurrency,
+                "in_flight": self.in_flight,
+                "queued": sum(len(queue) for queue in self._queues.values()),
+                "paused_seconds": max(0.0, self._paused_until - time.monotonic()),
+                "throttled": self.throttled,
+            }
+
+
+_limiters: Dict[str, RateLimiter] = {}
+_limiters_lock = threading.Lock()
+
+
+def get_limiter(provider: str) -> RateLimiter:
+    """Return the process-wide limiter for a provider, creating it on first use."""
+
+    with _limiters_lock:
+        limiter = _limiters.get(provider)
+        if limiter is None:
+            config = get_config()
+            rpm = {"anthropic": config.anthropic_rpm, "perplexity": config.perplexity_rpm}.get(provider, 0)
+            limiter = RateLimiter(
+                provider,
+                concurrency=config.rate_limit_concurrency,
+                max_concurrency=config.rate_limit_max_concurrency,
+                requests_per_minute=rpm,
+                backoff_base=config.http_backoff_base,
+                backoff_max=config.http_backoff_max,
+            )
+            _limiters[provider] = limiter
+        return limiter
+
+
+def limiter_snapshots() -> List[Tuple[str, Dict[str, float]]]:
+    """Return the state of every limiter created so far, by provider name."""
+
+    with _limiters_lock:
+        limiters = sorted(_limiters.items())
+    return [(name, limiter.snapshot()) for name, limiter in limiters]
+
+
+_GAUGES = (
+    ("concurrency", "gauge", "Current AIMD concurrency limit."),
+    ("in_flight", "gauge", "Requests currently in flight."),
+    ("queued", "gauge", "Requests waiting for a slot."),
+    ("paused_seconds", "gauge", "Seconds until the provider pause ends."),
+    ("throttled", "counter", "Throttling responses (429/529) received."),
+)
+
+
+def _render_metrics() -> List[str]:
+    snapshots = limiter_snapshots()
+    lines: List[str] = []
+    for field, kind, description in _GAUGES:
+        metric = f"casegen_ratelimit_{field}" + ("_total" if kind == "counter" else "")
+        lines += [f"# HELP {metric} {description}", f"# TYPE {metric} {kind}"]
+        lines += [f'{metric}{{provider="{name}"}} {values[field]:g}' for name, values in snapshots]
+    return lines
+
+
+register_collector(_render_metrics)
@@ -0,0 +1,342 @@
+"""Model routing with hedged requests across LLM backends.
+
+A model is named ``provider:model`` (a bare name means Anthropic), and each
+provider is a ``ModelBackend`` that streams text for a ``CasePrompt``. The
+router streams from the primary model (``CLAUDE_MODEL``); if its first token
+has not arrived within the hedge budget, it also starts the fallback model
+(``FALLBACK_MODEL``) and keeps whichever streams its first token first,
+cancelling the other. No hedge is sent while the fallback's provider is
+saturated (requests queued in its rate limiter). A primary that fails
+before its first token falls back directly.
+
+Time to first token and total duration are tracked per model. Once the
+primary has ``HEDGE_MIN_SAMPLES`` samples, the budget is its
+``HEDGE_PERCENTILE`` first-token latency, capped at ``HEDGE_AFTER``.
+"""
+
+from __future__ import annotations
+
+import contextvars
+import queue
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Iterator, List, Optional, Tuple, Union
+
+from . import http_client
+from .anthropic_client import stream_claude
+from .config import AppConfig, get_config
+from .metrics import register_collector
+from .prompts import CasePrompt
+from .ratelimit import get_limiter
+
+
+DEFAULT_PROVIDER = "anthropic"
+LATENCY_WINDOW = 200
+LATENCY_QUANTILES = (50, 95, 99)
+MIN_HEDGE_BUDGET = 1.0
+# How often to check whether a primary still queued for a rate-limit slot has been sent.
+SEND_POLL_INTERVAL = 0.05
+
+
+def parse_model(spec: str) -> Tuple[str, str]:
+    """Split ``provider:model`` into (provider, model); a bare model is Anthropic."""
+
+    provider, sep, model = spec.partition(":")
+    return (provider, model) if sep else (DEFAULT_PROVIDER, spec)
+
+
+class ModelBackend:
+    """A provider that streams the text of one completion."""
+
+    def stream(
+        self,
+        model: str,
+        prompt: Union[str, CasePrompt],
+        *,
+        max_tokens: int,
+        temperature: float,
+        usage: Dict[str, int],
+        client_id: Optional[str],
+        cancel: http_client.Cancellation,
+    ) -> Iterator[str]:
+        raise NotImplementedError
+
+
+class AnthropicBackend(ModelBackend):
+    """Claude Messages API (streaming, with prompt caching)."""
+
+    def stream(
+        self,
+        model: str,
+        prompt: Union[str, CasePrompt],
+        *,
+        max_tokens: int,
+        temperature: float,
+        usage: Dict[str, int],
+        client_id: Optional[str],
+        cancel: http_client.Cancellation,
+    ) -> Iterator[str]:
+        return stream_claude(
+            get_config().claude_api_key, prompt, model=model, max_tokens=max_tokens, temperature=temperature,
+            usage=usage, client_id=client_id, cancel=cancel,
+        )
+
+
+class PerplexityBackend(ModelBackend):
+    """Perplexity chat completions (OpenAI-compatible, answered in one chunk)."""
+
+    def stream(
+        self,
+        model: str,
+        prompt: Union[str, CasePrompt],
+        *,
+        max_tokens: int,
+        temperature: float,
+        usage: Dict[str, int],
+        client_id: Optional[str],
+        cancel: http_client.Cancellation,
+    ) -> Iterator[str]:
+        config = get_config()
+        if not config.perplexity_api_key:
+            yield "API Error: Missing PERPLEXITY_API_KEY"
+            return
+        if isinstance(prompt, str):
+            messages = [{"role": "user", "content": prompt}]
+        else:
+            user = "\n\n".join(part for part in (prompt.context, prompt.reference, prompt.instructions) if part)
+            messages = [{"role": "system", "content": prompt.system}, {"role": "user", "content": user}]
+        headers = {"Authorization": f"Bearer {config.perplexity_api_key}", "Content-Type": "application/json"}
+        body = {"model": model, "messages": messages, "max_tokens": max_tokens, "temperature": temperature}
+        response = http_client.post(
+            config.perplexity_url, headers=headers, json=body, provider="perplexity", client_id=client_id,
+            cancel=cancel,
+        )
+        if response.status_code != 200:
+            yield f"API Error: {response.status_code}. Response: {response.text[:500]}"
+            return
+        data = response.json()
+        reported = data.get("usage") or {}
+        for field, source in (("input_tokens", "prompt_tokens"), ("output_tokens", "completion_tokens")):
+            if isinstance(reported.get(source), int):
+                usage[field] = usage.get(field, 0) + reported[source]
+        choices = data.get("choices") or [{}]
+        yield choices[0].get("message", {}).get("content", "")
+
+
+BACKENDS: Dict[str, ModelBackend] = {
+    "anthropic": AnthropicBackend(),
+    "perplexity": PerplexityBackend(),
+}
+
+
+def _percentile(samples: List[float], q: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+class LatencyTracker:
+    """Rolling first-token and total latencies per model."""
+
+    def __init__(self, window: int = LATENCY_WINDOW) -> None:
+        self._lock = threading.Lock()
+        self._window = window
+        self._samples: Dict[Tuple[str, str], Deque[float]] = {}
+
+    def record(self, model: str, kind: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault((model, kind), deque(maxlen=self._window)).append(seconds)
+
+    def samples(self, model: str, kind: str) -> List[float]:
+        with self._lock:
+            return list(self._samples.get((model, kind), ()))
+
+    def percentile(self, model: str, kind: str, q: float) -> Optional[float]:
+        samples = self.samples(model, kind)
+        return _percentile(samples, q) if samples else None
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = sorted((key, list(values)) for key, values in self._samples.items())
+        lines = [
+            "# HELP casegen_model_latency_seconds Rolling LLM latency per model (ttft: time to first token).",
+            "# TYPE casegen_model_latency_seconds summary",
+        ]
+        for (model, kind), values in series:
+            labels = f'model="{model}",kind="{kind}"'
+            lines += [
+                f'casegen_model_latency_seconds{{{labels},quantile="{q / 100:g}"}} {_percentile(values, q):.4f}'
+                for q in LATENCY_QUANTILES
+            ]
+            lines.append(f"casegen_model_latency_seconds_sum{{{labels}}} {sum(values):.4f}")
+            lines.append(f"casegen_model_latency_seconds_count{{{labels}}} {len(values)}")
+        return lines
+
+
+latencies = LatencyTracker()
+register_collector(latencies.render)
+
+
+def hedge_budget(config: AppConfig) -> float:
+    """Seconds to wait for the primary model's first token before hedging."""
+
+    samples = latencies.samples(config.claude_model, "ttft")
+    if len(samples) < config.hedge_min_samples:
+        return config.hedge_after
+    return min(config.hedge_after, max(MIN_HEDGE_BUDGET, _percentile(samples, config.hedge_percentile)))
+
+
+_DONE = object()
+
+
+class _Attempt:
+    """One model streaming on a daemon thread into the router's queue."""
+
+    def __init__(self, spec: str, events: "queue.Queue[Tuple[_Attempt, Any]]", prompt: Union[str, CasePrompt],
+                 max_tokens: int, temperature: float, client_id: Optional[str]) -> None:
+        self.spec = spec
+        self.usage: Dict[str, int] = {}
+        self.cancel = http_client.Cancellation()
+        self.first_token: Optional[float] = None
+        self._events = events
+        provider, model = parse_model(spec)
+        backend = BACKENDS.get(provider)
+        if backend is None:
+            raise ValueError(f"Unknown model provider {provider!r} in {spec!r}")
+        chunks = backend.stream(model, prompt, max_tokens=max_tokens, temperature=temperature, usage=self.usage,
+                                client_id=client_id, cancel=self.cancel)
+        context = contextvars.copy_context()
+        threading.Thread(target=context.run, args=(self._run, chunks), name=f"casegen-llm-{model}",
+                         daemon=True).start()
+
+    def elapsed(self) -> Optional[float]:
+        """Seconds since the request was sent upstream (``None`` while still queued locally)."""
+
+        sent_at = self.cancel.sent_at
+        return None if sent_at is None else time.perf_counter() - sent_at
+
+    def _run(self, chunks: Iterator[str]) -> None:
+        try:
+            for chunk in chunks:
+                if self.cancel.cancelled:
+                    break
+                if chunk:
+                    self._events.put((self, chunk))
+        except BaseException as exc:  # reported to the router (ignored once cancelled)
+            self._events.put((self, exc))
+        else:
+            self._events.put((self, _DONE))
+        finally:
+            close = getattr(chunks, "close", None)
+            if close is not None:
+                close()
+
+
+def stream_routed(
+    config: AppConfig,
+    prompt: Union[str, CasePrompt],
+    *,
+    max_tokens: int,
+    usage: Optional[Dict[str, int]] = None,
+    client_id: Optional[str] = None,
+    route: Optional[Dict[str, Any]] = None,
+) -> Iterator[str]:
+    """Stream a completion from the primary model, hedged with the fallback model.
+
+    Yields text chunks of the chosen model only, in the same shape as
+    ``stream_claude`` (HTTP errors as one ``API Error`` chunk). The winner's
+    token usage is added to ``usage``; ``route`` receives the chosen
+    ``model`` and whether the request was ``hedged``. The hedge budget and
+    latencies count from when a request is sent, not from time spent
+    queued in the rate limiter.
+    """
+
+    events: "queue.Queue[Tuple[_Attempt, Any]]" = queue.Queue()
+    primary = _Attempt(config.claude_model, events, prompt, max_tokens, config.claude_temperature, client_id)
+    attempts = [primary]
+    fallback_spec = config.fallback_model if config.fallback_model != config.claude_model else ""
+    budget: Optional[float] = hedge_budget(config) if fallback_spec else None
+    winner: Optional[_Attempt] = None
+    failures: Dict[_Attempt, Any] = {}
+
+    def _hedge() -> None:
+        attempts.append(_Attempt(fallback_spec, events, prompt, max_tokens, config.claude_temperature, client_id))
+
+    try:
+        # Race until one attempt streams a real first token (or all have failed).
+        while winner is None:
+            timeout = None
+            if budget is not None:
+                elapsed = primary.elapsed()
+                timeout = SEND_POLL_INTERVAL if elapsed is None else max(0.0, budget - elapsed)
+            try:
+                attempt, event = events.get(timeout=timeout)
+            except queue.Empty:
+                elapsed = primary.elapsed()
+                if elapsed is not None and elapsed >= budget:
+                    budget = None
+                    # Hedges only use spare capacity; under throttling they would add to the backlog.
+                    if not get_limiter(parse_model(fallback_spec)[0]).saturated():
+                        _hedge()
+                continue
+            failed = event is _DONE or isinstance(event, BaseException) or event.startswith("API Error")
+            if not failed:
+                attempt.first_token = attempt.elapsed() or 0.0
+                latencies.record(attempt.spec, "ttft", attempt.first_token)
+                winner = attempt
+                pending = event
+                break
+            failures[attempt] = event
+            if fallback_spec and len(attempts) == 1:
+                budget = None
+                _hedge()
+            elif len(failures) == len(attempts):
+                # Report the primary's error (the fallback's if the primary never failed).
+                error = failures.get(primary, event)
+                if isinstance(error, BaseException):
+                    raise error
+                if error is not _DONE:
+                    yield error
+                return
+
+        for attempt in attempts:
+            if attempt is not winner:
+                attempt.cancel.cancel()
+                elapsed = attempt.elapsed()
+                if attempt not in failures and elapsed is not None:
+                    # A lower bound, but it keeps slow first tokens in the percentile.
+                    latencies.record(attempt.spec, "ttft", elapsed)
+        if route is not None:
+            route.update(model=winner.spec, hedged=len(attempts) > 1, ttft_s=round(winner.first_token, 3))
+        yield pending
+        while True:
+            attempt, event = events.get()
+            if attempt is not winner:
+                continue
+            if event is _DONE:
+                break
+            if isinstance(event, BaseException):
+                raise event
+            yield event
+        latencies.record(winner.spec, "total", winner.elapsed() or 0.0)
+    finally:
+        for attempt in attempts:
+            attempt.cancel.cancel()
+        if winner is not None and usage is not None:
+            for field, count in winner.usage.items():
+                usage[field] = usage.get(field, 0) + count
+
+
+def call_routed(
+    config: AppConfig,
+    prompt: Union[str, CasePrompt],
+    *,
+    max_tokens: int,
+    usage: Optional[Dict[str, int]] = None,
+    client_id: Optional[str] = None,
+    route: Optional[Dict[str, Any]] = None,
+) -> str:
+    """Blocking ``stream_routed``: return the complete text."""
+
+    return "".join(stream_routed(config, prompt, max_tokens=max_tokens, usage=usage, client_id=client_id,
+                                 route=route))
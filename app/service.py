@@ -1,73 +1,837 @@
-"""Application service orchestrating data fetches and LLM calls."""
+"""Application service orchestrating data fetches and LLM calls.
+
+Finished cases are cached section by section, so one section can later be
+rewritten from the stored facts and financials and spliced back in
+(``stream_section_regeneration``) without rerunning the whole pipeline.
+"""
 
 from __future__ import annotations
 
-from typing import List
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from dataclasses import dataclass, field
+from functools import partial
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, TypeVar
 
-from .config import AppConfig
+from .budget import dedupe_facts, fit_prompt, truncate_to_tokens
+from .cache import DiskCache, LeaseTable, content_key
+from .config import AppConfig, get_config
 from .finance import extract_ticker, get_financial_data_yf, format_financials_table
+from .metrics import Stage, annotate, new_trace_id, stage, submit_stage
+from .peers import build_peer_table, fetch_peer_financials, format_peer_table, get_peers
 from .perplexity import build_research_query, search_perplexity
-from .prompts import detect_focus_themes, prompt_part_1, prompt_part_2
-from .anthropic_client import call_claude
-from .quality import quick_quality_check
+from .prompts import (
+    CASE_SECTIONS,
+    RELATED_SECTIONS,
+    CasePrompt,
+    CaseSection,
+    prompt_outline,
+    prompt_part_1,
+    prompt_part_2,
+    prompt_section,
+    prompt_section_rewrite,
+)
+from .quality import (
+    QualityAnalyzer,
+    QualityReport,
+    analyze_case,
+    apa_citations,
+    check_section,
+    exhibit_mentions,
+    join_sections,
+    split_sections,
+)
+from .router import call_routed, stream_routed
+from .themes import ThemeAnalysis, detect_themes
 
+if TYPE_CHECKING:
+    import pandas as pd
 
-def generate_harvard_case_2api(
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+FETCH_STATUS = "⏳ Collecting financial data and research facts..."
+OUTLINE_STATUS = "⏳ Planning the case outline..."
+
+MODE_TWO_PART = "two_part"
+MODE_OUTLINE = "outline"
+GENERATION_MODES = (MODE_TWO_PART, MODE_OUTLINE)
+# Sections 1-3 are written by part 1 in two-part mode, the rest by part 2 (see ``app.prompts``).
+PART1_SECTIONS = 3
+
+CASE_INPUT_FIELDS = ("subject", "learning_outcomes", "case_focus", "industry_company", "case_type")
+# Start of the report appended to a finished case (see ``_finalize_case``).
+REPORT_MARKER = "\n\n[Word count:"
+
+
+@dataclass
+class CaseData:
+    """Inputs and fetched data shared by every Claude call for one case."""
+
+    subject: str
+    learning_outcomes: str
+    case_focus: str
+    industry_company: str
+    case_type: str
+    themes: ThemeAnalysis
+    financials_table: str
+    peer_table: str
+    facts: str
+    errors: Dict[str, str] = field(default_factory=dict)
+    artifacts: Dict[str, Any] = field(default_factory=dict)
+    trace_id: Optional[str] = None
+    client_id: Optional[str] = None
+    # Model that answered each Claude stage (the hedging router may pick the fallback).
+    models: Dict[str, str] = field(default_factory=dict)
+
+    @property
+    def focus_themes(self) -> List[str]:
+        return self.themes.themes
+
+    def used_fallback(self, primary: str) -> bool:
+        """Whether any Claude stage was answered by a model other than ``primary``."""
+
+        return any(model != primary for model in self.models.values())
+
+    @property
+    def prompt_args(self) -> Tuple[str, ...]:
+        """Positional arguments shared by the prompt builders."""
+
+        return (
+            self.subject,
+            self.learning_outcomes,
+            self.case_focus,
+            self.industry_company,
+            self.case_type,
+            self.financials_table,
+            self.facts,
+        )
+
+
+_result_cache: Optional[DiskCache] = None
+_result_cache_lock = threading.Lock()
+
+
+def _get_result_cache() -> DiskCache:
+    """Return the process-wide generated-case cache, creating it on first use."""
+
+    global _result_cache
+    with _result_cache_lock:
+        if _result_cache is None:
+            config = get_config()
+            _result_cache = DiskCache(
+                os.path.join(config.cache_dir, "results.sqlite3"),
+                max_entries=config.result_cache_max_entries,
+            )
+        return _result_cache
+
+
+class SingleFlight:
+    """Share one in-flight call per key among concurrent callers.
+
+    The first caller for a key runs the function; callers arriving while it
+    runs wait for it and receive the same result, or the same exception.
+    Nothing is kept once the call finishes, so a failure is retried by the
+    next caller and fresh results come from the caches below.
+
+    ``leases`` (when it returns a ``LeaseTable``) extends this across
+    processes: the leader first waits while another process holds the key,
+    then calls the function, which then answers from the shared cache.
+    """
+
+    def __init__(self, leases: Optional[Callable[[], Optional[LeaseTable]]] = None) -> None:
+        self._lock = threading.Lock()
+        self._calls: Dict[str, Future] = {}
+        self._leases = leases
+
+    def do(self, key: str, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            future = self._calls.get(key)
+            leader = future is None
+            if leader:
+                future = self._calls[key] = Future()
+        if not leader:
+            annotate(coalesced=True)
+            return future.result()
+        try:
+            leases = self._leases() if self._leases else None
+            if leases is None:
+                result = func(*args, **kwargs)
+            else:
+                with leases.hold(key) as waited:
+                    if waited:
+                        annotate(coalesced=True)
+                    result = func(*args, **kwargs)
+        except BaseException as exc:
+            future.set_exception(exc)
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._calls)
+
+
+_leases: Optional[LeaseTable] = None
+_leases_lock = threading.Lock()
+
+
+def _get_leases() -> Optional[LeaseTable]:
+    """Return the cross-process fetch leases when running several worker processes."""
+
+    global _leases
+    config = get_config()
+    if config.workers <= 1:
+        return None
+    with _leases_lock:
+        if _leases is None:
+            _leases = LeaseTable(os.path.join(config.cache_dir, "leases.sqlite3"))
+        return _leases
+
+
+# Identical fetches from concurrent requests (a class asking for the same company) share one upstream call.
+_fetches = SingleFlight(_get_leases)
+
+
+def _fetch_financials(ticker: str) -> pd.DataFrame:
+    return _fetches.do(f"financials:{ticker.upper()}", get_financial_data_yf, ticker)
+
+
+def _fetch_peers(peers: List[str]) -> Dict[str, pd.DataFrame]:
+    return _fetches.do("peers:" + ",".join(peer.upper() for peer in peers), fetch_peer_financials, peers)
+
+
+def _fetch_research(api_key: Optional[str], query: str, client_id: Optional[str] = None) -> str:
+    # The leader's client ID takes the rate-limit slot for everyone waiting on it.
+    return _fetches.do(f"research:{content_key(query)}", search_perplexity, api_key, query, client_id=client_id)
+
+
+def result_cache_key(config: AppConfig, mode: str, *inputs: str) -> str:
+    """Key a generated case by its normalized inputs, mode, model and temperature."""
+
+    return content_key(mode, config.claude_model, repr(config.claude_temperature), *inputs)
+
+
+def _join_stage(name: str, future: Future, fallback: T, errors: Dict[str, str]) -> T:
+    """Wait for a stage future, recording its error and returning a fallback on failure."""
+
+    try:
+        return future.result()
+    except Exception as exc:  # pragma: no cover - defensive
+        errors[name] = str(exc)
+        return fallback
+
+
+def _api_error(case_text: str) -> Optional[str]:
+    """Return the first ``API Error`` line a Claude stage wrote into ``case_text``, if any."""
+
+    start = case_text.find("API Error")
+    return case_text[start:].split("\n", 1)[0] if start >= 0 else None
+
+
+def _format_stage_errors(errors: Dict[str, str]) -> str:
+    """Render per-stage errors as a short report block."""
+
+    return "\n".join(f"- {stage}: {message}" for stage, message in errors.items())
+
+
+def collect_case_data(
     config: AppConfig,
     subject: str,
     learning_outcomes: str,
     case_focus: str,
     industry_company: str,
     case_type: str,
-) -> str:
-    """Generate a full Harvard-style case using Perplexity + Anthropic."""
+    trace_id: Optional[str] = None,
+    client_id: Optional[str] = None,
+) -> CaseData:
+    """Fetch financials, peers and research facts for a case.
 
-    try:
+    The Yahoo Finance fetch, the peer-group fetch and the Perplexity research
+    call are independent, so they run concurrently, and each is shared with
+    concurrent requests for the same ticker or query. A failing stage degrades
+    to a placeholder and is recorded in ``CaseData.errors``. Each stage is
+    timed under ``trace_id`` (see ``app.metrics``); ``client_id`` is the
+    requester's share of the provider rate limits (see ``app.ratelimit``).
+    """
+
+    errors: Dict[str, str] = {}
+    with stage("ticker", trace_id) as ticker_stage:
         ticker = extract_ticker(industry_company)
-        financial_data_yf = get_financial_data_yf(ticker) if ticker else {}
-        financials_table = format_financials_table(financial_data_yf)
-
-        focus_themes: List[str] = detect_focus_themes(case_focus, subject, learning_outcomes)
-
-        research_query = build_research_query(
-            subject,
-            learning_outcomes,
-            case_focus,
-            industry_company,
-            case_type,
-            "",
+        ticker_stage.annotate(ticker=ticker)
+    themes = detect_themes(case_focus, subject, learning_outcomes)
+    research_query = build_research_query(
+        subject,
+        learning_outcomes,
+        case_focus,
+        industry_company,
+        case_type,
+        "",
+    )
+
+    peers = get_peers(ticker) if ticker else []
+
+    with ThreadPoolExecutor(max_workers=3, thread_name_prefix="casegen-fetch") as pool:
+        financials_future = (
+            submit_stage(pool, "financials", trace_id, _fetch_financials, ticker) if ticker else None
         )
-        facts = search_perplexity(config.perplexity_api_key, research_query)
-
-        prompt1 = prompt_part_1(
-            subject,
-            learning_outcomes,
-            case_focus,
-            industry_company,
-            case_type,
-            financials_table,
-            facts,
+        peers_future = submit_stage(pool, "peers", trace_id, _fetch_peers, peers) if peers else None
+        facts_future = submit_stage(
+            pool, "research", trace_id, partial(_fetch_research, client_id=client_id),
+            config.perplexity_api_key, research_query,
         )
-        part1_text = call_claude(config.claude_api_key, prompt1)
-
-        prompt2 = prompt_part_2(
-            subject,
-            learning_outcomes,
-            case_focus,
-            industry_company,
-            case_type,
-            financials_table,
-            facts,
-            part1_text,
+
+        financial_data_yf = (
+            _join_stage("financials", financials_future, None, errors) if financials_future else None
         )
-        part2_text = call_claude(config.claude_api_key, prompt2)
+        peer_frames = _join_stage("peers", peers_future, {}, errors) if peers_future else {}
+        facts = _join_stage("research", facts_future, "No data found.", errors)
+
+    facts = truncate_to_tokens(dedupe_facts(facts), config.facts_max_tokens)
+    financials_table = format_financials_table(financial_data_yf)
+    peer_table = ""
+    if ticker and financial_data_yf is not None and not financial_data_yf.empty and peer_frames:
+        try:
+            peer_table = format_peer_table(build_peer_table({ticker: financial_data_yf, **peer_frames}))
+        except Exception as exc:  # pragma: no cover - defensive
+            errors["peers"] = str(exc)
+
+    return CaseData(
+        subject=subject,
+        learning_outcomes=learning_outcomes,
+        case_focus=case_focus,
+        industry_company=industry_company,
+        case_type=case_type,
+        themes=themes,
+        financials_table=financials_table,
+        peer_table=peer_table,
+        facts=facts,
+        errors=errors,
+        trace_id=trace_id,
+        client_id=client_id,
+    )
+
+
+def _finalize_case(case_text: str, data: CaseData, analyzer: Optional[QualityAnalyzer] = None) -> str:
+    """Append word count, quality report and any stage errors to a finished case.
+
+    ``analyzer`` is one that was already fed the case while it streamed;
+    otherwise the finished text is analyzed here. The structured report is
+    kept in ``data.artifacts["quality"]``.
+    """
+
+    word_count = len(case_text.split())
+    with stage("quality", data.trace_id) as quality_stage:
+        report: QualityReport = analyzer.report() if analyzer else analyze_case(case_text, data.focus_themes)
+        quality_stage.annotate(issues=len(report.issues), citations=report.citations)
+    data.artifacts["quality"] = report.to_dict()
+    case_text += f"{REPORT_MARKER} {word_count}]\n{report.summary()}"
+    if data.errors:
+        case_text += "\n\n⚠️ Stage errors:\n" + _format_stage_errors(data.errors)
+    return case_text
+
+
+def _finish_claude_stage(
+    claude_stage: Stage,
+    text: str,
+    usage: Dict[str, int],
+    route: Dict[str, Any],
+    error: Optional[BaseException] = None,
+) -> None:
+    """Record output size, token usage and the chosen model on a Claude stage and close it."""
 
-        case_text = part1_text.strip() + "\n\n" + part2_text.strip()
-        word_count = len(case_text.split())
-        quality_report = quick_quality_check(case_text, focus_themes)
-        case_text += f"\n\n[Word count: {word_count}]\n{quality_report}"
-        return case_text
+    claude_stage.annotate(bytes=len(text.encode("utf-8")), **route)
+    claude_stage.add_usage(usage)
+    claude_stage.finish(error)
+
+
+def _call_claude_stage(config: AppConfig, name: str, data: CaseData, prompt: CasePrompt, max_tokens: int) -> str:
+    """Make a blocking (routed, possibly hedged) Claude call for a case, timed as stage ``name``."""
+
+    usage: Dict[str, int] = {}
+    route: Dict[str, Any] = {}
+    with stage(name, data.trace_id) as claude_stage:
+        text = call_routed(config, prompt, max_tokens=max_tokens, usage=usage, client_id=data.client_id, route=route)
+        claude_stage.annotate(bytes=len(text.encode("utf-8")), **route)
+        claude_stage.add_usage(usage)
+    data.models[name] = route.get("model", "")
+    return text
+
+
+def _stream_two_part(config: AppConfig, data: CaseData) -> Iterator[str]:
+    """Write the case as two sequential Claude calls, streaming both.
+
+    After each part, sections the live quality report flags as missing or
+    far below target are rewritten (see ``_repair_sections``).
+    """
+
+    errors = data.errors
+    analyzer = QualityAnalyzer(data.focus_themes)
+    prompt1 = prompt_part_1(*data.prompt_args, peer_table=data.peer_table, themes=data.themes)
+    prompt1 = fit_prompt(prompt1, config.prompt_max_input_tokens, "claude part 1")
+    part1_usage: Dict[str, int] = {}
+    part1_route: Dict[str, Any] = {}
+    part1_text = ""
+    part1_stage = Stage("claude part 1", data.trace_id)
+    try:
+        for chunk in stream_routed(
+            config, prompt1, max_tokens=4096, usage=part1_usage, client_id=data.client_id, route=part1_route
+        ):
+            part1_text += chunk
+            analyzer.feed(chunk)
+            yield part1_text
     except Exception as exc:  # pragma: no cover - defensive
-        return f"Error during case generation: {str(exc)}"
+        _finish_claude_stage(part1_stage, part1_text, part1_usage, part1_route, exc)
+        errors["claude part 1"] = str(exc)
+        yield part1_text + "\n\nError during case generation:\n" + _format_stage_errors(errors)
+        return
+    _finish_claude_stage(part1_stage, part1_text, part1_usage, part1_route)
+    data.models["claude part 1"] = part1_route.get("model", "")
+    failing = [number for number in analyzer.report().failing_sections() if number <= PART1_SECTIONS]
+    if failing and config.section_retries > 0:
+        # Repair part 1 before part 2 is written from it.
+        for part1_text in _repair_sections(config, data, part1_text, failing):
+            yield part1_text
+        analyzer = QualityAnalyzer(data.focus_themes)
+        analyzer.feed(part1_text)
 
+    prompt2 = prompt_part_2(*data.prompt_args, part1_text, peer_table=data.peer_table, themes=data.themes)
+    prompt2 = fit_prompt(prompt2, config.prompt_max_input_tokens, "claude part 2")
+    prefix = part1_text.strip() + "\n\n"
+    analyzer.feed("\n\n")
+    part2_usage: Dict[str, int] = {}
+    part2_route: Dict[str, Any] = {}
+    part2_text = ""
+    part2_stage = Stage("claude part 2", data.trace_id)
+    try:
+        for chunk in stream_routed(
+            config, prompt2, max_tokens=4096, usage=part2_usage, client_id=data.client_id, route=part2_route
+        ):
+            part2_text += chunk
+            analyzer.feed(chunk)
+            yield prefix + part2_text
+    except Exception as exc:  # pragma: no cover - defensive
+        _finish_claude_stage(part2_stage, part2_text, part2_usage, part2_route, exc)
+        errors["claude part 2"] = str(exc)
+        yield prefix + part2_text + "\n\nError during case generation:\n" + _format_stage_errors(errors)
+        return
+    _finish_claude_stage(part2_stage, part2_text, part2_usage, part2_route)
+    data.models["claude part 2"] = part2_route.get("model", "")
+
+    case_text = prefix + part2_text.strip()
+    failing = [number for number in analyzer.report().failing_sections() if number > PART1_SECTIONS]
+    if failing and config.section_retries > 0:
+        for case_text in _repair_sections(config, data, case_text, failing):
+            yield case_text
+        analyzer = None
+    sections = split_sections(case_text)
+    data.artifacts.update({
+        "part1": part1_text,
+        "part2": part2_text,
+        "sections": {str(number): text for number, text in sections.items()},
+    })
+    yield _finalize_case(case_text, data, analyzer)
+
+
+def _repair_sections(config: AppConfig, data: CaseData, case_text: str, numbers: List[int]) -> Iterator[str]:
+    """Rewrite the sections ``numbers`` of a two-part case that came back missing or far below target.
+
+    Each gets up to ``config.section_retries`` rewrites written against the rest of the case (see
+    ``_section_excerpts``). A rewrite is kept only if it measures more than the text it replaces, so a
+    failed or worse one leaves the section as it was. Yields the case after each section; the last
+    value is the repaired case.
+    """
+
+    sections = split_sections(case_text)
+    for number in numbers:
+        section = CASE_SECTIONS[number - 1]
+        name = f"claude section {number}"
+        report = check_section(section, sections.get(number, ""))
+        status = report.status if number in sections else "missing"
+        for attempt in range(max(0, config.section_retries)):
+            logger.info("%s %s (%s %s), rewrite %d", name, status, report.measured, report.unit, attempt + 1)
+            note = f"The first version was {status} ({report.measured} {report.unit}); write the full {section.length}."
+            prompt = fit_prompt(
+                prompt_section_rewrite(section, _section_excerpts(sections, section), note, *data.prompt_args,
+                                       peer_table=data.peer_table, themes=data.themes),
+                config.prompt_max_input_tokens,
+                name,
+            )
+            try:
+                text = _call_claude_stage(config, name, data, prompt, _section_max_tokens(section.max_words))
+            except Exception as exc:  # pragma: no cover - defensive
+                logger.warning("%s rewrite failed: %s", name, exc)
+                break
+            if text.startswith("API Error"):
+                logger.warning("%s rewrite failed: %s", name, text)
+                break
+            rewrite = check_section(section, text)
+            if rewrite.measured > report.measured:
+                sections[number] = text.strip()
+                report, status = rewrite, rewrite.status
+            if report.ok:
+                break
+        yield join_sections(sections)
+
+
+def _section_max_tokens(max_words: int) -> int:
+    """Output token allowance for a section of up to ``max_words`` words."""
+
+    return min(4096, int(max_words * 1.6) + 200)
+
+
+def _stream_outline(config: AppConfig, data: CaseData) -> Iterator[str]:
+    """Write a short outline first, then all sections concurrently from it.
+
+    Sections are stitched in document order; each yield shows the finished
+    sections with placeholders for those still being written.
+    """
+
+    errors = data.errors
+    yield OUTLINE_STATUS
+    outline_prompt = fit_prompt(
+        prompt_outline(*data.prompt_args, peer_table=data.peer_table, themes=data.themes),
+        config.prompt_max_input_tokens,
+        "claude outline",
+    )
+    try:
+        outline = _call_claude_stage(config, "claude outline", data, outline_prompt, 1500)
+    except Exception as exc:  # pragma: no cover - defensive
+        errors["claude outline"] = str(exc)
+        yield "Error during case generation:\n" + _format_stage_errors(errors)
+        return
+    if outline.startswith("API Error"):
+        yield outline
+        return
+
+    texts: Dict[int, Optional[str]] = {section.number: None for section in CASE_SECTIONS}
+
+    def _stitched() -> str:
+        return "\n\n".join(
+            (texts[section.number] or f"[⏳ Writing {section.number}. {section.title}...]").strip()
+            for section in CASE_SECTIONS
+        )
+
+    def _write(section_index: int) -> str:
+        section = CASE_SECTIONS[section_index]
+        name = f"claude section {section.number}"
+        prompt = fit_prompt(
+            prompt_section(section, outline, *data.prompt_args, peer_table=data.peer_table, themes=data.themes),
+            config.prompt_max_input_tokens,
+            name,
+        )
+        # A section that comes back missing or far below its target is rewritten.
+        for attempt in range(max(0, config.section_retries) + 1):
+            text = _call_claude_stage(config, name, data, prompt, _section_max_tokens(section.max_words))
+            report = check_section(section, text)
+            if report.ok or text.startswith("API Error"):
+                break
+            logger.info("%s %s (%s %s), attempt %d", name, report.status, report.measured, report.unit, attempt + 1)
+        return text
+
+    yield _stitched()
+    workers = max(1, config.section_concurrency)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="casegen-section") as pool:
+        futures = {pool.submit(_write, index): section for index, section in enumerate(CASE_SECTIONS)}
+        for future in as_completed(futures):
+            section = futures[future]
+            try:
+                texts[section.number] = future.result()
+            except Exception as exc:  # pragma: no cover - defensive
+                errors[f"claude section {section.number}"] = str(exc)
+                texts[section.number] = f"{section.number}. {section.title}\n[Section failed: {exc}]"
+            yield _stitched()
+
+    data.artifacts.update({"outline": outline, "sections": {str(number): text for number, text in texts.items()}})
+    yield _finalize_case(_stitched(), data)
+
+
+def stream_harvard_case(
+    config: AppConfig,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    mode: Optional[str] = None,
+    force_fresh: bool = False,
+    client_id: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+) -> Iterator[str]:
+    """Generate a Harvard-style case, yielding the accumulated text as it streams.
+
+    ``mode`` selects ``"two_part"`` (two sequential calls) or ``"outline"``
+    (an outline call, then all sections written concurrently) and defaults to
+    ``config.generation_mode``. A failing data stage degrades to a placeholder
+    and is reported at the end of the case; a failing Claude stage stops
+    generation with its error. The last yielded value is the complete case
+    including the quality report.
+
+    Cases generated without errors, and only by the primary model, are
+    cached with their intermediate artifacts (facts, financials, part texts)
+    under their normalized inputs, so an identical request is answered from
+    disk unless ``force_fresh``.
+
+    Every stage, and the case as a whole, is timed and logged under one
+    trace ID (see ``app.metrics``). Upstream calls queue for rate-limit slots
+    as ``client_id`` (e.g. a UI session), defaulting to that trace ID.
+
+    ``errors``, if given, is filled with every stage that failed, including
+    Claude stages that answered with an ``API Error``, so callers can tell a
+    degraded case from a complete one without parsing its text.
+    """
+
+    mode = mode or config.generation_mode
+    trace_id = new_trace_id()
+    inputs = (subject, learning_outcomes, case_focus, industry_company, case_type)
+    key = result_cache_key(config, mode, *inputs)
+    cache = _get_result_cache()
+    if not force_fresh:
+        with stage("result cache", trace_id) as cache_stage:
+            entry = cache.get(key)
+            hit = entry is not None and entry.age < config.result_cache_ttl
+            cache_stage.annotate(cache="hit" if hit else "miss")
+        if hit:
+            yield entry.value["case_text"]
+            return
+
+    case_stage = Stage("case", trace_id)
+    case_stage.annotate(mode=mode)
+    yield FETCH_STATUS
+    try:
+        data = collect_case_data(config, *inputs, trace_id=trace_id, client_id=client_id or trace_id)
+        stream = _stream_outline(config, data) if mode == MODE_OUTLINE else _stream_two_part(config, data)
+        case_text = ""
+        for case_text in stream:
+            yield case_text
+    except BaseException as exc:
+        case_stage.finish(exc)
+        raise
+    case_stage.annotate(bytes=len(case_text.encode("utf-8")), stage_errors=len(data.errors))
+    case_stage.finish()
+    if errors is not None:
+        errors.update(data.errors)
+        api_error = _api_error(case_text)
+        if api_error:
+            errors.setdefault("claude", api_error)
+
+    # Artifacts are only recorded by a stream that ran to completion. The key names the primary
+    # model, so a case (partly) written by the fallback model is not cached under it.
+    if data.errors or not data.artifacts or "API Error" in case_text or data.used_fallback(config.claude_model):
+        return
+    _store_case(cache, key, mode, data, case_text)
+
+
+def _store_case(cache: DiskCache, key: str, mode: str, data: CaseData, case_text: str) -> None:
+    """Cache a finished case with the data and artifacts it was written from."""
+
+    cache.set(
+        key,
+        {
+            "case_text": case_text,
+            "mode": mode,
+            "inputs": {name: getattr(data, name) for name in CASE_INPUT_FIELDS},
+            "facts": data.facts,
+            "financials_table": data.financials_table,
+            "peer_table": data.peer_table,
+            "focus_themes": data.focus_themes,
+            "theme_scores": data.themes.as_dict(),
+            **data.artifacts,
+        },
+    )
+
+
+def generate_harvard_case_2api(
+    config: AppConfig,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    mode: Optional[str] = None,
+    force_fresh: bool = False,
+    client_id: Optional[str] = None,
+    errors: Optional[Dict[str, str]] = None,
+) -> str:
+    """Generate a full Harvard-style case using Perplexity + Anthropic.
+
+    Blocking wrapper around ``stream_harvard_case`` returning the final text;
+    ``errors`` is filled as there.
+    """
+
+    case_text = ""
+    for case_text in stream_harvard_case(
+        config,
+        subject,
+        learning_outcomes,
+        case_focus,
+        industry_company,
+        case_type,
+        mode,
+        force_fresh,
+        client_id,
+        errors,
+    ):
+        pass
+    return case_text
+
+
+def _section_excerpts(sections: Dict[int, str], section: CaseSection, outline: str = "") -> str:
+    """Collect the parts of the rest of the case that a rewritten ``section`` must agree with."""
+
+    blocks = [f"### CASE OUTLINE\n{outline.strip()}"] if outline else []
+    blocks += [sections[number] for number in RELATED_SECTIONS.get(section.number, ()) if number in sections]
+    others = "\n\n".join(text for number, text in sorted(sections.items()) if number != section.number)
+    if section.title == "EXHIBITS":
+        mentions = exhibit_mentions(others)
+        if mentions:
+            blocks.append("### EXHIBIT MENTIONS (keep this numbering)\n" + "\n".join(f"- {line}" for line in mentions))
+    elif section.title == "REFERENCES":
+        citations = list(dict.fromkeys(citation for line in others.splitlines() for citation in apa_citations(line)))
+        if citations:
+            blocks.append("### IN-TEXT CITATIONS (each needs a reference entry)\n"
+                          + "\n".join(f"- {citation}" for citation in citations))
+    return "\n\n".join(blocks)
+
+
+def stream_section_regeneration(
+    config: AppConfig,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    section: int,
+    mode: Optional[str] = None,
+    case_text: Optional[str] = None,
+    note: str = "",
+    client_id: Optional[str] = None,
+) -> Iterator[str]:
+    """Rewrite one section of a generated case, yielding the spliced case as it streams.
+
+    The case is ``case_text`` (e.g. a finished job's text) split into its
+    sections, or the sections cached for these inputs. Facts, financials,
+    peers and any outline come from the cached case; only if it is gone are
+    they fetched again. The prompt carries that context plus the related
+    sections (see ``RELATED_SECTIONS``), not the whole case. The last
+    yielded value is the full case with a fresh quality report, and it
+    replaces the cached case for these inputs.
+
+    If the rewrite fails (an ``API Error`` answer or an exception), the
+    original case is yielded again and the error is raised, so a job fails
+    instead of saving an error message in place of the section.
+    """
+
+    target = next((candidate for candidate in CASE_SECTIONS if candidate.number == int(section)), None)
+    if target is None:
+        raise ValueError(f"Unknown case section: {section!r}")
+    mode = mode or config.generation_mode
+    trace_id = new_trace_id()
+    inputs = (subject, learning_outcomes, case_focus, industry_company, case_type)
+    key = result_cache_key(config, mode, *inputs)
+    cache = _get_result_cache()
+    with stage("result cache", trace_id) as cache_stage:
+        entry = cache.get(key)
+        cache_stage.annotate(cache="hit" if entry is not None else "miss")
+    # The stored case is what the current text was written from, so its data is reused at any age.
+    stored: Dict[str, Any] = entry.value if entry is not None else {}
+    if case_text:
+        sections = split_sections(case_text.split(REPORT_MARKER)[0])
+    else:
+        sections = {int(number): text for number, text in stored.get("sections", {}).items()}
+    if not sections:
+        raise ValueError("No generated case to regenerate a section of; generate the case first.")
+    original = case_text or stored.get("case_text") or join_sections(sections)
+
+    case_stage = Stage("regenerate section", trace_id)
+    case_stage.annotate(mode=mode, section=target.number, cached_data="facts" in stored)
+    client_id = client_id or trace_id
+    try:
+        if "facts" in stored:
+            data = CaseData(
+                *inputs,
+                themes=detect_themes(case_focus, subject, learning_outcomes),
+                financials_table=stored["financials_table"],
+                peer_table=stored.get("peer_table", ""),
+                facts=stored["facts"],
+                trace_id=trace_id,
+                client_id=client_id,
+            )
+        else:
+            yield FETCH_STATUS
+            data = collect_case_data(config, *inputs, trace_id=trace_id, client_id=client_id)
+        outline = stored.get("outline", "")
+        name = f"claude section {target.number}"
+        prompt = fit_prompt(
+            prompt_section_rewrite(target, _section_excerpts(sections, target, outline), note, *data.prompt_args,
+                                   peer_table=data.peer_table, themes=data.themes),
+            config.prompt_max_input_tokens,
+            name,
+        )
+        usage: Dict[str, int] = {}
+        route: Dict[str, Any] = {}
+        text = ""
+        section_stage = Stage(name, trace_id)
+        try:
+            for chunk in stream_routed(config, prompt, max_tokens=_section_max_tokens(target.max_words), usage=usage,
+                                       client_id=client_id, route=route):
+                text += chunk
+                if text.startswith("API Error"):
+                    raise RuntimeError(text)
+                yield join_sections({**sections, target.number: text})
+        except Exception as exc:
+            _finish_claude_stage(section_stage, text, usage, route, exc)
+            # Put the case back as it was before the partial rewrite, then fail.
+            yield original
+            raise
+        _finish_claude_stage(section_stage, text, usage, route)
+        data.models[name] = route.get("model", "")
+
+        sections[target.number] = text.strip()
+        if outline:
+            data.artifacts["outline"] = outline
+        data.artifacts["sections"] = {str(number): section_text for number, section_text in sections.items()}
+        result = _finalize_case(join_sections(sections), data)
+        yield result
+    except BaseException as exc:
+        case_stage.finish(exc)
+        raise
+    case_stage.annotate(bytes=len(result.encode("utf-8")), stage_errors=len(data.errors))
+    case_stage.finish()
+
+    if data.errors or data.used_fallback(config.claude_model):
+        return
+    _store_case(cache, key, mode, data, result)
+
+
+def regenerate_section(
+    config: AppConfig,
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    section: int,
+    mode: Optional[str] = None,
+    case_text: Optional[str] = None,
+    note: str = "",
+    client_id: Optional[str] = None,
+) -> str:
+    """Blocking wrapper around ``stream_section_regeneration`` returning the final text."""
 
+    result = ""
+    for result in stream_section_regeneration(
+        config, subject, learning_outcomes, case_focus, industry_company, case_type, section, mode, case_text, note,
+        client_id,
+    ):
+        pass
+    return result
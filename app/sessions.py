@@ -0,0 +1,62 @@
+"""Password sessions shared by all worker processes.
+
+Entering the password issues a random token that the browser keeps; the
+server stores only its hash, in SQLite under ``CASEGEN_DATA_DIR``, so any
+process can validate it until ``SESSION_TTL`` expires.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from typing import Optional
+
+from .cache import DiskCache
+from .config import get_config
+
+
+_store: Optional[DiskCache] = None
+_store_lock = threading.Lock()
+
+
+def _get_store() -> DiskCache:
+    """Return the process-wide session store, creating it on first use."""
+
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DiskCache(os.path.join(get_config().data_dir, "sessions.sqlite3"), max_entries=10000)
+        return _store
+
+
+def _token_key(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def login(password: str) -> Optional[str]:
+    """Return a new session token if ``password`` is correct, else None."""
+
+    if not hmac.compare_digest(password.encode("utf-8"), get_config().access_password.encode("utf-8")):
+        return None
+    token = secrets.token_urlsafe(32)
+    _get_store().set(_token_key(token), {})
+    return token
+
+
+def is_valid(token: Optional[str]) -> bool:
+    """Whether ``token`` belongs to a live session."""
+
+    if not token:
+        return False
+    entry = _get_store().get(_token_key(token))
+    return entry is not None and entry.age < get_config().session_ttl
+
+
+def logout(token: Optional[str]) -> None:
+    """End the session of ``token`` for every process."""
+
+    if token:
+        _get_store().delete(_token_key(token))
@@ -0,0 +1,156 @@
+"""Focus-theme detection from the case inputs.
+
+Themes, their keywords and their prompt instructions come from the bundled
+``data/themes.json`` (optionally extended by ``THEMES_PATH``). All keywords
+are compiled into one word-boundary regex, so detection is a single scan of
+the inputs however large the table grows. Results carry per-theme scores
+and are memoized per input triple, so a request computes them once.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import re
+import threading
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, List, Optional, Pattern, Tuple
+
+from .config import get_config
+
+
+BUNDLED_THEMES = os.path.join(os.path.dirname(__file__), "data", "themes.json")
+
+# Case focus is the most specific input, so its keyword hits count double.
+FOCUS_WEIGHT = 2.0
+MIN_THEME_SCORE = 1.0
+
+
+def _keyword_pattern(keyword: str) -> str:
+    """Regex for a keyword as whole words, allowing a plural ``s``/``es`` ending."""
+
+    words = [re.escape(word) for word in keyword.lower().split()]
+    return r"\b" + r"\s+".join(words) + r"(?:e?s)?\b"
+
+
+class ThemeTable:
+    """Theme definitions with every keyword compiled into one alternation."""
+
+    def __init__(self, themes: Dict[str, Dict[str, object]]) -> None:
+        self.themes = themes
+        self._keyword_themes: Dict[str, List[str]] = {}
+        for theme, definition in themes.items():
+            for keyword in definition.get("keywords", []):
+                self._keyword_themes.setdefault(" ".join(keyword.lower().split()), []).append(theme)
+        # Longest first, so "business model" wins over a shorter overlapping keyword.
+        keywords = sorted(self._keyword_themes, key=len, reverse=True)
+        self._pattern = re.compile("|".join(_keyword_pattern(keyword) for keyword in keywords), re.IGNORECASE)
+        self._theme_patterns: Dict[str, Pattern[str]] = {
+            theme: re.compile(
+                "|".join(_keyword_pattern(keyword) for keyword in definition.get("keywords", [])) or r"(?!)",
+                re.IGNORECASE,
+            )
+            for theme, definition in themes.items()
+        }
+
+    def score(self, text: str, weight: float = 1.0) -> Dict[str, float]:
+        """Return keyword hits per theme in ``text``, times ``weight``."""
+
+        scores: Dict[str, float] = {}
+        for match in self._pattern.finditer(text):
+            keyword = " ".join(match.group(0).lower().split())
+            themes = (
+                self._keyword_themes.get(keyword)
+                or self._keyword_themes.get(keyword[:-1])  # plural "s"
+                or self._keyword_themes.get(keyword[:-2], [])  # plural "es"
+            )
+            for theme in themes:
+                scores[theme] = scores.get(theme, 0.0) + weight
+        return scores
+
+    def pattern(self, theme: str) -> Pattern[str]:
+        """Compiled keyword regex for one theme (never matches for unknown themes)."""
+
+        return self._theme_patterns.get(theme) or re.compile(r"(?!)")
+
+    def text(self, theme: str, field: str) -> str:
+        return str(self.themes.get(theme, {}).get(field, ""))
+
+
+_table: Optional[ThemeTable] = None
+_table_lock = threading.Lock()
+
+
+def get_theme_table() -> ThemeTable:
+    """Return the theme table, loading and compiling it on first use."""
+
+    global _table
+    with _table_lock:
+        if _table is None:
+            with open(BUNDLED_THEMES, "r", encoding="utf-8") as file:
+                themes = json.load(file)
+            extra = get_config().themes_path
+            if extra:
+                with open(extra, "r", encoding="utf-8") as file:
+                    themes.update(json.load(file))
+            _table = ThemeTable(themes)
+        return _table
+
+
+@dataclass(frozen=True)
+class ThemeAnalysis:
+    """Theme scores for one set of inputs, in theme-table order.
+
+    ``focus_scores`` are the (weighted) hits in the case focus alone.
+    """
+
+    scores: Tuple[Tuple[str, float], ...]
+    focus_scores: Tuple[Tuple[str, float], ...] = ()
+
+    @property
+    def themes(self) -> List[str]:
+        """Detected themes (score at or above ``MIN_THEME_SCORE``), in table order."""
+
+        return [theme for theme, score in self.scores if score >= MIN_THEME_SCORE]
+
+    def as_dict(self) -> Dict[str, float]:
+        return dict(self.scores)
+
+    def special_instructions(self) -> str:
+        """Theme-specific instruction lines for the case context."""
+
+        table = get_theme_table()
+        return "\n".join(text for text in (table.text(theme, "instructions") for theme in self.themes) if text)
+
+    def frameworks(self, field: str) -> str:
+        """Framework line for ``field`` from the best theme of the case focus, else of all inputs.
+
+        The case focus says what the case is about, so its themes come first
+        even when the course subject or outcomes mention another theme more
+        often. Among candidates the highest score wins, table order breaking ties.
+        """
+
+        table = get_theme_table()
+        for scores in (self.focus_scores, self.scores):
+            candidates = [(theme, score) for theme, score in scores
+                          if score >= MIN_THEME_SCORE and table.text(theme, field)]
+            if candidates:
+                return table.text(max(candidates, key=lambda item: item[1])[0], field)
+        return ""
+
+
+@lru_cache(maxsize=256)
+def detect_themes(case_focus: str, subject: str, learning_outcomes: str) -> ThemeAnalysis:
+    """Score every theme against the inputs (memoized per input triple)."""
+
+    table = get_theme_table()
+    focus = table.score(case_focus, FOCUS_WEIGHT)
+    totals: Dict[str, float] = dict(focus)
+    for text in (subject, learning_outcomes):
+        for theme, score in table.score(text).items():
+            totals[theme] = totals.get(theme, 0.0) + score
+    return ThemeAnalysis(
+        tuple((theme, totals[theme]) for theme in table.themes if theme in totals),
+        tuple((theme, focus[theme]) for theme in table.themes if theme in focus),
+    )
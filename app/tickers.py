@@ -0,0 +1,328 @@
+"""Ticker resolution over an offline symbol listing.
+
+Company names from the bundled ``data/tickers.csv`` (plus an optional larger
+listing from ``TICKER_LISTING_PATH``) are normalized into tokens and indexed
+in an inverted index weighted by inverse document frequency. Lookups score
+each candidate by the weighted share of its name tokens present in the input,
+with explicit tickers ("NFLX", "$NFLX", "NASDAQ:NFLX") taking precedence and
+a fuzzy token fallback for misspellings that only compares the vocabulary
+words one deletion away from the typed word. Names that are also everyday words
+("Target", "Block") lose score when the text uses them as the everyday word.
+The index is built once per listing content and pickled into the cache
+directory for fast startup.
+"""
+
+from __future__ import annotations
+
+import csv
+import difflib
+import hashlib
+import json
+import math
+import os
+import pickle
+import re
+import threading
+import unicodedata
+from collections import defaultdict
+from dataclasses import dataclass
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+from .config import get_config
+
+
+BUNDLED_LISTING = os.path.join(os.path.dirname(__file__), "data", "tickers.csv")
+INDEX_VERSION = 2
+
+# Legal-form and filler words carry no identifying weight.
+STOP_TOKENS: FrozenSet[str] = frozenset(
+    {
+        "a", "ag", "and", "as", "c", "class", "co", "com", "companies", "company", "corp", "corporation",
+        "de", "group", "holding", "holdings", "inc", "incorporated", "limited", "llc", "lp", "ltd", "n",
+        "nv", "of", "plc", "s", "sa", "se", "the", "v",
+    }
+)
+# Descriptive words that often trail the brand; matches without them still count.
+GENERIC_TOKENS: FrozenSet[str] = frozenset(
+    {
+        "brands", "communications", "electronics", "entertainment", "global", "health", "healthcare", "industries",
+        "interactive", "international", "laboratories", "manufacturing", "markets", "networks", "pharmaceuticals",
+        "platforms", "sciences", "scientific", "services", "software", "systems", "technologies",
+        "technology", "wholesale", "worldwide",
+    }
+)
+GENERIC_WEIGHT = 0.2
+FUZZY_CUTOFF = 0.85
+# Upper-case words that are common in case descriptions but are not meant as tickers.
+TICKER_STOPLIST: FrozenSet[str] = frozenset(
+    {"AI", "CEO", "CFO", "COO", "CTO", "EU", "ESG", "HR", "IPO", "IT", "M&A", "MBA", "R&D", "UK", "US", "USA"}
+)
+
+# Single-word company names that are also everyday words ("target market", "block of shares").
+COMMON_WORD_NAMES: FrozenSet[str] = frozenset(
+    {
+        "affirm", "apple", "arm", "block", "booking", "box", "canon", "carnival", "chewy", "fox", "gap", "grab",
+        "lucid", "match", "oracle", "paramount", "puma", "sea", "shell", "snap", "southern", "square", "target",
+        "tapestry", "visa", "zoom",
+    }
+)
+COMMON_WORD_PENALTY = 0.5
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_EXPLICIT_RE = re.compile(r"(?:\$|\b(?:NASDAQ|NYSE|AMEX|NYSEARCA)\s*:\s*)([A-Za-z][A-Za-z0-9.\-]{0,11})")
+_UPPER_RE = re.compile(r"(?<![\w$])([A-Z][A-Z0-9]{1,4}(?:[.\-][A-Z0-9]{1,2})?)(?![\w])")
+# Words that, right after one of COMMON_WORD_NAMES, show the everyday meaning ("target market").
+_EVERYDAY_NEXT_RE = re.compile(
+    r"\s+(?:analysis|audiences?|chains?|change|date|game|juice|level|markets?|of|office|orchards?|pie|prices?"
+    r"|stores?|year)\b",
+    re.IGNORECASE,
+)
+
+
+@dataclass(frozen=True)
+class TickerMatch:
+    """A resolved ticker with a confidence score in [0, 1]."""
+
+    symbol: str
+    name: str
+    score: float
+
+
+def normalize_tokens(text: str) -> List[str]:
+    """Lowercase, strip accents and apostrophes, and split into identifying tokens."""
+
+    text = unicodedata.normalize("NFKD", text)
+    text = "".join(char for char in text if not unicodedata.combining(char)).lower()
+    text = text.replace("'", "").replace("’", "")
+    return [token for token in _TOKEN_RE.findall(text) if token not in STOP_TOKENS]
+
+
+def _everyday_use(text: str, word: str) -> bool:
+    """Whether every use of ``word`` in ``text`` reads as the everyday word rather than the company.
+
+    A use reads as the everyday word when a telling noun follows it ("Target market", "block of
+    shares") or when it is lowercase in text that capitalizes other words. Without such evidence
+    the company reading wins, so "Apple iPhone strategy" and a bare "apple" still resolve.
+    """
+
+    found = list(re.finditer(rf"\b{re.escape(word)}\b", text, re.IGNORECASE))
+    if not found:
+        return False
+    capitalized = any(char.isupper() for char in text)
+    return all(
+        (capitalized and match.group()[0].islower()) or _EVERYDAY_NEXT_RE.match(text, match.end())
+        for match in found
+    )
+
+
+def _deletions(word: str) -> Set[str]:
+    """``word`` plus every string made by deleting one of its characters."""
+
+    return {word} | {word[:index] + word[index + 1:] for index in range(len(word))}
+
+
+class TickerIndex:
+    """Inverted token index over (symbol, name) listing entries."""
+
+    def __init__(self, entries: Iterable[Tuple[str, str]]) -> None:
+        self.symbols: List[str] = []
+        self.names: List[str] = []
+        self.tokens: List[Tuple[str, ...]] = []
+        self.by_symbol: Dict[str, int] = {}
+        postings: Dict[str, Set[int]] = defaultdict(set)
+
+        seen: Set[Tuple[str, Tuple[str, ...]]] = set()
+        for symbol, name in entries:
+            symbol = symbol.strip().upper()
+            tokens = tuple(dict.fromkeys(normalize_tokens(name)))
+            if not symbol or not tokens or (symbol, tokens) in seen:
+                continue
+            seen.add((symbol, tokens))
+            entry_id = len(self.symbols)
+            self.symbols.append(symbol)
+            self.names.append(name.strip())
+            self.tokens.append(tokens)
+            self.by_symbol.setdefault(symbol, entry_id)
+            for token in tokens:
+                postings[token].add(entry_id)
+
+        total = max(1, len(self.symbols))
+        self.postings: Dict[str, Tuple[int, ...]] = {token: tuple(ids) for token, ids in postings.items()}
+        self.weights: Dict[str, float] = {
+            token: math.log(1 + total / len(ids)) * (GENERIC_WEIGHT if token in GENERIC_TOKENS else 1.0)
+            for token, ids in postings.items()
+        }
+        self.vocabulary: List[str] = sorted(self.postings)
+        # Symmetric deletion neighbourhood: a word and its single-character deletions map back to the
+        # vocabulary words producing them, so typos one edit or swap away meet on a shared key.
+        neighbours: Dict[str, Set[str]] = defaultdict(set)
+        for token in self.vocabulary:
+            for key in _deletions(token):
+                neighbours[key].add(token)
+        self.neighbours: Dict[str, Tuple[str, ...]] = {key: tuple(words) for key, words in neighbours.items()}
+
+    def _match(self, symbol: str, score: float) -> TickerMatch:
+        entry_id = self.by_symbol.get(symbol)
+        name = self.names[entry_id] if entry_id is not None else symbol
+        return TickerMatch(symbol=symbol, name=name, score=score)
+
+    def _explicit(self, text: str) -> List[TickerMatch]:
+        """Return tickers the user typed as symbols."""
+
+        stripped = text.strip()
+        if stripped.upper() in self.by_symbol and " " not in stripped:
+            return [self._match(stripped.upper(), 1.0)]
+        matches = [self._match(symbol.upper(), 1.0 if symbol.upper() in self.by_symbol else 0.9)
+                   for symbol in _EXPLICIT_RE.findall(text)]
+        matches += [self._match(symbol, 0.95) for symbol in _UPPER_RE.findall(text)
+                    if symbol in self.by_symbol and symbol not in TICKER_STOPLIST]
+        return matches
+
+    def _score_tokens(
+        self, text: str, positions: Dict[str, int], similarity: Dict[str, float]
+    ) -> List[Tuple[float, float, int, int]]:
+        """Score candidate entries sharing tokens with the input.
+
+        Returns (score, matched weight, first position, entry id) tuples. Entries named
+        by a single everyday word are scaled by ``COMMON_WORD_PENALTY`` when ``text``
+        uses that word in its everyday sense.
+        """
+
+        candidates: Set[int] = set()
+        for token in positions:
+            candidates.update(self.postings.get(token, ()))
+        scored = []
+        for entry_id in candidates:
+            tokens = self.tokens[entry_id]
+            total = sum(self.weights[token] for token in tokens)
+            matched = [token for token in tokens if token in positions]
+            weight = sum(self.weights[token] * similarity.get(token, 1.0) for token in matched)
+            first = min(positions[token] for token in matched)
+            score = weight / total
+            if len(tokens) == 1 and tokens[0] in COMMON_WORD_NAMES and _everyday_use(text, tokens[0]):
+                score *= COMMON_WORD_PENALTY
+            scored.append((score, weight, first, entry_id))
+        return scored
+
+    def _closest(self, token: str) -> Optional[Tuple[str, float]]:
+        """Return the most similar vocabulary word within ``FUZZY_CUTOFF``, with its similarity."""
+
+        nearby: Set[str] = set()
+        for key in _deletions(token):
+            nearby.update(self.neighbours.get(key, ()))
+        best: Optional[Tuple[str, float]] = None
+        for word in nearby:
+            ratio = difflib.SequenceMatcher(None, token, word).ratio()
+            if ratio >= FUZZY_CUTOFF and (best is None or (ratio, word) > (best[1], best[0])):
+                best = (word, ratio)
+        return best
+
+    def candidates(self, text: str, limit: int = 5) -> List[TickerMatch]:
+        """Return up to ``limit`` matches for free-form text, best first."""
+
+        explicit = self._explicit(text)
+        positions: Dict[str, int] = {}
+        for position, token in enumerate(normalize_tokens(text)):
+            positions.setdefault(token, position)
+
+        similarity: Dict[str, float] = {}
+        scored = self._score_tokens(text, positions, similarity)
+        if not explicit and not any(score >= 0.999 for score, _, _, _ in scored):
+            for token, position in list(positions.items()):
+                if token in self.postings or len(token) < 4:
+                    continue
+                close = self._closest(token)
+                if close:
+                    similarity[close[0]] = close[1]
+                    positions.setdefault(close[0], position)
+            if similarity:
+                scored = self._score_tokens(text, positions, similarity)
+
+        scored.sort(key=lambda item: (-item[0], item[2], -item[1]))
+        matches = explicit[:]
+        seen = {match.symbol for match in matches}
+        for score, _, _, entry_id in scored:
+            symbol = self.symbols[entry_id]
+            if symbol in seen:
+                continue
+            seen.add(symbol)
+            matches.append(TickerMatch(symbol=symbol, name=self.names[self.by_symbol[symbol]], score=round(score, 3)))
+            if len(matches) >= limit:
+                break
+        return matches[:limit]
+
+    def resolve(self, text: str, min_score: float = 0.8) -> Optional[TickerMatch]:
+        """Return the best match scoring at least ``min_score``, if any."""
+
+        matches = self.candidates(text, limit=1)
+        if matches and matches[0].score >= min_score:
+            return matches[0]
+        return None
+
+
+def _read_listing(path: str) -> List[Tuple[str, str]]:
+    """Read (symbol, name) pairs from a CSV listing or SEC company_tickers.json."""
+
+    if path.lower().endswith(".json"):
+        with open(path, "r", encoding="utf-8") as file:
+            data = json.load(file)
+        records = data.values() if isinstance(data, dict) else data
+        return [(str(item["ticker"]), str(item["title"])) for item in records]
+    with open(path, "r", encoding="utf-8", newline="") as file:
+        return [(row["symbol"], row["name"]) for row in csv.DictReader(file)]
+
+
+def _listing_paths() -> List[str]:
+    extra = get_config().ticker_listing_path
+    return [BUNDLED_LISTING] + ([extra] if extra else [])
+
+
+def load_index(paths: Optional[List[str]] = None) -> TickerIndex:
+    """Load the pickled index for the listing files, building it if stale."""
+
+    paths = paths or _listing_paths()
+    digest = hashlib.sha256(repr((INDEX_VERSION, sorted(STOP_TOKENS), sorted(GENERIC_TOKENS), GENERIC_WEIGHT)).encode())
+    for path in paths:
+        with open(path, "rb") as file:
+            digest.update(file.read())
+    index_path = os.path.join(get_config().cache_dir, f"ticker_index_{digest.hexdigest()[:16]}.pickle")
+
+    try:
+        with open(index_path, "rb") as file:
+            return pickle.load(file)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError):
+        pass
+
+    entries: List[Tuple[str, str]] = []
+    for path in paths:
+        entries.extend(_read_listing(path))
+    index = TickerIndex(entries)
+    try:
+        os.makedirs(os.path.dirname(index_path), exist_ok=True)
+        tmp_path = f"{index_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as file:
+            pickle.dump(index, file, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, index_path)
+    except OSError:  # pragma: no cover - read-only disk, keep the in-memory index
+        pass
+    return index
+
+
+_index: Optional[TickerIndex] = None
+_index_lock = threading.Lock()
+
+
+def get_ticker_index() -> TickerIndex:
+    """Return the process-wide ticker index, loading it on first use."""
+
+    global _index
+    with _index_lock:
+        if _index is None:
+            _index = load_index()
+        return _index
+
+
+def resolve_ticker(text: str) -> Optional[TickerMatch]:
+    """Resolve free-form company text to a ticker using the configured threshold."""
+
+    return get_ticker_index().resolve(text, min_score=get_config().ticker_min_score)
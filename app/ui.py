@@ -1,48 +1,167 @@
-"""Gradio UI layer bound to the service functions."""
+"""Gradio UI layer bound to the service functions.
+
+The password unlocks a session whose token is kept in the browser and
+validated server-side (``app.sessions``) on every action, so it survives
+refreshes and works whichever worker process serves the request.
+"""
 
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Tuple
+from typing import Any, Dict, Iterator, Optional, Tuple
 
 import gradio as gr
 
 from .config import get_config
-from .service import generate_harvard_case_2api
+from .exports import export_case
+from .jobs import DONE, FAILED, get_job_manager
+from .prompts import CASE_SECTIONS
+from .service import CASE_INPUT_FIELDS, MODE_OUTLINE, MODE_TWO_PART
+from .sessions import is_valid, login, logout
+
+SESSION_EXPIRED = "Your session has expired. Please enter the password again."
+
+
+def _check_password(password_input: str) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], Optional[str]]:
+    """Start a session if the password is right; return visibility updates and the token."""
+
+    token = login(password_input or "")
+    if token:
+        return gr.update(visible=False, value=""), gr.update(visible=False), gr.update(visible=True), token
+    return gr.update(visible=True, value="Incorrect password!"), gr.update(visible=True), gr.update(visible=False), None
+
+
+def _logout(token: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any], None]:
+    """End the session server-side, lock the page and clear the browser's token."""
+
+    logout(token)
+    return gr.update(visible=True, value=""), gr.update(visible=True), gr.update(visible=False), None
+
+
+def _restore_session(token: Optional[str]) -> Tuple[Dict[str, Any], Dict[str, Any], Dict[str, Any]]:
+    """Unlock the page on load if the browser still holds a live session."""
+
+    unlocked = is_valid(token)
+    return gr.update(visible=not unlocked), gr.update(visible=not unlocked), gr.update(visible=unlocked)
+
+
+def _require_session(token: Optional[str]) -> None:
+    if not is_valid(token):
+        raise gr.Error(SESSION_EXPIRED)
+
+
+def _export(job_id: str, text: str, fmt: str, compress: bool, token: Optional[str]) -> str:
+    """Return the path of the case export for the download button."""
+
+    _require_session(token)
+    return export_case(job_id, text, fmt, compress)
 
 
-def _check_password(password_input: str, access_password: str) -> Tuple[gr.Update, gr.Update]:
-    """Return visibility updates based on password validity."""
+EXPORT_FORMAT_CHOICES = [("Markdown (.md)", "md"), ("Word (.docx)", "docx")]
 
-    if password_input == access_password:
-        return gr.update(visible=False), gr.update(visible=True)
-    return gr.update(visible=True, value="Incorrect password!"), gr.update(visible=False)
 
+SECTION_CHOICES = [(f"{section.number}. {section.title.title()}", section.number) for section in CASE_SECTIONS]
 
-def _save_to_file(text: str) -> str:
-    """Save generated text to a timestamped file and return filename."""
 
-    filename = f"harvard_case_{datetime.now().strftime('%Y%m%d_%H%M')}.txt"
-    with open(filename, "w", encoding="utf-8") as file:
-        file.write(text)
-    return filename
+GENERATION_MODE_CHOICES = [
+    ("Two parts (sequential)", MODE_TWO_PART),
+    ("Outline + parallel sections (faster)", MODE_OUTLINE),
+]
+
+
+def _submit_case(
+    subject: str,
+    learning_outcomes: str,
+    case_focus: str,
+    industry_company: str,
+    case_type: str,
+    mode: str,
+    force_fresh: bool,
+    token: Optional[str],
+    request: gr.Request,
+) -> str:
+    """Queue a generation job for the requesting session and return its ID."""
+
+    _require_session(token)
+    return get_job_manager().submit(
+        {
+            "subject": subject,
+            "learning_outcomes": learning_outcomes,
+            "case_focus": case_focus,
+            "industry_company": industry_company,
+            "case_type": case_type,
+            "mode": mode,
+            "force_fresh": force_fresh,
+            "client_id": request.session_hash if request else None,
+        }
+    )
+
+
+def _submit_regeneration(
+    job_id: str,
+    section: int,
+    note: str,
+    token: Optional[str],
+    request: gr.Request,
+) -> str:
+    """Queue a job rewriting one section of a finished case; return the new job's ID."""
+
+    _require_session(token)
+    manager = get_job_manager()
+    base = manager.store.get((job_id or "").strip())
+    if base is None or base.status != DONE:
+        raise gr.Error("Open a finished case (enter its job ID and resume it) before regenerating a section.")
+    return manager.submit(
+        {
+            **{name: base.inputs.get(name) for name in CASE_INPUT_FIELDS},
+            "mode": base.inputs.get("mode"),
+            "section": int(section),
+            "note": note or "",
+            "case_text": base.text,
+            "client_id": request.session_hash if request else None,
+        }
+    )
+
+
+def _follow_job(job_id: str, token: Optional[str]) -> Iterator[str]:
+    """Stream a job's partial text into the output box until it finishes."""
+
+    if not is_valid(token):
+        yield SESSION_EXPIRED
+        return
+    job_id = (job_id or "").strip()
+    if not job_id:
+        yield "Enter a job ID to resume."
+        return
+    found = False
+    for job in get_job_manager().follow(job_id):
+        found = True
+        if job.status == FAILED:
+            yield job.text + f"\n\nError during case generation: {job.error}"
+        else:
+            yield job.text or f"⏳ Job {job.status}..."
+    if not found:
+        yield f"Unknown job ID: {job_id}"
 
 
 def build_app() -> gr.Blocks:
     """Construct and return the Gradio Blocks app."""
 
     config = get_config()
+    get_job_manager()  # start claiming queued jobs (unless worker processes run them)
 
-    with gr.Blocks(theme=gr.themes.Soft()) as demo:
+    with gr.Blocks() as demo:
         gr.Markdown("# 🎓 Harvard Case Study Generator (smart adaptive prompt edition)")
         gr.Markdown("**Automatically adapts to case focus. Best practice, simple for users.**")
 
+        session = gr.BrowserState(None, storage_key="casegen_session")
         password = gr.Textbox(label="Password", type="password")
         password_button = gr.Button("Enter")
 
         protected_block = gr.Group(visible=False)
         with protected_block:
-            gr.Markdown("### Harvard MBA Case Generation")
+            with gr.Row():
+                gr.Markdown("### Harvard MBA Case Generation")
+                logout_btn = gr.Button("🔒 Log out", size="sm", scale=0)
             with gr.Row():
                 with gr.Column():
                     subject = gr.Textbox(label="Course/Subject", value="Strategic Management")
@@ -79,25 +198,49 @@ def build_app() -> gr.Blocks:
                         ],
                         value="Innovation/Change case",
                     )
-        generate_case_btn = gr.Button("🚀 Generate Harvard Case (2 API calls)", variant="primary", size="lg")
+                    mode = gr.Radio(
+                        label="Generation Mode",
+                        choices=GENERATION_MODE_CHOICES,
+                        value=config.generation_mode,
+                    )
+                    force_fresh = gr.Checkbox(
+                        label="Force fresh generation (ignore cached case for identical inputs)", value=False
+                    )
+        generate_case_btn = gr.Button("🚀 Generate Harvard Case", variant="primary", size="lg")
+        with gr.Row():
+            job_id = gr.Textbox(label="Job ID (keep it to reopen this case after a refresh)", scale=4)
+            resume_btn = gr.Button("🔄 Resume Job", scale=1)
         case_output = gr.Textbox(
             label="Full Harvard MBA Case (teaching notes, exhibits, references)",
             lines=60,
             placeholder="Full Harvard MBA case will appear here...",
         )
 
-        download_btn = gr.DownloadButton("💾 Download Case")
+        with gr.Row():
+            export_format = gr.Radio(label="Download Format", choices=EXPORT_FORMAT_CHOICES, value="md", scale=3)
+            export_gzip = gr.Checkbox(label="Compress (.gz)", value=False, scale=1)
+            download_btn = gr.DownloadButton("💾 Download Case", scale=1)
+        with gr.Row():
+            regen_section = gr.Dropdown(label="Section", choices=SECTION_CHOICES, value=8, scale=2)
+            regen_note = gr.Textbox(label="What to change (optional)", scale=4)
+            regen_btn = gr.Button("♻️ Regenerate Section", scale=1)
 
+        demo.load(fn=_restore_session, inputs=session, outputs=[password, password_button, protected_block])
         password_button.click(
-            fn=lambda pwd: _check_password(pwd, config.access_password), inputs=password, outputs=[password, protected_block]
+            fn=_check_password, inputs=password, outputs=[password, password_button, protected_block, session]
         )
+        logout_btn.click(fn=_logout, inputs=session, outputs=[password, password_button, protected_block, session])
         generate_case_btn.click(
-            fn=lambda s, lo, cf, ic, ct: generate_harvard_case_2api(get_config(), s, lo, cf, ic, ct),
-            inputs=[subject, learning_outcomes, case_focus, industry_company, case_type],
-            outputs=case_output,
+            fn=_submit_case,
+            inputs=[subject, learning_outcomes, case_focus, industry_company, case_type, mode, force_fresh, session],
+            outputs=job_id,
+        ).then(fn=_follow_job, inputs=[job_id, session], outputs=case_output)
+        resume_btn.click(fn=_follow_job, inputs=[job_id, session], outputs=case_output)
+        regen_btn.click(
+            fn=_submit_regeneration, inputs=[job_id, regen_section, regen_note, session], outputs=job_id
+        ).then(fn=_follow_job, inputs=[job_id, session], outputs=case_output)
+        download_btn.click(
+            fn=_export, inputs=[job_id, case_output, export_format, export_gzip, session], outputs=[download_btn]
         )
-        download_btn.click(fn=_save_to_file, inputs=[case_output], outputs=[download_btn])
 
     return demo
-
-
@@ -0,0 +1,58 @@
+"""Generation worker process (``python -m app.worker``).
+
+With ``WORKERS`` > 1, ``app.main`` serves the UI from one process and starts
+this many workers. Each claims queued jobs from the shared job store and
+runs up to ``JOB_WORKERS`` of them at a time. Its metrics are written every
+few seconds to ``<CASEGEN_DATA_DIR>/metrics/worker-<pid>.prom``, and the web
+process merges them into ``/metrics``.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import signal
+import sys
+import time
+
+from .config import get_config
+from .jobs import get_job_manager
+from .metrics import write_snapshot
+
+
+METRICS_INTERVAL = 5.0
+logger = logging.getLogger(__name__)
+
+
+def metrics_dir() -> str:
+    """Directory where worker processes write their metrics snapshots."""
+
+    return os.path.join(get_config().data_dir, "metrics")
+
+
+def run() -> None:
+    config = get_config()
+    logging.basicConfig(level=config.log_level, format="%(asctime)s %(levelname)s %(name)s %(message)s")
+    # Exit through ``finally`` on SIGTERM; jobs cut short resume elsewhere once their lease expires.
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    manager = get_job_manager(run_jobs=True)
+    directory = metrics_dir()
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"worker-{os.getpid()}.prom")
+    logger.info("worker %s running up to %d jobs", manager.owner, manager.workers)
+    try:
+        while True:
+            try:
+                write_snapshot(path)
+            except OSError:  # pragma: no cover - retried on the next pass
+                logger.exception("could not write metrics snapshot")
+            time.sleep(METRICS_INTERVAL)
+    finally:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+if __name__ == "__main__":
+    run()
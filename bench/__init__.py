@@ -0,0 +1 @@
+"""Offline benchmarks for the case generator (no network or API keys needed)."""
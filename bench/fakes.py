@@ -0,0 +1,286 @@
+"""Local stand-ins for the Anthropic, Perplexity and Yahoo Finance data sources.
+
+``FakeUpstream`` serves ``/v1/messages`` (plain and SSE streaming) and
+``/chat/completions`` on a loopback port with configurable latency, jitter,
+error rate, a slow tail (a fraction of calls delayed before the first byte),
+and an optional per-endpoint requests-per-minute limit that is advertised in
+``anthropic-ratelimit-*`` headers and enforced with 429s. ``fake_statements``
+returns deterministic yfinance-shaped statements for
+``app.finance.set_statement_loader``.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import random
+import re
+import sys
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+import pandas as pd
+
+from app.finance import METRIC_SOURCES, StatementLoader
+from app.prompts import CASE_SECTIONS
+
+
+@dataclass(frozen=True)
+class FakeOptions:
+    """Behaviour of the stand-in servers and data source."""
+
+    latency: float = 0.2
+    jitter: float = 0.1
+    error_rate: float = 0.0
+    chunk_delay: float = 0.002
+    output_words: int = 800
+    financials_latency: float = 0.05
+    rpm: int = 0
+    tail_rate: float = 0.0
+    tail_latency: float = 10.0
+
+
+_WORDS = (
+    "the company board revenue margin strategy market growth customers pricing competitors "
+    "investment risk supply chain capital leadership decision quarter forecast analysts "
+    # Non-ASCII words exercise UTF-8 decoding of the SSE stream ("х" is D1 85, i.e. NEL in Latin-1).
+    "хмарні рішення"
+).split()
+
+
+_SECTION_REQUEST_RE = re.compile(r"Write ONLY section (\d+)")
+
+
+def fake_case_text(words: int, seed: str, only_section: Optional[int] = None) -> str:
+    """Return case-like text with section headings, figures and APA citations.
+
+    ``only_section`` writes just that section with all ``words`` (outline mode).
+    """
+
+    rng = random.Random(seed)
+    sections = [section for section in CASE_SECTIONS if only_section in (None, section.number)]
+    per_section = max(20, words // len(sections))
+    parts: List[str] = []
+    for section in sections:
+        if section.title == "EXHIBITS":
+            body = "\n".join(f"Exhibit {number}: Revenue by segment, FY2020-FY2024 (Company, 2024)."
+                             for number in range(1, 7))
+        elif section.title == "REFERENCES":
+            body = "\n".join(f"Author{number}, A. ({rng.randint(2015, 2024)}). Title {number}. Publisher."
+                             for number in range(1, 21))
+        else:
+            body = " ".join(rng.choice(_WORDS) for _ in range(per_section)).capitalize()
+        parts.append(
+            f"**{section.number}. {section.title}**\n\n{body}\n\nRevenue grew "
+            f"{rng.randint(2, 40)}% to ${rng.randint(1, 90)}.{rng.randint(0, 9)} billion "
+            f"(Smith & Lee, {rng.randint(2015, 2024)})."
+        )
+    return "\n\n".join(parts)
+
+
+def _delay(options: FakeOptions) -> None:
+    tail = options.tail_latency if random.random() < options.tail_rate else 0.0
+    time.sleep(max(0.0, options.latency + tail + random.uniform(-options.jitter, options.jitter)))
+
+
+def _sse(event: Dict[str, Any]) -> bytes:
+    return f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    server: "_Server"
+
+    def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - stdlib signature
+        pass
+
+    def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+        body = json.dumps(payload).encode("utf-8")
+        self.send_response(status)
+        self.send_header("content-type", "application/json")
+        self.send_header("content-length", str(len(body)))
+        for name, value in {**self._limits, **(headers or {})}.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self) -> None:  # noqa: N802 - stdlib naming
+        options = self.server.options
+        body = json.loads(self.rfile.read(int(self.headers.get("content-length") or 0)) or b"{}")
+        self.server.count(self.path, body.get("model"))
+        self._limits = self.server.admit(self.path)
+        if self._limits.get("retry-after"):
+            error = {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}}
+            self._send_json(429, error)
+            return
+        _delay(options)
+        if random.random() < options.error_rate:
+            error = {"type": "error", "error": {"type": "overloaded_error", "message": "Overloaded"}}
+            self._send_json(529, error, {"retry-after": "0"})
+            return
+        if self.path.endswith("/v1/messages"):
+            self._messages(body)
+        elif self.path.endswith("/chat/completions"):
+            self._chat(body)
+        else:
+            self._send_json(404, {"error": "not found"})
+
+    def _messages(self, body: Dict[str, Any]) -> None:
+        options = self.server.options
+        seed = hashlib.sha256(json.dumps(body, sort_keys=True).encode("utf-8")).hexdigest()
+        content = body.get("messages", [{}])[-1].get("content", "")
+        instructions = content[-1].get("text", "") if isinstance(content, list) and content else str(content)
+        section = _SECTION_REQUEST_RE.search(instructions)
+        words = min(options.output_words, int(body.get("max_tokens", 4096) * 0.6))
+        text = fake_case_text(words, seed, int(section.group(1)) if section else None)
+        input_tokens = len(json.dumps(body.get("messages", ""))) // 4
+        output_tokens = len(text) // 4
+        if not body.get("stream"):
+            self._send_json(200, {
+                "type": "message",
+                "role": "assistant",
+                "content": [{"type": "text", "text": text}],
+                "usage": {"input_tokens": input_tokens, "output_tokens": output_tokens},
+            })
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "text/event-stream")
+        self.send_header("transfer-encoding", "chunked")
+        for name, value in self._limits.items():
+            self.send_header(name, value)
+        self.end_headers()
+        for event in self._stream_events(text, input_tokens, output_tokens):
+            chunk = _sse(event)
+            self.wfile.write(f"{len(chunk):x}\r\n".encode("ascii") + chunk + b"\r\n")
+            self.wfile.flush()
+            if event["type"] == "content_block_delta":
+                time.sleep(options.chunk_delay)
+        self.wfile.write(b"0\r\n\r\n")
+
+    @staticmethod
+    def _stream_events(text: str, input_tokens: int, output_tokens: int) -> Iterator[Dict[str, Any]]:
+        yield {"type": "message_start", "message": {"usage": {"input_tokens": input_tokens, "output_tokens": 1}}}
+        yield {"type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}}
+        words = text.split(" ")
+        for start in range(0, len(words), 8):
+            piece = " ".join(words[start:start + 8]) + (" " if start + 8 < len(words) else "")
+            yield {"type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": piece}}
+        yield {"type": "content_block_stop", "index": 0}
+        yield {"type": "message_delta", "delta": {"stop_reason": "end_turn"}, "usage": {"output_tokens": output_tokens}}
+        yield {"type": "message_stop"}
+
+    def _chat(self, body: Dict[str, Any]) -> None:
+        query = body.get("messages", [{}])[-1].get("content", "")
+        rng = random.Random(query)
+        facts = "\n".join(
+            f"{number}. In {rng.randint(2010, 2024)} the company reported {rng.randint(1, 60)}% growth "
+            f"(https://example.com/source/{rng.randint(1000, 9999)})."
+            for number in range(1, 21)
+        )
+        self._send_json(200, {"choices": [{"message": {"role": "assistant", "content": facts}}]})
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, options: FakeOptions) -> None:
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.options = options
+        self.requests: Dict[str, int] = {}
+        self.models: Dict[str, int] = {}
+        self.throttled = 0
+        self._admitted: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def handle_error(self, request: Any, client_address: Any) -> None:
+        # Clients dropping keep-alive connections at shutdown are expected.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+    def count(self, path: str, model: Optional[str] = None) -> None:
+        with self._lock:
+            self.requests[path] = self.requests.get(path, 0) + 1
+            if model:
+                self.models[model] = self.models.get(model, 0) + 1
+
+    def admit(self, path: str) -> Dict[str, str]:
+        """Apply the sliding-window RPM limit; return rate-limit headers (with ``retry-after`` if refused)."""
+
+        rpm = self.options.rpm
+        if rpm <= 0:
+            return {}
+        now = time.time()
+        with self._lock:
+            window = self._admitted.setdefault(path, deque())
+            while window and window[0] <= now - 60:
+                window.popleft()
+            refused = len(window) >= rpm
+            if refused:
+                self.throttled += 1
+            else:
+                window.append(now)
+            reset = (window[0] if window else now) + 60
+        headers = {
+            "anthropic-ratelimit-requests-limit": str(rpm),
+            "anthropic-ratelimit-requests-remaining": str(rpm - len(window)),
+            "anthropic-ratelimit-requests-reset": datetime.fromtimestamp(reset, timezone.utc).isoformat(),
+        }
+        if refused:
+            headers["retry-after"] = str(max(1, int(reset - now + 0.999)))
+        return headers
+
+
+class FakeUpstream:
+    """Run the stand-in API server on a background thread (use as a context manager)."""
+
+    def __init__(self, options: FakeOptions) -> None:
+        self._server = _Server(options)
+        self._thread = threading.Thread(target=self._server.serve_forever, name="bench-upstream", daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def requests(self) -> Dict[str, int]:
+        return dict(self._server.requests)
+
+    @property
+    def models(self) -> Dict[str, int]:
+        return dict(self._server.models)
+
+    @property
+    def throttled(self) -> int:
+        return self._server.throttled
+
+    def __enter__(self) -> "FakeUpstream":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def fake_statements(options: FakeOptions, years: int = 5) -> StatementLoader:
+    """Return a yfinance-shaped statement loader with deterministic values per ticker."""
+
+    periods = [pd.Timestamp(f"{2024 - offset}-12-31") for offset in range(years)]
+
+    def _load(ticker: str) -> Dict[str, pd.DataFrame]:
+        time.sleep(options.financials_latency)
+        rng = random.Random(ticker)
+        rows: Dict[str, Dict[str, List[float]]] = {}
+        for statement, labels in METRIC_SOURCES.values():
+            scale = rng.uniform(1e9, 5e10)
+            rows.setdefault(statement, {})[labels[0]] = [scale * (1 - 0.05 * year) for year in range(years)]
+        return {statement: pd.DataFrame(values, index=periods).T for statement, values in rows.items()}
+
+    return _load
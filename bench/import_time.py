@@ -0,0 +1,66 @@
+"""Cold-import regression benchmark (python -m bench.import_time).
+
+Imports each headless entry module in a fresh interpreter several times and
+fails if the fastest import exceeds the budget, or if it pulled in a heavy
+dependency (pandas, yfinance, gradio, ...) that should only load on first use.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import subprocess
+import sys
+from typing import Any, Dict, List, Optional
+
+
+MODULES = ("app.service", "app.jobs", "app.batch")
+HEAVY_MODULES = ("pandas", "numpy", "yfinance", "gradio", "fastapi", "uvicorn", "requests")
+
+_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+import {module}
+elapsed = time.perf_counter() - start
+print(json.dumps({{"seconds": elapsed, "heavy": [name for name in {heavy!r} if name in sys.modules]}}))
+"""
+
+
+def measure(module: str, repeat: int) -> Dict[str, Any]:
+    """Return the fastest cold import time of ``module`` and any heavy modules it loaded."""
+
+    runs: List[Dict[str, Any]] = []
+    for _ in range(repeat):
+        probe = _PROBE.format(module=module, heavy=HEAVY_MODULES)
+        output = subprocess.run([sys.executable, "-c", probe], check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        "module": module,
+        "best_ms": round(min(run["seconds"] for run in runs) * 1000, 1),
+        "heavy": sorted({name for run in runs for name in run["heavy"]}),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Fail if cold import of the headless modules regresses.")
+    parser.add_argument("modules", nargs="*", default=list(MODULES), help=f"modules to import (default: {MODULES})")
+    parser.add_argument("--repeat", type=int, default=5, help="fresh interpreters per module (default: 5)")
+    parser.add_argument("--budget-ms", type=float, default=250.0, help="max best-of import time (default: 250)")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for module in args.modules:
+        result = measure(module, max(1, args.repeat))
+        problems = []
+        if result["best_ms"] > args.budget_ms:
+            problems.append(f"over budget of {args.budget_ms:g} ms")
+        if result["heavy"]:
+            problems.append(f"eagerly imports {', '.join(result['heavy'])}")
+        status = "FAIL: " + "; ".join(problems) if problems else "ok"
+        print(f"{module}: {result['best_ms']} ms ({status})")
+        failed = failed or bool(problems)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
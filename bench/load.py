@@ -0,0 +1,191 @@
+"""Offline load benchmark (python -m bench.load).
+
+Starts the stand-in upstream from ``bench.fakes``, points the app at it
+through ``ANTHROPIC_URL`` / ``PERPLEXITY_URL``, swaps yfinance for synthetic
+statements, and drives ``generate_harvard_case_2api`` from N concurrent
+users. Reports throughput, latency percentiles, memory and upstream request
+counts; exits non-zero if any case failed, so it can gate CI.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from .fakes import FakeOptions, FakeUpstream, fake_statements
+
+
+COMPANIES = ("Netflix", "Apple", "Microsoft", "Tesla", "Nike", "Starbucks", "Boeing", "Amazon")
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of ``values`` (``q`` in 0-100)."""
+
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, round(q / 100 * len(ordered) + 0.5) - 1))
+    return ordered[index]
+
+
+def _configure_env(base_url: str, cache_dir: str, args: argparse.Namespace) -> None:
+    os.environ.update({
+        "ANTHROPIC_URL": f"{base_url}/v1/messages",
+        "PERPLEXITY_URL": f"{base_url}/chat/completions",
+        "CLAUDE_API_KEY": "bench",
+        "PERPLEXITY_API_KEY": "bench",
+        "CASEGEN_CACHE_DIR": cache_dir,
+        "GENERATION_MODE": args.mode,
+        "HTTP_BACKOFF_BASE": "0.05",
+        "HTTP_POOL_SIZE": str(max(10, args.users * 2)),
+        "HEDGE_AFTER": str(args.hedge_after),
+        "FALLBACK_MODEL": args.fallback_model,
+    })
+
+
+def run_benchmark(args: argparse.Namespace) -> Dict[str, Any]:
+    """Run the load test described by ``args`` and return its report."""
+
+    options = FakeOptions(
+        latency=args.latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        chunk_delay=args.chunk_delay,
+        output_words=args.output_words,
+        financials_latency=args.financials_latency,
+        rpm=args.rpm,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+    )
+    with tempfile.TemporaryDirectory(prefix="casegen-bench-") as cache_dir, FakeUpstream(options) as upstream:
+        _configure_env(upstream.base_url, cache_dir, args)
+        from app import finance
+        from app.config import get_config
+        from app.service import generate_harvard_case_2api
+
+        load_statements = fake_statements(options)
+        statement_loads: List[str] = []
+
+        def _counting_loader(ticker: str) -> Dict[str, Any]:
+            statement_loads.append(ticker)
+            return load_statements(ticker)
+
+        finance.set_statement_loader(_counting_loader)
+        get_config.cache_clear()
+        config = get_config()
+        latencies: List[float] = []
+        failures: List[str] = []
+
+        def _one_case(number: int) -> None:
+            company = COMPANIES[number % max(1, min(args.companies, len(COMPANIES)))]
+            start = time.perf_counter()
+            errors: Dict[str, str] = {}
+            try:
+                generate_harvard_case_2api(
+                    config,
+                    f"Strategy case #{number}",
+                    "Evaluate competitive strategy under uncertainty",
+                    "growth strategy and financial performance",
+                    company,
+                    "Decision case",
+                    force_fresh=True,
+                    errors=errors,
+                )
+            except Exception as exc:  # pragma: no cover - reported below
+                failures.append(f"case {number}: {exc}")
+                return
+            latencies.append(time.perf_counter() - start)
+            if errors:
+                failures.append(f"case {number}: {errors}")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=args.users, thread_name_prefix="bench-user") as pool:
+            list(pool.map(_one_case, range(args.requests)))
+        elapsed = time.perf_counter() - start
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        finance.set_statement_loader(None)
+        upstream_requests = upstream.requests
+        upstream_throttled = upstream.throttled
+        upstream_models = upstream.models
+
+    return {
+        "users": args.users,
+        "requests": args.requests,
+        "mode": args.mode,
+        "failed": len(failures),
+        "failures": failures[:5],
+        "elapsed_s": round(elapsed, 3),
+        "throughput_cases_per_min": round(len(latencies) / elapsed * 60, 2) if elapsed else 0.0,
+        "latency_s": {
+            "p50": round(percentile(latencies, 50), 3),
+            "p95": round(percentile(latencies, 95), 3),
+            "p99": round(percentile(latencies, 99), 3),
+            "max": round(max(latencies), 3) if latencies else None,
+        },
+        "memory_mb": {
+            "traced_peak": round(traced_peak / 2**20, 1),
+            "max_rss": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+        },
+        "upstream_requests": upstream_requests,
+        "upstream_throttled": upstream_throttled,
+        "upstream_models": upstream_models,
+        "statement_loads": len(statement_loads),
+    }
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    latency = report["latency_s"]
+    memory = report["memory_mb"]
+    print(f"{report['requests']} cases, {report['users']} users, mode={report['mode']}: "
+          f"{report['elapsed_s']}s, {report['throughput_cases_per_min']} cases/min")
+    print(f"latency p50={latency['p50']}s p95={latency['p95']}s p99={latency['p99']}s max={latency['max']}s")
+    print(f"memory traced peak={memory['traced_peak']} MB, max RSS={memory['max_rss']} MB")
+    print(f"upstream requests: {report['upstream_requests']}, throttled (429): {report['upstream_throttled']}, "
+          f"statement loads: {report['statement_loads']}")
+    print(f"requests per model: {report['upstream_models']}")
+    if report["failed"]:
+        print(f"{report['failed']} case(s) failed:", *report["failures"], sep="\n  ")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Offline load benchmark against local stand-in APIs.")
+    parser.add_argument("-u", "--users", type=int, default=4, help="concurrent users (default: 4)")
+    parser.add_argument("-n", "--requests", type=int, default=16, help="cases to generate in total (default: 16)")
+    parser.add_argument("--companies", type=int, default=len(COMPANIES),
+                        help=f"distinct companies requested, 1 = a whole class on one case (default: {len(COMPANIES)})")
+    parser.add_argument("--mode", choices=("two_part", "outline"), default="two_part")
+    parser.add_argument("--latency", type=float, default=0.2, help="upstream time to first byte, seconds")
+    parser.add_argument("--jitter", type=float, default=0.1, help="+/- uniform jitter on latency, seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of upstream calls answered 529")
+    parser.add_argument("--chunk-delay", type=float, default=0.002, help="seconds between streamed chunks")
+    parser.add_argument("--output-words", type=int, default=800, help="words per fake Claude response")
+    parser.add_argument("--financials-latency", type=float, default=0.05, help="stub statement fetch, seconds")
+    parser.add_argument("--rpm", type=int, default=0, help="upstream requests per minute per endpoint (0: no limit)")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="fraction of upstream calls hit by a slow tail")
+    parser.add_argument("--tail-latency", type=float, default=10.0, help="extra first-byte delay of a tail call, s")
+    parser.add_argument("--hedge-after", type=float, default=20.0, help="HEDGE_AFTER for the run, seconds")
+    parser.add_argument("--fallback-model", default="claude-3-5-haiku-20241022",
+                        help="FALLBACK_MODEL for the run ('' disables hedging)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    args = parser.parse_args(argv)
+
+    report = run_benchmark(args)
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        _print_report(report)
+    return 1 if report["failed"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,40 @@
+"""Tests for failure recording and resume in the batch runner."""
+
+import json
+import os
+
+from app import batch
+
+ROW = {
+    "subject": "Strategy",
+    "learning_outcomes": "Evaluate options",
+    "case_focus": "Growth",
+    "industry_company": "Netflix",
+    "case_type": "Decision case",
+}
+
+
+def _manifest(output_dir):
+    with open(os.path.join(output_dir, batch.MANIFEST_NAME), encoding="utf-8") as file:
+        return [json.loads(line) for line in file]
+
+
+def test_case_with_stage_errors_is_failed_and_retried(tmp_path, monkeypatch):
+    calls = []
+
+    def generate(config, *inputs, errors=None, **kwargs):
+        calls.append(inputs)
+        if len(calls) == 1:
+            # Part 2 answered with an API error after a good part 1.
+            errors["claude"] = "API Error 529: overloaded"
+            return "1. Introduction\nFine text.\n\nAPI Error 529: overloaded"
+        return "1. Introduction\nFine text."
+
+    monkeypatch.setattr(batch, "generate_harvard_case_2api", generate)
+    assert batch.run_batch(None, [dict(ROW)], str(tmp_path), concurrency=1) == 1
+    assert _manifest(tmp_path)[-1]["status"] == "failed"
+    assert _manifest(tmp_path)[-1]["errors"] == {"claude": "API Error 529: overloaded"}
+
+    assert batch.run_batch(None, [dict(ROW)], str(tmp_path), concurrency=1) == 0
+    assert len(calls) == 2
+    assert _manifest(tmp_path)[-1]["status"] == "done"
@@ -0,0 +1,28 @@
+"""Tests for fitting case prompts to their token budget."""
+
+from app.budget import block_tokens, fit_prompt
+from app.prompts import CasePrompt
+
+MAX_TOKENS = 4000
+
+
+def _context(lines):
+    return "\n".join(f"- Fact {number}: revenue grew {number}% in 2024 (Source, 2024)." for number in range(lines))
+
+
+def test_parts_of_one_case_keep_the_same_context():
+    context = _context(600)
+    part1 = CasePrompt(system="Writer", context=context, instructions="Write part 1. " * 50)
+    part2 = CasePrompt(system="Writer", context=context, instructions="Write part 2. " * 150,
+                       reference="1. OPENING\n" + "It was 2024 and sales fell 12%. " * 400)
+
+    fitted1, fitted2 = fit_prompt(part1, MAX_TOKENS), fit_prompt(part2, MAX_TOKENS)
+
+    assert fitted1.context == fitted2.context
+    assert block_tokens(fitted1)["total"] <= MAX_TOKENS
+    assert block_tokens(fitted2)["total"] <= MAX_TOKENS
+
+
+def test_prompt_within_budget_is_unchanged():
+    prompt = CasePrompt(system="Writer", context=_context(10), instructions="Write.")
+    assert fit_prompt(prompt, MAX_TOKENS) is prompt
@@ -0,0 +1,72 @@
+"""Tests for running jobs and mirroring them into their export files."""
+
+import pytest
+
+from app import exports, jobs
+from app.config import get_config
+
+
+@pytest.fixture
+def export_dir(tmp_path, monkeypatch):
+    monkeypatch.setenv("EXPORT_DIR", str(tmp_path / "exports"))
+    get_config.cache_clear()
+    yield tmp_path / "exports"
+    get_config.cache_clear()
+
+
+@pytest.fixture
+def unwritable_exports(tmp_path, monkeypatch):
+    # A regular file where the export directory should be: creating job directories under it fails.
+    blocker = tmp_path / "exports"
+    blocker.write_text("", encoding="utf-8")
+    monkeypatch.setenv("EXPORT_DIR", str(blocker))
+    get_config.cache_clear()
+    yield
+    get_config.cache_clear()
+
+
+def test_job_finishes_when_export_directory_is_unwritable(tmp_path, monkeypatch, unwritable_exports):
+    monkeypatch.setattr(jobs, "stream_harvard_case", lambda config, **inputs: iter(["Part", "Part one"]))
+    manager = jobs.JobManager(jobs.JobStore(str(tmp_path / "jobs.sqlite3")), workers=0)
+    manager.submit({"subject": "Strategy"})
+    job_id, inputs = manager.store.claim(manager.owner, manager.lease)
+    manager._running.add(job_id)
+
+    manager._run(job_id, inputs)
+
+    job = manager.store.get(job_id)
+    assert (job.status, job.text) == (jobs.DONE, "Part one")
+    assert job_id not in manager._running
+
+
+def test_taken_over_job_does_not_publish_its_export(tmp_path, monkeypatch, export_dir):
+    store = jobs.JobStore(str(tmp_path / "jobs.sqlite3"))
+
+    def generate(config, **inputs):
+        yield "Part"
+        store.claim("other-worker", -1.0)  # the lease looks expired to another manager
+        yield "Part one"
+
+    monkeypatch.setattr(jobs, "stream_harvard_case", generate)
+    manager = jobs.JobManager(store, workers=0)
+    manager.submit({"subject": "Strategy"})
+    job_id, inputs = store.claim(manager.owner, manager.lease)
+    monkeypatch.setattr(jobs, "CHECKPOINT_INTERVAL", 0.0)
+
+    manager._run(job_id, inputs)
+
+    assert list((export_dir / job_id).iterdir()) == []
+
+
+def test_download_during_a_running_export_uses_its_own_file(export_dir):
+    job_id = "0" * 32
+    writer = exports.ExportWriter(job_id)
+    writer.update("Live text")
+    writer.flush()
+
+    downloaded = exports.export_case(job_id, "Snapshot text")
+    assert writer.close() != downloaded
+    with open(writer.path, encoding="utf-8") as file:
+        assert file.read() == "Live text"
+    with open(downloaded, encoding="utf-8") as file:
+        assert file.read() == "Snapshot text"
@@ -0,0 +1,41 @@
+"""Tests for the adaptive provider rate limiter."""
+
+import requests
+
+from app.ratelimit import RateLimiter
+
+
+def _response(status: int, headers: dict) -> requests.Response:
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+ANTHROPIC_EXHAUSTED = {
+    "anthropic-ratelimit-requests-limit": "50",
+    "anthropic-ratelimit-requests-remaining": "0",
+    "anthropic-ratelimit-requests-reset": "10",
+    "retry-after": "10",
+}
+
+
+def test_throttle_with_budget_headers_halves_concurrency():
+    limiter = RateLimiter("anthropic", concurrency=8)
+    limiter.observe(_response(429, ANTHROPIC_EXHAUSTED))
+    assert limiter.concurrency == 4.0
+    assert limiter.snapshot()["paused_seconds"] > 0
+
+
+def test_throttle_halves_once_per_episode():
+    limiter = RateLimiter("anthropic", concurrency=8)
+    limiter.observe(_response(429, ANTHROPIC_EXHAUSTED))
+    limiter.observe(_response(429, ANTHROPIC_EXHAUSTED))
+    assert limiter.concurrency == 4.0
+    assert limiter.throttled == 2
+
+
+def test_throttle_without_headers_halves_concurrency():
+    limiter = RateLimiter("anthropic", concurrency=8)
+    limiter.observe(_response(429, {"retry-after": "1"}))
+    assert limiter.concurrency == 4.0
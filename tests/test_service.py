@@ -0,0 +1,35 @@
+"""Tests for repairing short sections of a two-part case."""
+
+from app import service
+from app.config import get_config
+from app.prompts import CASE_SECTIONS
+from app.quality import split_sections
+from app.themes import detect_themes
+
+
+def _section(number, words):
+    section = CASE_SECTIONS[number - 1]
+    return f"{section.number}. {section.title}\n\n" + " ".join(["word"] * words)
+
+
+def _data():
+    return service.CaseData("Strategy", "Evaluate", "Growth", "Netflix", "Decision case",
+                            detect_themes("Growth", "Strategy", "Evaluate"), "table", "", "facts")
+
+
+def test_short_sections_are_rewritten_and_worse_rewrites_dropped(monkeypatch):
+    answers = {"claude section 1": _section(1, 700), "claude section 2": _section(2, 10)}
+    monkeypatch.setattr(service, "_call_claude_stage", lambda config, name, *args: answers[name])
+    case_text = "\n\n".join([_section(1, 50), _section(2, 100), _section(3, 1100)])
+
+    repaired = list(service._repair_sections(get_config(), _data(), case_text, [1, 2]))
+
+    sections = split_sections(repaired[-1])
+    assert sections == {1: _section(1, 700), 2: _section(2, 100), 3: _section(3, 1100)}
+
+
+def test_failed_rewrite_keeps_the_section(monkeypatch):
+    monkeypatch.setattr(service, "_call_claude_stage", lambda *args: "API Error 529: overloaded")
+    case_text = "\n\n".join([_section(1, 50), _section(2, 1300)])
+
+    assert list(service._repair_sections(get_config(), _data(), case_text, [1])) == [case_text]
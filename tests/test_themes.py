@@ -0,0 +1,34 @@
+"""Tests for focus-theme detection and framework selection."""
+
+from app.themes import detect_themes
+
+# The UI's default inputs (app/ui.py).
+DEFAULT_SUBJECT = "Strategic Management"
+DEFAULT_OUTCOMES = (
+    "Students will learn to: (1) Analyze strategic decision-making in dynamic industries; "
+    "(2) Evaluate multiple strategic alternatives using decision frameworks; "
+    "(3) Assess stakeholder impacts and implementation challenges; "
+    "(4) Apply financial analysis to strategic choices; "
+    "(5) Develop recommendations for complex business decisions"
+)
+DEFAULT_FOCUS = "Netflix innovation strategy and growth decisions for 2025"
+
+
+def test_default_inputs_use_innovation_frameworks():
+    themes = detect_themes(DEFAULT_FOCUS, DEFAULT_SUBJECT, DEFAULT_OUTCOMES)
+    assert "Three Horizons" in themes.frameworks("frameworks_part1")
+    assert "Three Horizons" in themes.frameworks("frameworks_part2")
+
+
+def test_case_focus_themes_outrank_subject_and_outcomes():
+    themes = detect_themes("Capital structure and valuation", "Innovation and technology strategy", "Digital R&D")
+    assert "capital structure" in themes.frameworks("frameworks_part1")
+
+
+def test_falls_back_to_all_inputs_without_focus_themes():
+    themes = detect_themes("Netflix in 2025", "Corporate finance", "")
+    assert "capital structure" in themes.frameworks("frameworks_part1")
+
+
+def test_strategic_is_not_a_strategy_keyword():
+    assert "strategy" not in detect_themes("Netflix", "Strategic Management", "").themes
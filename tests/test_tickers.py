@@ -0,0 +1,76 @@
+"""Tests for company-name ticker resolution over the bundled listing."""
+
+import random
+import string
+import time
+
+import pytest
+
+from app.tickers import BUNDLED_LISTING, TickerIndex, _read_listing
+
+
+@pytest.fixture(scope="module")
+def index():
+    return TickerIndex(_read_listing(BUNDLED_LISTING))
+
+
+@pytest.mark.parametrize(
+    "text", ["Target market entry for a startup", "apple orchard expansion", "Block chain adoption in banks"]
+)
+def test_everyday_use_is_not_a_company(index, text):
+    assert index.resolve(text) is None
+
+
+def test_lowercase_everyday_word_defers_to_named_company(index):
+    assert index.resolve("A block of shares in Tesla").symbol == "TSLA"
+
+
+@pytest.mark.parametrize(
+    "text",
+    ["Target", "Target (retail turnaround)", "Target's turnaround", "How Target rebuilt its supply chain",
+     "Target supply chain"],
+)
+def test_everyday_word_written_as_a_name_resolves(index, text):
+    assert index.resolve(text).symbol == "TGT"
+
+
+@pytest.mark.parametrize(
+    "text, symbol",
+    [("Ford", "F"), ("Zoom", "ZM"), ("Block", "XYZ"), ("Square", "XYZ"), ("Kodak", "KODK"), ("Toyota", "TM"),
+     ("Lucid Group", "LCID")],
+)
+def test_single_word_names_resolve(index, text, symbol):
+    assert index.resolve(text).symbol == symbol
+
+
+@pytest.mark.parametrize(
+    "text, symbol",
+    [("Apple iPhone strategy in 2025", "AAPL"), ("Oracle cloud strategy", "ORCL"), ("Visa payments strategy", "V"),
+     ("Shell energy transition", "SHEL"), ("apple", "AAPL")],
+)
+def test_name_followed_by_topic_resolves(index, text, symbol):
+    assert index.resolve(text).symbol == symbol
+
+
+@pytest.mark.parametrize("text, symbol", [("Apple vs Samsung", "AAPL"), ("Visa and Mastercard", "V")])
+def test_first_named_company_wins(index, text, symbol):
+    assert index.resolve(text).symbol == symbol
+
+
+def test_typo_lookups_stay_sub_millisecond_on_a_large_listing():
+    rng = random.Random(7)
+
+    def word():
+        return "".join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(4, 10)))
+
+    entries = _read_listing(BUNDLED_LISTING) + [(f"S{i:04d}", f"{word()} {word()} Inc.") for i in range(8000)]
+    index = TickerIndex(entries)
+    queries = ["Netflx innovation strategy", "Mircosoft cloud", "Amazn logistics", "Starbuks china expansion"]
+    assert [index.resolve(query).symbol for query in queries] == ["NFLX", "MSFT", "AMZN", "SBUX"]
+
+    rounds = 50
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for query in queries:
+            index.candidates(query)
+    assert (time.perf_counter() - start) / (rounds * len(queries)) < 0.001